@@ -0,0 +1,300 @@
+"""
+Full-answer cache for /ask.
+
+Key = data version + normalized question + geohash bucket of the user's
+location, so store distances in a cached answer stay meaningful for
+everyone in the same bucket. Bumping the data version (DATA_VERSION, a new
+packed vector store, or a new Neo4j import stamped by create_graphRAG) makes
+every older entry unreachable.
+
+Backends:
+    • InProcessBackend  – bounded LRU with TTL (default)
+    • SharedStoreBackend – any Redis-like client (get / set(ex=) / delete);
+                           a store error is a miss / a skipped set
+    • LocalSharedStore   – in-process stand-in for that client, for tests
+
+The key may wait for Neo4j (graph import stamp) and the shared backend is a
+blocking client: the ASGI pipeline goes through aget / aset, which run them
+in a worker thread.
+"""
+
+import asyncio, json, os, pathlib, threading, time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from cache import LRUCache
+from clients import get_neo4j_driver
+from graph_engine import GRAPH_BACKEND
+from graph_query import GRAPH_VERSION_QUERY
+from intelligent_count import normalize_question
+from vector_store import STORE_DIR, DOCUMENTS_FILE
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+load_dotenv()
+ANSWER_CACHE_BACKEND   = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()  # memory | shared | off
+ANSWER_CACHE_SIZE      = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL       = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_URL       = os.getenv("ANSWER_CACHE_URL", "")
+ANSWER_CACHE_PRECISION = int(os.getenv("ANSWER_CACHE_GEOHASH_PRECISION", "5"))  # ≈ 5 km cells
+DATA_VERSION_REFRESH   = float(os.getenv("DATA_VERSION_REFRESH_SECONDS", "30"))
+
+# ──────────────────────────────────────────────────────────────
+# 2) Key helpers
+# ──────────────────────────────────────────────────────────────
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(latitude: float, longitude: float, precision: int = ANSWER_CACHE_PRECISION) -> str:
+    """Standard geohash of a point (precision 5 ≈ 4.9 km × 4.9 km)."""
+    lat_rng, lon_rng = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_rng, longitude) if even else (lat_rng, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def location_bucket(latitude, longitude, precision: int = ANSWER_CACHE_PRECISION) -> str:
+    try:
+        return geohash(float(latitude), float(longitude), precision)
+    except (TypeError, ValueError):
+        return "nogeo"
+
+
+_graph_version: Optional[str] = None
+_graph_checked = 0.0
+_graph_lock = threading.Lock()
+
+
+def _refresh_graph_version() -> None:
+    """Re-reads the import stamp (caller holds _graph_lock). Keeps the last value on error."""
+    global _graph_version, _graph_checked
+    _graph_checked = time.monotonic()
+    try:
+        with get_neo4j_driver().session() as session:
+            row = session.run(GRAPH_VERSION_QUERY).single()
+        _graph_version = (row and row["version"]) or "0"
+    except Exception as e:
+        print(f"⚠️  Graph import version unavailable: {e}")
+        _graph_version = _graph_version or "0"
+
+
+def graph_version() -> str:
+    """
+    Stamp of the last Neo4j import (written by create_graphRAG), re-read in
+    the background at most every DATA_VERSION_REFRESH_SECONDS; only the
+    first call waits for Neo4j.
+    """
+    if _graph_version is None:
+        with _graph_lock:
+            if _graph_version is None:
+                _refresh_graph_version()
+    elif time.monotonic() - _graph_checked >= DATA_VERSION_REFRESH and _graph_lock.acquire(blocking=False):
+        def run():
+            try:
+                _refresh_graph_version()
+            finally:
+                _graph_lock.release()
+        threading.Thread(target=run, name="graph-version", daemon=True).start()
+    return _graph_version
+
+
+def current_data_version() -> str:
+    """
+    DATA_VERSION if set, otherwise derived from the packed vector store on
+    disk and, with the Neo4j graph backend, the graph import stamp.
+    """
+    version = os.getenv("DATA_VERSION")
+    if version:
+        return version
+    documents = pathlib.Path(STORE_DIR) / DOCUMENTS_FILE
+    version = "0"
+    if documents.exists():
+        st = documents.stat()
+        version = f"{int(st.st_mtime)}-{st.st_size}"
+    if GRAPH_BACKEND == "neo4j":
+        version += f"+{graph_version()}"
+    return version
+
+
+def cache_key(question: str, latitude=None, longitude=None, version: Optional[str] = None) -> str:
+    version = version or current_data_version()
+    return f"answer:{version}:{location_bucket(latitude, longitude)}:{normalize_question(question or '')}"
+
+# ──────────────────────────────────────────────────────────────
+# 3) Backends
+# ──────────────────────────────────────────────────────────────
+class AnswerCacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class InProcessBackend(AnswerCacheBackend):
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.cache = LRUCache(maxsize, ttl)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class SharedStoreBackend(AnswerCacheBackend):
+    """
+    Wraps a Redis-like client shared by every worker. Only get(key),
+    set(key, value, ex=seconds) and delete(key) are used; values are JSON.
+    clear() is not needed: a data version bump changes every key. The cache
+    is an optimization, so a store outage never fails a request: get()
+    misses and set() is skipped.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.hits = self.misses = self.errors = 0
+
+    def get(self, key):
+        try:
+            raw = self.client.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Answer cache get failed, treated as a miss: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(key, json.dumps(value, ensure_ascii=False), ex=int(ttl) or None)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️  Answer cache set skipped: {e}")
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class LocalSharedStore:
+    """Minimal in-process stand-in for a Redis client (get / set(ex=) / delete)."""
+
+    def __init__(self, clock=time.time):
+        self._data: Dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at <= self._clock():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (self._clock() + ex if ex else 0.0, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+# ──────────────────────────────────────────────────────────────
+# 4) Facade used by app.py
+# ──────────────────────────────────────────────────────────────
+class AnswerCache:
+    def __init__(self, backend: Optional[AnswerCacheBackend], ttl: float = ANSWER_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get(self, question, latitude=None, longitude=None, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not self.enabled or not question:
+            return None
+        return self.backend.get(cache_key(question, latitude, longitude, version))
+
+    def set(self, question, latitude, longitude, response: Dict[str, Any], version: Optional[str] = None) -> None:
+        if not self.enabled or not question:
+            return
+        self.backend.set(cache_key(question, latitude, longitude, version), response, self.ttl)
+
+    async def aget(self, question, latitude=None, longitude=None) -> Optional[Dict[str, Any]]:
+        """get() off the event loop."""
+        if not self.enabled or not question:
+            return None
+        return await asyncio.to_thread(self.get, question, latitude, longitude)
+
+    async def aset(self, question, latitude, longitude, response: Dict[str, Any]) -> None:
+        """set() off the event loop."""
+        if self.enabled and question:
+            await asyncio.to_thread(self.set, question, latitude, longitude, response)
+
+    def invalidate(self) -> None:
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self.backend.stats() if self.enabled else {}
+
+
+def _build_backend() -> Optional[AnswerCacheBackend]:
+    if ANSWER_CACHE_BACKEND == "off":
+        return None
+    if ANSWER_CACHE_BACKEND == "shared":
+        if ANSWER_CACHE_URL:
+            import redis  # only needed for the shared backend
+            return SharedStoreBackend(redis.Redis.from_url(ANSWER_CACHE_URL))
+        print("⚠️  ANSWER_CACHE_URL not set, using a local shared store.")
+        return SharedStoreBackend(LocalSharedStore())
+    return InProcessBackend()
+
+
+_answer_cache: Optional[AnswerCache] = None
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(_build_backend())
+    return _answer_cache
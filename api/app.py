@@ -1,18 +1,27 @@
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 from flask_cors import CORS
 from graph_search     import fetch_graphrag_data 
 from graph_query import FETCH_GRAPH_QUERY
-from llm import format_graph_content
-import os
+from llm import pack_prompt_context
+import os, json
 from dotenv import load_dotenv
 from intelligent_count import handle_question
 from stores_distance import generate_graph_context
+from store_locator import get_store_locator
+from intent import projection_intent
 
 from vector_search import run_query
+from clients import is_ready, readiness, warmup
+from answer_cache import cache_key, get_answer_cache
+from single_flight import collect_answer, get_single_flight
+from batch_ask import BATCH_ASK_MAX_QUESTIONS, answer_batch_jsonl, parse_items
+from embedding_cache import get_embedding_cache
+import metrics
+from metrics import timed
 load_dotenv()
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
-from llm import generate_gemini_response 
+from llm import GenerationError, generate_gemini_response, stream_gemini_response
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "change-me")  
@@ -29,6 +38,22 @@ CORS(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+metrics.register_cache("embedding", lambda: get_embedding_cache().stats())
+metrics.register_cache("answer", lambda: get_answer_cache().stats())
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # 200 once the worker's clients are warmed up (see gunicorn.conf.py)
+    if is_ready():
+        return jsonify({"status": "ready", "steps": readiness()})
+    return jsonify({"status": "warming", "steps": readiness()}), 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/user_location",  methods=["POST", "OPTIONS"])
 def user_location():
@@ -43,6 +68,109 @@ def user_location():
 
 
 
+@app.route("/stores/nearby", methods=["GET"])
+def stores_nearby():
+    # ?latitude=..&longitude=..&k=5&product=<vector_id or title> (repeatable: any of them)
+    try:
+        latitude  = float(request.args.get("latitude",  session.get("latitude")))
+        longitude = float(request.args.get("longitude", session.get("longitude")))
+        k = int(request.args.get("k", 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "latitude and longitude are required"}), 400
+    products = request.args.getlist("product") or None
+    return jsonify({"stores": get_store_locator().nearby(latitude, longitude, k, products)})
+
+
+def retrieve_context(question, latitude, longitude):
+    """Steps 2-5 of the RAG path, shared by /ask and /ask/stream."""
+    # 2. vector search, we'll get the datapoints, the emdedding
+    ids = run_query(question, 5) # datapoints = [...,...,...,...] vectors inside
+
+    # 3. Searching content from graph database, only the fields the intent needs
+    intent = projection_intent(question)
+    graph_records = fetch_graphrag_data(ids, query=FETCH_GRAPH_QUERY, intent=intent,
+                                        latitude=latitude, longitude=longitude)
+    
+    # 4. Calculate distance from user and stores + stores informations (where-to-buy only)
+    stores_information = ""
+    if intent in (None, "where_to_buy"):
+        with timed("generate_graph_context"):
+            stores_information = generate_graph_context(graph_records, latitude, longitude)
+    
+    # 5. text format for LLM, packed into the prompt token budget
+    with timed("format_graph_content"):
+        packed = pack_prompt_context(question, graph_records, stores_information, intent)
+
+    return graph_records, packed
+
+
+def ask_events(question, latitude, longitude):
+    """Steps 1-6 of /ask, as the events of its single flight (see single_flight.py)."""
+    answer_cache = get_answer_cache()
+
+    # 1. intelligent product count handler skip everything if product count question
+    structured_answer = handle_question(question)
+    if structured_answer:
+        metrics.inc("ask_requests_total", route="count")
+        answer_cache.set(question, latitude, longitude, {'answer': structured_answer})
+        yield "answer", {'answer': structured_answer}
+        yield "done", {}
+        return
+    
+    # 2-5. vector search → graph → stores → text format
+    graph_records, packed = retrieve_context(question, latitude, longitude)
+    
+    # 6. send every content to LLM
+    response = generate_gemini_response(question, packed.graph_context, packed.stores_information,
+                                        intent=packed.intent)
+    if not response.startswith("❌"):
+        answer_cache.set(question, latitude, longitude, {'answer': response})
+    metrics.inc("ask_requests_total", route="rag")
+    yield "answer", {'answer': response}
+    yield "done", {}
+
+
+def ask_stream_events(question, latitude, longitude):
+    """/ask/stream counterpart of ask_events: Gemini chunks as they are generated."""
+    answer_cache = get_answer_cache()
+
+    structured_answer = handle_question(question)
+    if structured_answer:
+        metrics.inc("ask_requests_total", route="count")
+        answer_cache.set(question, latitude, longitude, {'answer': structured_answer})
+        yield "answer", {'answer': structured_answer}
+        yield "done", {}
+        return
+
+    graph_records, packed = retrieve_context(question, latitude, longitude)
+    yield "retrieval", {"records": [
+        {k: r.get(k) for k in ("type", "title", "url")} for r in graph_records
+    ]}
+
+    parts, failed = [], False
+    for text in stream_gemini_response(question, packed.graph_context, packed.stores_information,
+                                       intent=packed.intent):
+        # an error after some chunks leaves a truncated answer: never cache it
+        failed = failed or isinstance(text, GenerationError)
+        parts.append(text)
+        yield "chunk", {"text": text}
+
+    response = "".join(parts)
+    if response and not failed:
+        answer_cache.set(question, latitude, longitude, {'answer': response})
+    metrics.inc("ask_requests_total", route="rag")
+    yield "done", {}
+
+
+def coalesced(endpoint, question, latitude, longitude, produce):
+    # identical questions from the same area already in flight → follow that run
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return produce(question, latitude, longitude)
+    return single_flight.events(endpoint, cache_key(question, latitude, longitude),
+                                lambda: produce(question, latitude, longitude))
+
+
 @app.route('/ask',  methods=["POST", "OPTIONS"])
 def ask():
     if request.method == "OPTIONS":  
@@ -52,34 +180,75 @@ def ask():
     question = data.get('question')  # user question
     latitude  = data.get("latitude")  # user lat
     longitude = data.get("longitude") # user long
-    
-    # 1. intelligent product count handler skip everything if product count question
-    structured_answer = handle_question(question)
-    if structured_answer:
-        return jsonify({'answer': structured_answer})
-    
-    # 2. vector search, we'll get the datapoints, the emdedding
-    ids = run_query(question, 5) # datapoints = [...,...,...,...] vectors inside
 
-    # 3. Searching content from graph database
-    graph_records = fetch_graphrag_data(ids, query=FETCH_GRAPH_QUERY)  
-    
-    # 4. Calculate distance from user and stores + stores informations 
-    stores_information = generate_graph_context(graph_records, latitude, longitude)
-    
-    
-    # 5. text format for LLM
-    graph_context = format_graph_content(graph_records)
-    
-    
-    # 6. send every content to LLM
-    response = generate_gemini_response(question, graph_context, stores_information)  
-    
-    return jsonify({'answer': response})
+    # 0. answer cache: same question from the same area → skip the whole pipeline
+    cached = get_answer_cache().get(question, latitude, longitude)
+    if cached:
+        metrics.inc("ask_requests_total", route="cache")
+        return jsonify(cached)
+
+    # 1-6. count router or RAG, once per identical in-flight question
+    return jsonify(collect_answer(coalesced("ask", question, latitude, longitude, ask_events)))
+
 
+def sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/ask/stream',  methods=["POST", "OPTIONS"])
+def ask_stream():
+    """
+    Server-Sent Events variant of /ask:
+      event: retrieval  → records found (type, title, url), sent as soon as retrieval is done
+      event: chunk      → {"text": ...} Gemini chunks as they arrive
+      event: answer     → {"answer": ...} complete answer (count questions / cache hits)
+      event: done       → end of stream
+    """
+    if request.method == "OPTIONS":  
+        return '', 204
+    data   = request.get_json(silent=True) or {}
+
+    question = data.get('question')
+    latitude  = data.get("latitude")
+    longitude = data.get("longitude")
+
+    def events():
+        cached = get_answer_cache().get(question, latitude, longitude)
+        if cached:
+            metrics.inc("ask_requests_total", route="cache")
+            yield sse("answer", cached)
+            yield sse("done", {})
+            return
+
+        for event, payload in coalesced("ask_stream", question, latitude, longitude, ask_stream_events):
+            yield sse(event, payload)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+
+@app.route('/ask/batch',  methods=["POST", "OPTIONS"])
+def ask_batch():
+    """
+    Many questions in one request (evaluation / FAQ jobs), answered as JSON lines
+    when ready: {"index", "id", "question", "route", "answer"}. See batch_ask.py.
+    """
+    if request.method == "OPTIONS":  
+        return '', 204
+    data  = request.get_json(silent=True) or {}
+    items = parse_items(data.get("questions") or [], data.get("latitude"), data.get("longitude"))
+    if not items or len(items) > BATCH_ASK_MAX_QUESTIONS:
+        return jsonify({"error": f"1 to {BATCH_ASK_MAX_QUESTIONS} questions are required"}), 400
 
+    return Response(stream_with_context(answer_batch_jsonl(items)), mimetype="application/x-ndjson")
 
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8080))
+    warmup()
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+ASGI entry point running the async /ask pipeline (async_pipeline.py).
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+Serves /ask, /ask/stream, /ask/batch, /user_location, /stores/nearby, /ready and /metrics with the
+same payloads as app.py (the location sent to /user_location is kept in a signed session cookie, like
+Flask's); one worker handles many concurrent requests on its event loop.
+"""
+
+import asyncio, json, os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from async_pipeline import ask_async, ask_stream_async
+from answer_cache import get_answer_cache
+from batch_ask import BATCH_ASK_MAX_QUESTIONS, answer_batch_jsonl, parse_items
+from clients import aclose_all, is_ready, readiness, warmup
+from embedding_cache import get_embedding_cache
+from store_locator import get_store_locator
+import metrics
+
+metrics.register_cache("embedding", lambda: get_embedding_cache().stats())
+metrics.register_cache("answer", lambda: get_answer_cache().stats())
+
+
+async def _payload(request: Request) -> dict:
+    try:
+        return await request.json() or {}
+    except Exception:
+        return {}
+
+
+def sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def ask(request: Request):
+    if request.method == "OPTIONS":
+        return Response(status_code=204)
+    data = await _payload(request)
+    answer = await ask_async(data.get("question"), data.get("latitude"), data.get("longitude"))
+    return JSONResponse(answer)
+
+
+async def ask_stream(request: Request):
+    if request.method == "OPTIONS":
+        return Response(status_code=204)
+    data = await _payload(request)
+
+    async def events():
+        async for event, payload in ask_stream_async(
+            data.get("question"), data.get("latitude"), data.get("longitude")
+        ):
+            yield sse(event, payload)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def ask_batch(request: Request):
+    if request.method == "OPTIONS":
+        return Response(status_code=204)
+    data = await _payload(request)
+    items = parse_items(data.get("questions") or [], data.get("latitude"), data.get("longitude"))
+    if not items or len(items) > BATCH_ASK_MAX_QUESTIONS:
+        return JSONResponse({"error": f"1 to {BATCH_ASK_MAX_QUESTIONS} questions are required"}, status_code=400)
+    # blocking generator: Starlette iterates it in its thread pool
+    return StreamingResponse(answer_batch_jsonl(items), media_type="application/x-ndjson")
+
+
+async def user_location(request: Request):
+    if request.method == "OPTIONS":
+        return Response(status_code=204)
+    payload = await _payload(request)
+    request.session["latitude"] = payload.get("latitude")
+    request.session["longitude"] = payload.get("longitude")
+    return JSONResponse({"status": "ok"})
+
+
+async def stores_nearby(request: Request):
+    params = request.query_params
+    try:
+        latitude = float(params.get("latitude", request.session.get("latitude")))
+        longitude = float(params.get("longitude", request.session.get("longitude")))
+        k = int(params.get("k", 5))
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "latitude and longitude are required"}, status_code=400)
+    products = params.getlist("product") or None
+    locator = await asyncio.to_thread(get_store_locator)
+    return JSONResponse({"stores": locator.nearby(latitude, longitude, k, products)})
+
+
+async def ready(request: Request):
+    if is_ready():
+        return JSONResponse({"status": "ready", "steps": readiness()})
+    return JSONResponse({"status": "warming", "steps": readiness()}, status_code=503)
+
+
+async def metrics_endpoint(request: Request):
+    # the embedding-cache stats count the SQLite rows: off the event loop
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Under plain uvicorn there is no post_worker_init hook: warm up here.
+    if not is_ready():
+        await asyncio.to_thread(warmup)
+    yield
+    await aclose_all()
+
+
+app = Starlette(
+    routes=[
+        Route("/ask", ask, methods=["POST", "OPTIONS"]),
+        Route("/ask/stream", ask_stream, methods=["POST", "OPTIONS"]),
+        Route("/ask/batch", ask_batch, methods=["POST", "OPTIONS"]),
+        Route("/user_location", user_location, methods=["POST", "OPTIONS"]),
+        Route("/stores/nearby", stores_nearby, methods=["GET"]),
+        Route("/ready", ready, methods=["GET"]),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(
+            SessionMiddleware,
+            secret_key=os.getenv("FLASK_SECRET_KEY", "change-me"),
+            same_site="none",
+            https_only=True,
+        ),
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["https://nestle-ui-158884498350.us-central1.run.app"],
+            allow_credentials=True,
+            allow_methods=["GET", "POST", "OPTIONS"],
+            allow_headers=["Content-Type", "Authorization"],
+        )
+    ],
+    lifespan=lifespan,
+)
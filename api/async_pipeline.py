@@ -0,0 +1,166 @@
+"""
+asyncio version of the /ask pipeline (served by asgi.py).
+
+Compared to app.ask:
+    • the question embedding + neighbor search start speculatively while the
+      structured-count router runs, and are cancelled if a count answer wins
+      (the only stages that overlap within one request);
+    • the later stages depend on each other and run in order — graph fetch
+      (async Neo4j driver, or the embedded graph in a worker thread), then
+      store context and context packing in one worker-thread call — so the
+      event loop stays free for other requests;
+    • identical questions from the same area arriving while one is being
+      answered follow that run instead of starting their own (single_flight.py).
+Many requests share one event loop per worker instead of one blocking
+request per sync gunicorn worker.
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from answer_cache import cache_key, get_answer_cache
+from graph_query import FETCH_GRAPH_QUERY
+from graph_search import fetch_graphrag_data_async
+from intent import projection_intent
+from intelligent_count import handle_question
+from context_packer import PackedContext
+from llm import (GenerationError, pack_prompt_context, generate_gemini_response_async,
+                 stream_gemini_response_async)
+from metrics import inc, timed
+from single_flight import collect_answer, get_async_single_flight
+from stores_distance import generate_graph_context
+from vector_search import run_query_async
+
+TOP_K = 5
+
+
+def _prompt_context(question: str, graph_records: List[Dict], latitude, longitude, intent) -> PackedContext:
+    """Store context (where-to-buy) then packing, both sync: one worker-thread hop."""
+    stores_information = ""
+    if intent in (None, "where_to_buy"):
+        with timed("generate_graph_context"):
+            stores_information = generate_graph_context(graph_records, latitude, longitude)
+    with timed("format_graph_content"):
+        return pack_prompt_context(question, graph_records, stores_information, intent)
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+
+
+async def route_question(question: str) -> Tuple[Optional[str], Optional[asyncio.Task]]:
+    """
+    Runs the count router (sync, may hit Neo4j → worker thread) while the
+    neighbor search starts speculatively. Returns (count_answer, None) or
+    (None, neighbor_search_task).
+    """
+    search = asyncio.create_task(run_query_async(question, TOP_K))
+    try:
+        structured_answer = await asyncio.to_thread(handle_question, question)
+    except BaseException:
+        await _cancel(search)
+        raise
+    if structured_answer:
+        await _cancel(search)
+        return structured_answer, None
+    return None, search
+
+
+async def retrieve_context_async(search: asyncio.Task, question: str, latitude, longitude) -> Tuple[List[Dict], PackedContext]:
+    ids = await search
+    intent = projection_intent(question)
+    graph_records = await fetch_graphrag_data_async(ids, query=FETCH_GRAPH_QUERY, intent=intent,
+                                                    latitude=latitude, longitude=longitude)
+    packed = await asyncio.to_thread(_prompt_context, question, graph_records, latitude, longitude, intent)
+    return graph_records, packed
+
+
+async def _ask_events(question: str, latitude, longitude) -> AsyncIterator[Tuple[str, Dict]]:
+    """Count router or RAG for ask_async, as the events of its single flight."""
+    answer_cache = get_answer_cache()
+    structured_answer, search = await route_question(question)
+    if structured_answer:
+        inc("ask_requests_total", route="count")
+        await answer_cache.aset(question, latitude, longitude, {"answer": structured_answer})
+        yield "answer", {"answer": structured_answer}
+        yield "done", {}
+        return
+
+    _, packed = await retrieve_context_async(search, question, latitude, longitude)
+    response = await generate_gemini_response_async(question, packed.graph_context, packed.stores_information,
+                                                    intent=packed.intent)
+    if not response.startswith("❌"):
+        await answer_cache.aset(question, latitude, longitude, {"answer": response})
+    inc("ask_requests_total", route="rag")
+    yield "answer", {"answer": response}
+    yield "done", {}
+
+
+async def _ask_stream_events(question: str, latitude, longitude) -> AsyncIterator[Tuple[str, Dict]]:
+    answer_cache = get_answer_cache()
+    structured_answer, search = await route_question(question)
+    if structured_answer:
+        inc("ask_requests_total", route="count")
+        await answer_cache.aset(question, latitude, longitude, {"answer": structured_answer})
+        yield "answer", {"answer": structured_answer}
+        yield "done", {}
+        return
+
+    graph_records, packed = await retrieve_context_async(search, question, latitude, longitude)
+    yield "retrieval", {"records": [
+        {k: r.get(k) for k in ("type", "title", "url")} for r in graph_records
+    ]}
+
+    parts, failed = [], False
+    async for text in stream_gemini_response_async(question, packed.graph_context, packed.stores_information,
+                                                   intent=packed.intent):
+        # an error after some chunks leaves a truncated answer: never cache it
+        failed = failed or isinstance(text, GenerationError)
+        parts.append(text)
+        yield "chunk", {"text": text}
+
+    response = "".join(parts)
+    if response and not failed:
+        await answer_cache.aset(question, latitude, longitude, {"answer": response})
+    inc("ask_requests_total", route="rag")
+    yield "done", {}
+
+
+async def _coalesced(endpoint: str, question: str, latitude, longitude, produce) -> AsyncIterator[Tuple[str, Dict]]:
+    # identical questions from the same area already in flight → follow that run
+    single_flight = get_async_single_flight()
+    if single_flight is None:
+        events = produce(question, latitude, longitude)
+    else:
+        # the key may wait for the graph import stamp: off the event loop
+        key = await asyncio.to_thread(cache_key, question, latitude, longitude)
+        events = single_flight.events(endpoint, key, lambda: produce(question, latitude, longitude))
+    async for event in events:
+        yield event
+
+
+async def ask_async(question: str, latitude=None, longitude=None) -> Dict[str, str]:
+    cached = await get_answer_cache().aget(question, latitude, longitude)
+    if cached:
+        inc("ask_requests_total", route="cache")
+        return cached
+
+    events = _coalesced("ask", question, latitude, longitude, _ask_events)
+    return collect_answer([event async for event in events])
+
+
+async def ask_stream_async(question: str, latitude=None, longitude=None) -> AsyncIterator[Tuple[str, Dict]]:
+    """Yields (event, payload) pairs, same events as app.ask_stream."""
+    cached = await get_answer_cache().aget(question, latitude, longitude)
+    if cached:
+        inc("ask_requests_total", route="cache")
+        yield "answer", cached
+        yield "done", {}
+        return
+
+    async for event in _coalesced("ask_stream", question, latitude, longitude, _ask_stream_events):
+        yield event
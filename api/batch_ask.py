@@ -0,0 +1,212 @@
+"""
+Bulk question answering for evaluation and FAQ pre-generation jobs.
+
+    POST /ask/batch   {"questions": ["…", {"id": "faq-12", "question": "…", "latitude": …}, …],
+                       "latitude": …, "longitude": …}          # default location
+    python api/batch_ask.py questions.txt > answers.jsonl     # one question (or JSON object) per line
+
+Same answers as /ask, with the per-question round-trips grouped per stage:
+    1. answer cache, then the count router (facet index, in memory) for every
+       question, on one data-version read (intelligent_count.handle_questions);
+    2. the remaining questions are embedded in batched calls (embedding-cache
+       misses only) and their neighbors found with multi-query find_neighbors calls;
+    3. one graph fetch over the union of every neighbor id, projected and
+       packed per question (intent, location) like retrieve_context;
+    4. Gemini generations with at most BATCH_ASK_CONCURRENCY in flight.
+Identical questions from the same area (answer-cache key) are answered once.
+
+Results are yielded as JSON lines as soon as each answer is ready, so not in
+input order: {"index", "id", "question", "route": cache|count|rag, "answer"}.
+An invalid entry (not a question string or object, or an object without a
+non-empty string "question") gets {"index", "id", "question", "route": "error",
+"error"} and the others are still answered.
+"""
+
+import json, os, sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+from answer_cache import cache_key, current_data_version, get_answer_cache
+from embedding_cache import get_embedding_cache
+from graph_query import FETCH_GRAPH_QUERY
+from graph_search import fetch_graphrag_data, parse_location, project_record
+from intelligent_count import handle_questions
+from intent import projection_intent
+from llm import generate_gemini_response, pack_prompt_context
+from metrics import inc, timed
+from stores_distance import generate_graph_context
+from vector_search import TOP_K, VECTOR_BACKEND, embed_queries_uncached, find_neighbors_batch
+
+load_dotenv()
+BATCH_ASK_CONCURRENCY   = int(os.getenv("BATCH_ASK_CONCURRENCY", "4"))
+BATCH_ASK_MAX_QUESTIONS = int(os.getenv("BATCH_ASK_MAX_QUESTIONS", "1000"))
+# Items per embedding / find_neighbors call (text-embedding-004 takes up to 250 texts)
+VECTOR_CALL_SIZE = 100
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_items(questions: Iterable[Any], latitude=None, longitude=None) -> List[Dict[str, Any]]:
+    """
+    Questions as strings or {"question", "id", "latitude", "longitude"} dicts,
+    with the default location. Every entry is kept, so results carry its input
+    position; an invalid one is flagged with an "error" and never answered.
+    """
+    items = []
+    for q in questions:
+        if isinstance(q, dict):
+            item = dict(q)
+        elif isinstance(q, str):
+            item = {"question": q}
+        else:
+            item = {"question": q, "error": "a question must be a string or an object"}
+        question = item.get("question")
+        if "error" not in item and (not isinstance(question, str) or not question.strip()):
+            item["error"] = '"question" must be a non-empty string'
+        item.setdefault("latitude", latitude)
+        item.setdefault("longitude", longitude)
+        items.append(item)
+    return items
+
+# ──────────────────────────────────────────────────────────────
+# Stages
+# ──────────────────────────────────────────────────────────────
+def embed_questions(questions: List[str]) -> List[List[float]]:
+    cache = get_embedding_cache()
+    vectors = [cache.get(q) for q in questions]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    with timed("embed_query", route="batch"):
+        for chunk in _chunks(missing, VECTOR_CALL_SIZE):
+            for i, vector in zip(chunk, embed_queries_uncached([questions[i] for i in chunk])):
+                cache.set(questions[i], vector)
+                vectors[i] = vector
+    return vectors
+
+
+def find_neighbors(vectors: List[List[float]], num_neighbors: int = TOP_K) -> List[List[str]]:
+    with timed("find_neighbors", route="batch"):
+        if VECTOR_BACKEND == "local":
+            from local_index import get_local_index
+            index = get_local_index()
+            return [index.query_ids(v, num_neighbors) for v in vectors]
+        ids: List[List[str]] = []
+        for chunk in _chunks(vectors, VECTOR_CALL_SIZE):
+            ids.extend(find_neighbors_batch([(v, num_neighbors) for v in chunk]))
+        return ids
+
+
+def fetch_records(neighbor_ids: List[List[str]]) -> Dict[str, List[Dict]]:
+    """Full records of every neighbor id, from one graph fetch, grouped by id."""
+    union = list(dict.fromkeys(vid for ids in neighbor_ids for vid in ids))
+    by_id: Dict[str, List[Dict]] = {}
+    if union:
+        for record in fetch_graphrag_data(union, query=FETCH_GRAPH_QUERY):
+            by_id.setdefault(record.get("id"), []).append(record)
+    return by_id
+
+
+def prompt_context(item: Dict[str, Any], ids: List[str], by_id: Dict[str, List[Dict]]):
+    """retrieve_context steps 3-5 on records already fetched."""
+    question = item["question"]
+    latitude, longitude = parse_location(item.get("latitude"), item.get("longitude"))
+    records = [r for vid in ids for r in by_id.get(vid, [])]
+    intent = projection_intent(question)
+    if intent:
+        records = [project_record(r, intent, latitude, longitude) for r in records]
+    stores_information = ""
+    if intent in (None, "where_to_buy"):
+        stores_information = generate_graph_context(records, item.get("latitude"), item.get("longitude"))
+    return pack_prompt_context(question, records, stores_information, intent)
+
+# ──────────────────────────────────────────────────────────────
+# Batch
+# ──────────────────────────────────────────────────────────────
+def answer_batch(items: List[Dict[str, Any]], concurrency: int = BATCH_ASK_CONCURRENCY) -> Iterator[Dict[str, Any]]:
+    """Yields one result per item (see the module docstring), as answers become ready."""
+    def results(indices: List[int], route: str, answer: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for idx in indices:
+            if route != "error":
+                inc("ask_requests_total", route=route)
+            yield {"index": idx, "id": items[idx].get("id"), "question": items[idx].get("question"),
+                   "route": route, **answer}
+
+    # identical questions from the same area → answered once
+    version = current_data_version()
+    groups: Dict[str, List[int]] = {}
+    for idx, item in enumerate(items):
+        if item.get("error"):
+            yield from results([idx], "error", {"error": item["error"]})
+            continue
+        key = cache_key(item["question"], item.get("latitude"), item.get("longitude"), version)
+        groups.setdefault(key, []).append(idx)
+
+    # 1. answer cache, then the count router over every uncached question at once
+    answer_cache = get_answer_cache()
+    uncached: List[Tuple[Dict[str, Any], List[int]]] = []
+    for indices in groups.values():
+        item = items[indices[0]]
+        cached = answer_cache.get(item["question"], item.get("latitude"), item.get("longitude"), version)
+        if cached:
+            yield from results(indices, "cache", cached)
+        else:
+            uncached.append((item, indices))
+
+    rag: List[Tuple[Dict[str, Any], List[int]]] = []
+    answers = handle_questions([item["question"] for item, _ in uncached], version)
+    for (item, indices), structured_answer in zip(uncached, answers):
+        if structured_answer:
+            answer_cache.set(item["question"], item.get("latitude"), item.get("longitude"),
+                             {"answer": structured_answer}, version)
+            yield from results(indices, "count", {"answer": structured_answer})
+        else:
+            rag.append((item, indices))
+    if not rag:
+        return
+
+    # 2-3. batched embeddings and neighbor searches, one graph fetch
+    neighbor_ids = find_neighbors(embed_questions([item["question"] for item, _ in rag]))
+    by_id = fetch_records(neighbor_ids)
+
+    # 4. Gemini, bounded concurrency
+    def generate(item: Dict[str, Any], ids: List[str]) -> str:
+        with timed("format_graph_content", route="batch"):
+            packed = prompt_context(item, ids, by_id)
+        response = generate_gemini_response(item["question"], packed.graph_context, packed.stores_information,
+                                            intent=packed.intent)
+        if not response.startswith("❌"):
+            answer_cache.set(item["question"], item.get("latitude"), item.get("longitude"),
+                             {"answer": response}, version)
+        return response
+
+    with ThreadPoolExecutor(max(1, concurrency), thread_name_prefix="batch-ask") as pool:
+        futures = {pool.submit(generate, item, ids): indices for (item, indices), ids in zip(rag, neighbor_ids)}
+        for future in as_completed(futures):
+            try:
+                answer = {"answer": future.result()}
+            except Exception as e:
+                # one failed question must not end the stream for the others
+                yield from results(futures[future], "error", {"error": f"❌ Error generating response: {e}"})
+                continue
+            yield from results(futures[future], "rag", answer)
+
+
+def answer_batch_jsonl(items: List[Dict[str, Any]], concurrency: int = BATCH_ASK_CONCURRENCY) -> Iterator[str]:
+    for result in answer_batch(items, concurrency):
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python api/batch_ask.py questions.txt [latitude longitude] > answers.jsonl")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    questions = [json.loads(line) if line.startswith("{") else line for line in lines]
+    location = [float(v) for v in sys.argv[2:4]] or [None, None]
+    for line in answer_batch_jsonl(parse_items(questions, *location)):
+        sys.stdout.write(line)
+        sys.stdout.flush()
@@ -0,0 +1,277 @@
+"""
+Process-wide client registry.
+
+Every external client (Vertex embedding model, MatchService, Neo4j driver,
+Gemini) is created once per worker, reused by every request and closed on
+shutdown. `warmup()` is called by gunicorn's `post_worker_init` hook (see
+gunicorn.conf.py) so TLS handshakes and model handles are ready before the
+worker accepts traffic; `/ready` reports the result per step. Failed steps
+are retried in the background, at most every WARMUP_RETRY_SECONDS, while
+the worker is polled for readiness.
+"""
+
+import atexit, os, threading, time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Union
+
+from dotenv import load_dotenv
+from google import genai
+from google.cloud import aiplatform_v1
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
+
+if TYPE_CHECKING:
+    from fake_gemini import FakeGeminiClient
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+load_dotenv()
+NEO4J_URI       = os.getenv("NEO4J_URI")
+NEO4J_USER      = os.getenv("NEO4J_USERNAME", "neo4j")
+NEO4J_PWD       = os.getenv("NEO4J_PASSWORD")
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "10"))
+API_ENDPOINT    = os.getenv("API_ENDPOINT")
+VECTOR_BACKEND  = os.getenv("VECTOR_BACKEND", "vertex").lower()
+GEMINI_API      = os.getenv("GEMINI_API")
+GEMINI_CLIENT   = os.getenv("GEMINI_CLIENT", "genai").lower()  # genai | fake (fake_gemini.py)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+EMBEDDING_MODEL = "text-embedding-004"
+GEMINI_MODEL    = "gemini-2.0-flash"
+
+# ──────────────────────────────────────────────────────────────
+# 2) Registry
+# ──────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_status: Dict[str, bool] = {}        # warmup step → succeeded
+_last_warmup = 0.0
+_retrying = threading.Lock()
+_warm_vector = None
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def get_embedding_model() -> TextEmbeddingModel:
+    return _get("embedding", lambda: TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL))
+
+
+def get_match_client() -> aiplatform_v1.MatchServiceClient:
+    return _get(
+        "match",
+        lambda: aiplatform_v1.MatchServiceClient(client_options={"api_endpoint": API_ENDPOINT}),
+    )
+
+
+def get_neo4j_driver():
+    return _get(
+        "neo4j",
+        lambda: GraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PWD),
+            max_connection_pool_size=NEO4J_POOL_SIZE,
+        ),
+    )
+
+
+def _genai_client() -> Union[genai.Client, "FakeGeminiClient"]:
+    if GEMINI_CLIENT == "fake":
+        from fake_gemini import FakeGeminiClient
+        return FakeGeminiClient()
+    return genai.Client(api_key=GEMINI_API)
+
+
+def get_genai_client() -> Union[genai.Client, "FakeGeminiClient"]:
+    """Gemini client, or the in-process stand-in when GEMINI_CLIENT=fake."""
+    return _get("genai", _genai_client)
+
+
+# Async clients (ASGI mode, see async_pipeline.py). They bind to the running
+# event loop, so they are created lazily from inside it and closed by
+# `aclose_all()` from the ASGI lifespan. Gemini's async API is `client.aio`.
+def get_async_match_client() -> aiplatform_v1.MatchServiceAsyncClient:
+    return _get(
+        "match_async",
+        lambda: aiplatform_v1.MatchServiceAsyncClient(client_options={"api_endpoint": API_ENDPOINT}),
+    )
+
+
+def get_async_neo4j_driver():
+    return _get(
+        "neo4j_async",
+        lambda: AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PWD),
+            max_connection_pool_size=NEO4J_POOL_SIZE,
+        ),
+    )
+
+# ──────────────────────────────────────────────────────────────
+# 3) Lifecycle
+# ──────────────────────────────────────────────────────────────
+def _warm_embedding() -> None:
+    global _warm_vector
+    _warm_vector = get_embedding_model().get_embeddings(
+        [TextEmbeddingInput(text="warmup", task_type="RETRIEVAL_QUERY")]
+    )[0].values
+
+
+def _warm_match() -> None:
+    if _warm_vector is None:
+        raise RuntimeError("no warmup embedding to query with")
+    from vector_search import INDEX_ENDPOINT, DEPLOYED_INDEX_ID
+    get_match_client().find_neighbors(
+        request=aiplatform_v1.FindNeighborsRequest(
+            index_endpoint=INDEX_ENDPOINT,
+            deployed_index_id=DEPLOYED_INDEX_ID,
+            queries=[aiplatform_v1.FindNeighborsRequest.Query(
+                datapoint=aiplatform_v1.IndexDatapoint(feature_vector=_warm_vector),
+                neighbor_count=1,
+            )],
+        )
+    )
+
+
+def _warm_local_index() -> None:
+    from local_index import get_local_index
+    get_local_index()
+
+
+def _warm_graph_engine() -> None:
+    from graph_engine import get_graph_engine
+    get_graph_engine()
+
+
+def _warm_count_router() -> None:
+    """Builds the entity matcher (and the facet index) the first count question would build."""
+    from answer_cache import current_data_version
+    from entity_matcher import get_entity_matcher
+    from intelligent_count import FACET_ENGINE
+    version = current_data_version()
+    get_entity_matcher(version)
+    if FACET_ENGINE:
+        from facets import get_facet_index
+        get_facet_index(version)
+
+
+def _warmup_steps() -> Dict[str, Callable[[], Any]]:
+    """Warmup step → cheap call on that client, for the configured backends (in order)."""
+    from graph_engine import GRAPH_BACKEND
+
+    steps: Dict[str, Callable[[], Any]] = {"embedding": _warm_embedding}
+    if VECTOR_BACKEND == "local":
+        steps["local_index"] = _warm_local_index
+    else:
+        steps["match"] = _warm_match
+    if GRAPH_BACKEND == "embedded":
+        steps["graph_engine"] = _warm_graph_engine
+    else:
+        steps["neo4j"] = lambda: get_neo4j_driver().verify_connectivity()
+    # after the graph steps: the matcher vocabulary and the facet index are read from the graph
+    steps["count_router"] = _warm_count_router
+    steps["genai"] = lambda: get_genai_client().models.get(model=GEMINI_MODEL)
+    return steps
+
+
+def warmup(names=None) -> Dict[str, float]:
+    """
+    Creates every client and exercises one cheap call on each so the
+    connections are open before the first request (only the steps in
+    `names` when given). Returns the time spent per step (seconds). A
+    failing step does not block the others.
+    """
+    global _last_warmup
+    timings: Dict[str, float] = {}
+    for name, fn in _warmup_steps().items():
+        if names is not None and name not in names:
+            continue
+        t0 = time.perf_counter()
+        try:
+            fn()
+            _status[name] = True
+        except Exception as e:
+            _status[name] = False
+            print(f"❌ Warmup {name} failed: {e}")
+        finally:
+            timings[name] = time.perf_counter() - t0
+    _last_warmup = time.monotonic()
+
+    print("🔥 Warmup " + ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in timings.items()))
+    return timings
+
+
+def _retry_failed() -> None:
+    if time.monotonic() - _last_warmup < WARMUP_RETRY_SECONDS or not _retrying.acquire(blocking=False):
+        return
+    failed = [name for name, ok in _status.items() if not ok]
+
+    def run():
+        try:
+            warmup(failed)
+        finally:
+            _retrying.release()
+
+    threading.Thread(target=run, name="warmup-retry", daemon=True).start()
+
+
+def readiness() -> Dict[str, bool]:
+    """Warmup step → succeeded (empty until the first warmup)."""
+    return dict(_status)
+
+
+def is_ready() -> bool:
+    if not _status:
+        return False
+    if all(_status.values()):
+        return True
+    _retry_failed()
+    return False
+
+
+def close_all() -> None:
+    """Closes every client created by this worker (idempotent)."""
+    _status.clear()
+    with _lock:
+        clients = dict(_clients)
+        _clients.clear()
+
+    closers = {
+        "neo4j": lambda c: c.close(),
+        "match": lambda c: c.transport.close(),
+        "genai": lambda c: getattr(c, "close", lambda: None)(),
+    }
+    for name, client in clients.items():
+        closer = closers.get(name)
+        if closer is None:
+            continue
+        try:
+            closer(client)
+        except Exception as e:
+            print(f"⚠️  Closing {name} failed: {e}")
+
+
+async def aclose_all() -> None:
+    """Closes the async clients (must run on the loop that created them)."""
+    for name in ("neo4j_async", "match_async"):
+        with _lock:
+            client = _clients.pop(name, None)
+        if client is None:
+            continue
+        try:
+            if name == "neo4j_async":
+                await client.close()
+            else:
+                await client.transport.close()
+        except Exception as e:
+            print(f"⚠️  Closing {name} failed: {e}")
+
+
+atexit.register(close_all)
@@ -1,15 +1,29 @@
 import json
 from pathlib import Path
 from typing import List, Dict
+from vector_store import get_vector_store
 
 def find_datapoint_contents(folder_path: str, datapoint_ids: List[str]) -> Dict[str, str]:
     """
     Searches for content associated with a list of datapoint_ids in JSON files in a folder.
+    When a packed vector store exists, ids are resolved by offset lookup instead.
 
     :param folder_path: Path to the folder containing the JSON files
     :param datapoint_ids: List of IDs to search for
     :return: Dictionary {id: content}
     """
+    store = get_vector_store()
+    if store is not None:
+        found_contents = {}
+        for dp_id in datapoint_ids:
+            doc = store.get(dp_id)
+            if doc:
+                found_contents[dp_id] = {
+                    "content": doc.get("content") or "(content not found)",
+                    "url": doc.get("metadata", {}).get("url")
+                }
+        return found_contents
+
     folder = Path(folder_path)
     found_contents = {}
 
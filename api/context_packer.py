@@ -0,0 +1,138 @@
+"""
+Token-budgeted packing of the GraphRAG context sent to Gemini.
+
+Records arrive in retrieval order (most relevant first). Each one is
+formatted like llm.format_graph_content, with its fields capped per intent
+(a "detail" question keeps the nutrition facts and ingredients, a
+"where_to_buy" one only needs the title and URL). Records are then packed
+into the token budget in order; a record that does not fit is shrunk by
+dropping its low-value fields first, and once even its title does not fit
+it and every less relevant record are left out. For where-to-buy the store
+lines are packed before the records.
+
+Tokens are estimated locally (~4 characters per token for Gemini on
+English text); Gemini's own prompt_token_count is logged after the call.
+"""
+
+import math
+from typing import Dict, List, NamedTuple, Tuple
+
+CHARS_PER_TOKEN = 4
+
+# Per-intent token cap of each field, in drop order (first dropped first);
+# 0 = never sent. Title and URL are always kept.
+FIELD_LIMITS: Dict[str, Dict[str, int]] = {
+    "general":      {"nutrition_value": 0,   "ingredients": 40,  "description": 80},
+    "detail":       {"description": 40,      "ingredients": 160, "nutrition_value": 200},
+    "where_to_buy": {"nutrition_value": 0,   "ingredients": 0,   "description": 30},
+}
+# Share of the context budget the store lines may take (where-to-buy)
+STORES_SHARE = 0.5
+# Answer length per intent (Gemini max_output_tokens)
+MAX_OUTPUT_TOKENS = {"general": 600, "detail": 450, "where_to_buy": 800}
+
+
+class PackedContext(NamedTuple):
+    graph_context: str
+    stores_information: str
+    intent: str
+    tokens: int        # estimated tokens of both contexts
+    records: int       # records kept
+    dropped: int       # records left out
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _truncate_text(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max_tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;.") + "…"
+
+
+def _truncate_list(items: List[str], max_tokens: int) -> List[str]:
+    kept, used = [], 0
+    for item in items:
+        used += estimate_tokens(item) + 1
+        if used > max_tokens:
+            return kept + ["…"] if kept else []
+        kept.append(item)
+    return kept
+
+
+def _fields(record: Dict, intent: str) -> Dict[str, str]:
+    """Capped field texts of a record, in drop order."""
+    fields = {}
+    for field, limit in FIELD_LIMITS[intent].items():
+        value = record.get(field)
+        if not value or not limit:
+            continue
+        if field == "description":
+            fields[field] = f"Description: {_truncate_text(value, limit)}"
+        elif field == "nutrition_value":
+            kept = _truncate_list(value, limit)
+            if kept:
+                fields[field] = "Nutrition value: " + "; ".join(kept)
+        elif field == "ingredients":
+            kept = _truncate_list(value, limit)
+            if kept:
+                fields[field] = "Ingredients: " + ", ".join(kept)
+    return fields
+
+
+def _line(idx: int, record: Dict, fields: Dict[str, str]) -> str:
+    # same layout as llm.format_graph_content
+    parts = [f"{idx}. Category: {record['type']} | Title: {record.get('title', '')}"]
+    parts += [fields[f] for f in ("description", "nutrition_value", "ingredients") if f in fields]
+    if record.get("url"):
+        parts.append(f"URL: {record['url']}")
+    return " | ".join(parts)
+
+
+def _pack_lines(lines: List[str], budget: int) -> Tuple[List[str], int]:
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+def pack_context(records: List[Dict], stores_information: str, intent: str, budget: int) -> PackedContext:
+    intent = intent if intent in FIELD_LIMITS else "general"
+    budget = max(budget, 0)
+
+    store_lines, stores_used = [], 0
+    if stores_information:
+        share = budget if not records else int(budget * STORES_SHARE)
+        store_lines, stores_used = _pack_lines(stores_information.split("\n"), share)
+    remaining = budget - stores_used
+
+    lines: List[str] = []
+    for record in records:
+        idx = len(lines) + 1
+        fields = _fields(record, intent)
+        line = _line(idx, record, fields)
+        for field in list(fields):            # shrink: low-value fields first
+            if estimate_tokens(line) + 1 <= remaining:
+                break
+            del fields[field]
+            line = _line(idx, record, fields)
+        cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            break                             # this and every less relevant record
+        lines.append(line)
+        remaining -= cost
+
+    return PackedContext(
+        graph_context="\n".join(lines),
+        stores_information="\n".join(store_lines),
+        intent=intent,
+        tokens=budget - remaining,
+        records=len(lines),
+        dropped=len(records) - len(lines),
+    )
@@ -0,0 +1,142 @@
+"""
+Query-embedding cache.
+
+Repeated questions ("kitkat recipes", "where to buy nescafe") skip the
+text-embedding-004 round-trip. Entries are keyed by the normalized question
+(intelligent_count.normalize_question) and the model name, kept in a bounded
+LRU with TTL and, optionally, in a local SQLite file that survives restarts.
+
+Usage:
+    python api/embedding_cache.py seed questions.txt   # one question per line
+    python api/embedding_cache.py stats
+"""
+
+import array, os, sqlite3, sys, threading, time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from cache import LRUCache
+from intelligent_count import normalize_question
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+load_dotenv()
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL  = float(os.getenv("EMBED_CACHE_TTL", "86400"))   # seconds, 0 = never
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")                # SQLite file, "" = memory only
+EMBEDDING_MODEL  = "text-embedding-004"
+
+# ──────────────────────────────────────────────────────────────
+# 2) Cache
+# ──────────────────────────────────────────────────────────────
+class EmbeddingCache:
+    def __init__(self, maxsize: int = EMBED_CACHE_SIZE, ttl: float = EMBED_CACHE_TTL,
+                 path: Optional[str] = EMBED_CACHE_PATH or None, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize, ttl)
+        self.disk_hits = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL,"
+                " created REAL NOT NULL, PRIMARY KEY (key, model))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(question: str) -> str:
+        return normalize_question(question or "")
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get_memory(self, question: str) -> Optional[List[float]]:
+        """In-memory lookup only (no disk I/O): safe on an event loop."""
+        return self.memory.get(self.key(question))
+
+    def get(self, question: str) -> Optional[List[float]]:
+        key = self.key(question)
+        vector = self.memory.get(key)
+        if vector is not None or self._db is None:
+            return vector
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ? AND model = ?",
+                (key, self.model),
+            ).fetchone()
+            if row is None:
+                return None
+            age = time.time() - row[1]
+            if self.ttl and age >= self.ttl:
+                self._db.execute("DELETE FROM embeddings WHERE key = ? AND model = ?", (key, self.model))
+                self._db.commit()
+                return None
+        vector = array.array("f", row[0]).tolist()
+        self.disk_hits += 1
+        # same expiry in memory as on disk
+        self.memory.set(key, vector, self.ttl - age if self.ttl else None)
+        return vector
+
+    def set(self, question: str, vector: List[float]) -> None:
+        key = self.key(question)
+        vector = list(vector)
+        self.memory.set(key, vector)
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created) VALUES (?, ?, ?, ?)",
+                (key, self.model, array.array("f", vector).tobytes(), time.time()),
+            )
+            self._db.commit()
+
+    def get_or_compute(self, question: str, compute: Callable[[str], List[float]]) -> List[float]:
+        vector = self.get(question)
+        if vector is None:
+            vector = compute(question)
+            self.set(question, vector)
+        return vector
+
+    def seed(self, questions: Iterable[str], compute: Callable[[str], List[float]]) -> int:
+        """Pre-computes the embedding of every question not cached yet. Returns how many were added."""
+        added = 0
+        for q in questions:
+            if q.strip() and self.get(q) is None:
+                self.set(q, compute(q))
+                added += 1
+        return added
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        if self._db is not None:
+            with self._db_lock:
+                stats["disk_size"] = self._db.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+        return stats
+
+
+_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_embedding_cache()
+    if command == "seed":
+        from vector_search import embed_query_uncached
+        with open(sys.argv[2], encoding="utf-8") as f:
+            added = cache.seed(f.read().splitlines(), embed_query_uncached)
+        print(f"✅ {added} embeddings added to the cache.")
+    print(cache.stats())
@@ -0,0 +1,167 @@
+"""
+Bitmap facet index over the product catalog for intelligent_count.
+
+Each brand / category / ingredient maps to a Python int used as a bitset of
+product ids, so combined filters are bitwise ANDs and counts are popcounts:
+
+    "how many KitKat products contain milk"   → |brand[kitkat] & ingredient[milk]|
+    "products per brand"                      → popcount of every brand bitmap
+    "top 5 ingredients in chocolate products" → same, restricted to a filter
+
+Names are keyed by intelligent_count.normalize_question, so "Häagen-Dazs"
+matches "haagen dazs"; brand and category keys also drop their spaces, so
+"Kit Kat" and "KitKat" are one brand. An ingredient filter matches every
+ingredient name containing its words ("milk" → "Milk", "Modified Milk
+Ingredients", "skim milk powder"), and ingredient groups ("top 5
+ingredients") use the same rule. The index is built once from the catalog
+(embedded graph or one Neo4j query) and rebuilt when the data version
+changes or after FACET_REFRESH_SECONDS.
+"""
+
+import os, threading, time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from intelligent_count import normalize_question
+from answer_cache import current_data_version
+from graph_engine import GRAPH_BACKEND, get_graph_engine
+from graph_query import CATALOG_QUERY
+
+load_dotenv()
+FACET_REFRESH_SECONDS = float(os.getenv("FACET_REFRESH_SECONDS", "600"))
+FACETS = ("brand", "category", "ingredient")
+# facets whose spelling variants are aliases of one name ("kit kat" = "kitkat")
+COMPACT_FACETS = ("brand", "category")
+
+
+def facet_key(facet: str, name: str) -> str:
+    key = normalize_question(name or "")
+    return key.replace(" ", "") if facet in COMPACT_FACETS else key
+
+
+class FacetIndex:
+    def __init__(self, products: Iterable[Dict[str, List[str]]]):
+        self.titles: List[str] = []
+        self.bitmaps: Dict[str, Dict[str, int]] = {f: {} for f in FACETS}
+        spellings: Dict[str, Dict[str, Counter]] = {f: defaultdict(Counter) for f in FACETS}
+        for pid, product in enumerate(products):
+            self.titles.append(product.get("title"))
+            bit = 1 << pid
+            for facet in FACETS:
+                for name in product.get(facet) or ():
+                    key = facet_key(facet, name)
+                    if not key:
+                        continue
+                    self.bitmaps[facet][key] = self.bitmaps[facet].get(key, 0) | bit
+                    spellings[facet][key][name] += 1
+        # shown name: most common spelling ("Milk" rather than a stray "milk)")
+        self.labels: Dict[str, Dict[str, str]] = {
+            f: {key: names.most_common(1)[0][0] for key, names in spellings[f].items()} for f in FACETS}
+        self.all = (1 << len(self.titles)) - 1
+        # ingredient word → ingredient keys containing it, for containment filters
+        self._ingredient_words: Dict[str, Set[str]] = {}
+        for key in self.bitmaps["ingredient"]:
+            for word in key.split():
+                self._ingredient_words.setdefault(word, set()).add(key)
+        self._containing: Dict[str, int] = {}
+        self._ingredient_groups: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def bitmap(self, facet: str, value: str) -> int:
+        if facet == "ingredient":
+            return self.ingredient_bitmap(value)
+        return self.bitmaps[facet].get(facet_key(facet, value), 0)
+
+    def ingredient_bitmap(self, value: str) -> int:
+        """OR of every ingredient whose name contains the words of `value`."""
+        term = normalize_question(value or "")
+        if term not in self._containing:
+            words = term.split()
+            candidates = set.intersection(*(self._ingredient_words.get(w, set()) for w in words)) if words else set()
+            bitmap = 0
+            for key in candidates:
+                if f" {term} " in f" {key} ":
+                    bitmap |= self.bitmaps["ingredient"][key]
+            self._containing[term] = bitmap
+        return self._containing[term]
+
+    def select(self, **filters: Optional[Iterable[str]]) -> int:
+        """AND of every filter; each filter is a value or a list of values (all required)."""
+        selected = self.all
+        for facet, values in filters.items():
+            if not values:
+                continue
+            for value in [values] if isinstance(values, str) else values:
+                selected &= self.bitmap(facet, value)
+        return selected
+
+    def count(self, **filters) -> int:
+        return self.select(**filters).bit_count()
+
+    def group_by(self, facet: str, top: Optional[int] = None, **filters) -> List[Tuple[str, int]]:
+        """[(name, count), …] for every value of `facet`, largest first, within the filters.
+
+        Ingredients are grouped with the containment rule of their filter, so
+        a group's count is the answer to "how many products contain <name>".
+        """
+        selected = self.select(**filters)
+        groups = self.bitmaps[facet]
+        if facet == "ingredient":
+            if self._ingredient_groups is None:
+                self._ingredient_groups = {key: self.ingredient_bitmap(key) for key in groups}
+            groups = self._ingredient_groups
+        counts = [
+            (self.labels[facet][key], (bitmap & selected).bit_count())
+            for key, bitmap in groups.items()
+        ]
+        counts = sorted((c for c in counts if c[1]), key=lambda c: (-c[1], c[0]))
+        return counts[:top] if top else counts
+
+# ──────────────────────────────────────────────────────────────
+# Catalog loading + refresh
+# ──────────────────────────────────────────────────────────────
+def load_catalog() -> List[Dict[str, List[str]]]:
+    if GRAPH_BACKEND == "embedded":
+        return get_graph_engine().catalog()
+
+    from clients import get_neo4j_driver
+    with get_neo4j_driver().session() as session:
+        return [r.data() for r in session.run(CATALOG_QUERY)]
+
+
+_lock = threading.Lock()
+_index: Optional[FacetIndex] = None
+_built_at = 0.0
+_version = None
+
+
+def _stale(version: str) -> bool:
+    return (
+        _index is None
+        or _version != version
+        or bool(FACET_REFRESH_SECONDS and time.monotonic() - _built_at > FACET_REFRESH_SECONDS)
+    )
+
+
+def refresh(version: Optional[str] = None) -> FacetIndex:
+    """Rebuilds the index (callers hold _lock)."""
+    global _index, _built_at, _version
+    t0 = time.perf_counter()
+    version = version or current_data_version()
+    index = FacetIndex(load_catalog())
+    _index, _built_at, _version = index, time.monotonic(), version
+    print(f"🧮 Facet index: {len(index)} products in {1000 * (time.perf_counter() - t0):.0f} ms")
+    return index
+
+
+def get_facet_index(version: Optional[str] = None) -> FacetIndex:
+    """Process-wide index, rebuilt when the data version (read here unless given) changes."""
+    version = version or current_data_version()
+    if not _stale(version):
+        return _index
+    # one rebuild at a time: concurrent callers wait for it and then reuse it
+    with _lock:
+        return refresh(version) if _stale(version) else _index
@@ -0,0 +1,90 @@
+"""
+In-process stand-in for google.genai.Client, for local runs and checks
+without Gemini (GEMINI_CLIENT=fake, see clients.py).
+
+Covers what the app uses: models.generate_content / generate_content_stream
+/ get and their client.aio async twins. Prompt tokens are counted with
+context_packer.estimate_tokens; every request is recorded in `client.calls`
+(tests/test_llm.py).
+"""
+
+import asyncio, time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from context_packer import estimate_tokens
+
+
+def _text(parts) -> str:
+    if parts is None:
+        return ""
+    if isinstance(parts, str):
+        return parts
+    if isinstance(parts, (list, tuple)):
+        return "".join(_text(p) for p in parts)
+    return str(getattr(parts, "text", "") or "")
+
+
+class _Models:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    def get(self, model: str):
+        return SimpleNamespace(name=f"models/{model}")
+
+    def _respond(self, model: str, contents, config) -> SimpleNamespace:
+        client = self._client
+        own_tokens = estimate_tokens(_text(getattr(config, "system_instruction", None)) + _text(contents))
+        if client.seconds_per_token:
+            time.sleep(own_tokens * client.seconds_per_token)
+        text = client.answer
+        max_tokens = getattr(config, "max_output_tokens", None)
+        if max_tokens:
+            text = text[: max_tokens * 4]
+        usage = SimpleNamespace(
+            prompt_token_count=own_tokens,
+            candidates_token_count=estimate_tokens(text),
+        )
+        client.calls.append({"model": model, "contents": _text(contents), "config": config,
+                             "prompt_tokens": own_tokens})
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content(self, model: str, contents=None, config=None):
+        return self._respond(model, contents, config)
+
+    def generate_content_stream(self, model: str, contents=None, config=None):
+        response = self._respond(model, contents, config)
+        words = response.text.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield SimpleNamespace(text=word + ("" if last else " "),
+                                  usage_metadata=response.usage_metadata if last else None)
+
+
+class _AsyncModels:
+    def __init__(self, models: _Models):
+        self._models = models
+
+    async def generate_content(self, model: str, contents=None, config=None):
+        return await asyncio.to_thread(self._models.generate_content, model, contents, config)
+
+    async def generate_content_stream(self, model: str, contents=None, config=None):
+        chunks = await asyncio.to_thread(list, self._models.generate_content_stream(model, contents, config))
+
+        async def iterate():
+            for chunk in chunks:
+                yield chunk
+        return iterate()
+
+
+class FakeGeminiClient:
+    def __init__(self, answer: str = "Here’s what I found for you! (fake Gemini answer)",
+                 seconds_per_token: float = 0.0):
+        self.answer = answer
+        self.seconds_per_token = seconds_per_token
+        self.calls: List[Dict[str, Any]] = []
+        self.models = _Models(self)
+        self.aio = SimpleNamespace(models=_AsyncModels(self.models))
+
+    def close(self) -> None:
+        pass
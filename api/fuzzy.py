@@ -0,0 +1,79 @@
+"""
+SymSpell-style deletion index for typo-tolerant word lookup.
+
+Every dictionary word is stored under all its variants with up to
+`max_distance` characters deleted; a lookup generates the deletes of the
+query word, so candidates are found with a few dict hits instead of a scan
+of the dictionary, then ranked by true edit distance (Damerau / OSA).
+
+    index = SymSpellIndex(["coffee", "products"])
+    index.lookup("cofee")    → ("coffee", 1)
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count 1); > max_distance if over."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SymSpellIndex:
+    def __init__(self, words: Union[Iterable[str], Dict[str, int]], max_distance: int = 2):
+        """`words` is a list (frequency = occurrences) or a {word: frequency} mapping."""
+        self.max_distance = max_distance
+        self.frequency = Counter(words)
+        self.frequency.pop("", None)
+        self.deletes: Dict[str, List[str]] = {}
+        for word in self.frequency:
+            for variant in _deletes(word, max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.frequency
+
+    def __len__(self) -> int:
+        return len(self.frequency)
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """(closest dictionary word, distance) within max_distance; ties go to the most frequent word."""
+        if word in self.frequency:
+            return word, 0
+        best: Optional[Tuple[int, int, str]] = None
+        seen: Set[str] = set()
+        for variant in _deletes(word, self.max_distance):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                key = (distance, -self.frequency[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return (best[2], best[0]) if best else None
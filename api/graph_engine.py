@@ -0,0 +1,408 @@
+"""
+Embedded, in-process snapshot of the knowledge graph.
+
+Built from the same vector documents as data/graphRAG/create_graphRAG.py and
+following its MERGE semantics, so `fetch_records(ids)` returns the same rows
+as FETCH_GRAPH_QUERY and `count_products(...)` the same totals as the Cypher
+queries of intelligent_count — without a Neo4j round-trip.
+
+Storage is compact: nodes are integer ids into per-label lists of fixed-width
+property rows; relationships are adjacency sets keyed by
+(source label, type) in both directions.
+
+    GRAPH_BACKEND=embedded            use it in the API
+    python api/graph_engine.py parity compare every vector_id with Neo4j
+"""
+
+import argparse, json, os, pathlib, re, time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from vector_store import VECTORS_DIR, get_vector_store
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+load_dotenv()
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j").lower()  # neo4j | embedded
+# Recipe → product USES links (uses_links): ingredients never linked on, ingredients
+# found in more than USES_MAX_INGREDIENT_PRODUCTS products, products kept per recipe (0 = no limit)
+USES_STOP_INGREDIENTS = {
+    i.strip().lower() for i in os.getenv("USES_STOP_INGREDIENTS", "").split(",") if i.strip()}
+USES_MAX_INGREDIENT_PRODUCTS = int(os.getenv("USES_MAX_INGREDIENT_PRODUCTS", "0"))
+USES_MAX_PRODUCTS_PER_RECIPE = int(os.getenv("USES_MAX_PRODUCTS_PER_RECIPE", "0"))
+
+_SPLIT_ING = re.compile(r",|;")
+
+def _split_ingredients(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return []
+    return [i.strip() for i in _SPLIT_ING.split(raw) if i.strip()]
+
+
+def uses_links(recipes: Dict[Any, Iterable[str]], products: Dict[Any, Iterable[str]],
+               stop: Set[str] = USES_STOP_INGREDIENTS,
+               max_ingredient_products: int = USES_MAX_INGREDIENT_PRODUCTS,
+               max_products: int = USES_MAX_PRODUCTS_PER_RECIPE) -> List[Tuple[Any, Any, str]]:
+    """
+    (recipe, product, via ingredient) for every ingredient a recipe shares with a
+    product, from an inverted ingredient → products index. Stop ingredients and
+    ingredients in too many products link nothing; past `max_products`, a recipe
+    keeps the products sharing the most, then the rarest, ingredients.
+    """
+    index: Dict[str, List[Any]] = defaultdict(list)
+    for product, ingredients in products.items():
+        for ing in dict.fromkeys(ingredients):
+            index[ing].append(product)
+
+    links: List[Tuple[Any, Any, str]] = []
+    for recipe, ingredients in recipes.items():
+        shared: Dict[Any, List[str]] = defaultdict(list)   # product → via ingredients
+        for ing in dict.fromkeys(ingredients):
+            found = index.get(ing)
+            if not found or ing.lower() in stop:
+                continue
+            if max_ingredient_products and len(found) > max_ingredient_products:
+                continue
+            for product in found:
+                shared[product].append(ing)
+        kept = list(shared)
+        if max_products and len(kept) > max_products:
+            kept.sort(key=lambda p: (-len(shared[p]), sum(len(index[i]) for i in shared[p]), str(p)))
+            kept = kept[:max_products]
+        links.extend((recipe, product, via) for product in kept for via in shared[product])
+    return links
+
+
+def iter_documents() -> Iterator[Dict[str, Any]]:
+    """Vector documents in import order: packed store when present, else the JSON files."""
+    store = get_vector_store()
+    if store is not None:
+        yield from store.iter_documents()
+        return
+    # sorted like vector_store.pack, so duplicate titles keep the same vector_id either way
+    for fp in sorted(pathlib.Path(VECTORS_DIR).glob("*.json")):
+        try:
+            data = json.loads(fp.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️  Skip {fp.name}: {e}")
+            continue
+        yield {
+            "id": data.get("id"),
+            "type": data.get("restricts", [{}])[0].get("allow", ["unknown"])[0],
+            "metadata": data.get("metadata", {}),
+        }
+
+# ──────────────────────────────────────────────────────────────
+# 2) Snapshot
+# ──────────────────────────────────────────────────────────────
+# Properties kept per label (only what the fetch / count queries read).
+PROPS = {
+    "Recipe":      ("vector_id", "title", "description", "url"),
+    "Product":     ("vector_id", "title", "description", "url", "nutrition", "amazon_link"),
+    "Article":     ("vector_id", "title", "url"),
+    "Information": ("vector_id", "title", "url"),
+    "Brand":       ("name",),
+    "Category":    ("name",),
+    "Ingredient":  ("name",),
+    "Feature":     ("text",),
+    "Store":       ("name", "address", "latitude", "longitude"),
+}
+
+
+class GraphEngine:
+    def __init__(self):
+        self.nodes: Dict[str, List[list]] = {label: [] for label in PROPS}
+        self._keys: Dict[str, Dict[Any, int]] = {label: {} for label in PROPS}
+        self._field = {label: {f: i for i, f in enumerate(fields)} for label, fields in PROPS.items()}
+        self.by_vector_id: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        # (source label, rel type) → {source node → {target nodes}} and its reverse
+        self.out: Dict[Tuple[str, str], Dict[int, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.inc: Dict[Tuple[str, str], Dict[int, Set[int]]] = defaultdict(lambda: defaultdict(set))
+
+    # ── building blocks (MERGE semantics) ─────────────────────
+    def _merge(self, label: str, key: Any, on_create: Dict[str, Any] = None) -> int:
+        node = self._keys[label].get(key)
+        if node is None:
+            node = len(self.nodes[label])
+            self.nodes[label].append([None] * len(PROPS[label]))
+            self._keys[label][key] = node
+            self.set(label, node, on_create or {})
+        return node
+
+    def set(self, label: str, node: int, values: Dict[str, Any]) -> None:
+        fields = self._field[label]
+        row = self.nodes[label][node]
+        for k, v in values.items():
+            if k in fields:
+                row[fields[k]] = v
+
+    def get(self, label: str, node: int, field: str) -> Any:
+        return self.nodes[label][node][self._field[label][field]]
+
+    def _link(self, src_label: str, src: int, rel: str, dst: int) -> None:
+        self.out[(src_label, rel)][src].add(dst)
+        self.inc[(src_label, rel)][dst].add(src)
+
+    def _merge_with_vector_id(self, label: str, title: str, vector_id: str) -> int:
+        is_new = title not in self._keys[label]
+        node = self._merge(label, title, {"title": title, "vector_id": vector_id})
+        if is_new and vector_id:
+            self.by_vector_id[vector_id].append((label, node))
+        return node
+
+    # ── inserts (mirror create_graphRAG.insert_*) ──────────────
+    def insert_recipe(self, meta: Dict[str, Any], vector_id: str) -> None:
+        r = self._merge_with_vector_id("Recipe", meta["title"], vector_id)
+        self.set("Recipe", r, {"url": meta.get("url", ""), "description": meta.get("description", "")})
+        for ing in meta.get("ingredients", []):
+            self._link("Recipe", r, "CONTAINS", self._merge("Ingredient", ing, {"name": ing}))
+
+    def insert_product(self, meta: Dict[str, Any], vector_id: str) -> None:
+        title = meta["title"]
+        ingredients = _split_ingredients(meta.get("ingredients") or "")
+        brand = meta.get("brand") or (title.split()[0] if title else None)
+        category = meta.get("category")
+        stores = [s for s in meta.get("stores", []) if s.get("name") and s.get("address")]
+
+        p = self._merge_with_vector_id("Product", title, vector_id)
+        self.set("Product", p, {
+            "url": meta.get("url", ""), "description": meta.get("description", ""),
+            "nutrition": meta.get("nutrition", []), "amazon_link": meta.get("amazon_link"),
+        })
+
+        # The Cypher import chains `WITH p UNWIND …` / `WITH p WHERE …`: an empty
+        # list or a null brand/category ends the statement, so every later
+        # section is skipped. Reproduce it to return identical records.
+        features = meta.get("features", []) or []
+        if not features:
+            return
+        for f in features:
+            self._link("Product", p, "HAS_FEATURE", self._merge("Feature", f, {"text": f}))
+        if not ingredients:
+            return
+        for ing in ingredients:
+            self._link("Product", p, "CONTAINS", self._merge("Ingredient", ing, {"name": ing}))
+        if brand is None:
+            return
+        self._link("Product", p, "BRANDED_AS", self._merge("Brand", brand, {"name": brand}))
+        if category is None:
+            return
+        self._link("Product", p, "IN_CATEGORY", self._merge("Category", category, {"name": category}))
+        for s in stores:
+            store = self._merge("Store", (s["name"], s["address"]), {
+                "name": s["name"], "address": s["address"],
+                "latitude": s.get("latitude"), "longitude": s.get("longitude"),
+            })
+            self._link("Product", p, "SOLD_AT", store)
+
+    def insert_article(self, meta: Dict[str, Any], vector_id: str) -> None:
+        a = self._merge_with_vector_id("Article", meta["title"], vector_id)
+        self.set("Article", a, {"url": meta.get("url", "")})
+
+    def insert_information(self, meta: Dict[str, Any], vector_id: str) -> None:
+        i = self._merge_with_vector_id("Information", meta["title"], vector_id)
+        self.set("Information", i, {"url": meta.get("url", "")})
+
+    def link_recipes_products(self) -> None:
+        """(r:Recipe)-[:CONTAINS]->(i)<-[:CONTAINS]-(p:Product) ⇒ (r)-[:USES]->(p), see uses_links"""
+        def ingredients(label: str) -> Dict[int, List[str]]:
+            return {n: [self.get("Ingredient", i, "name") for i in ings]
+                    for n, ings in self.out[(label, "CONTAINS")].items()}
+
+        for r, p, _ in uses_links(ingredients("Recipe"), ingredients("Product")):
+            self._link("Recipe", r, "USES", p)
+
+    @classmethod
+    def build(cls, documents=None) -> "GraphEngine":
+        engine = cls()
+        inserts = {
+            "recipe": engine.insert_recipe,
+            "product": engine.insert_product,
+            "article": engine.insert_article,
+            "information": engine.insert_information,
+        }
+        for doc in documents if documents is not None else iter_documents():
+            meta = doc.get("metadata", {})
+            insert = inserts.get(doc.get("type"))
+            if insert and meta.get("title"):
+                insert(meta, doc.get("id"))
+        engine.link_recipes_products()
+        return engine
+
+    # ── queries ────────────────────────────────────────────────
+    def _targets(self, label: str, node: int, rel: str) -> Set[int]:
+        return self.out[(label, rel)].get(node, set())
+
+    def _names(self, label: str, nodes, field: str) -> List[Any]:
+        seen: Dict[Any, None] = {}
+        for n in nodes:
+            v = self.get(label, n, field)
+            if v is not None:
+                seen.setdefault(v, None)
+        return list(seen)
+
+    def _recipe_record(self, r: int) -> Dict[str, Any]:
+        # OPTIONAL MATCH (r)-[:USES]->(p)-[:BRANDED_AS]->(b): only branded products count
+        branded = [p for p in self._targets("Recipe", r, "USES") if self._targets("Product", p, "BRANDED_AS")]
+        brands = set().union(*(self._targets("Product", p, "BRANDED_AS") for p in branded)) if branded else set()
+        return {
+            "type": "Recipe", "id": self.get("Recipe", r, "vector_id"),
+            "title": self.get("Recipe", r, "title"), "description": self.get("Recipe", r, "description"),
+            "url": self.get("Recipe", r, "url"), "nutrition_value": [], "amazon_link": None,
+            "ingredients": self._names("Ingredient", self._targets("Recipe", r, "CONTAINS"), "name"),
+            "products": self._names("Product", branded, "title"),
+            "brands": self._names("Brand", brands, "name"),
+            "features": [], "stores": [],
+        }
+
+    def _product_record(self, p: int) -> Dict[str, Any]:
+        stores = [
+            {k: self.get("Store", s, k) for k in ("name", "address", "latitude", "longitude")}
+            for s in self._targets("Product", p, "SOLD_AT")
+        ]
+        if not stores:
+            # collect(DISTINCT {name: s.name, …}) over a null OPTIONAL MATCH
+            # yields one map of nulls, not an empty list.
+            stores = [{"name": None, "address": None, "latitude": None, "longitude": None}]
+        return {
+            "type": "Product", "id": self.get("Product", p, "vector_id"),
+            "title": self.get("Product", p, "title"), "description": self.get("Product", p, "description"),
+            "url": self.get("Product", p, "url"), "nutrition_value": self.get("Product", p, "nutrition"),
+            "amazon_link": self.get("Product", p, "amazon_link"),
+            "ingredients": self._names("Ingredient", self._targets("Product", p, "CONTAINS"), "name"),
+            "products": [],
+            "brands": self._names("Brand", self._targets("Product", p, "BRANDED_AS"), "name"),
+            "features": self._names("Feature", self._targets("Product", p, "HAS_FEATURE"), "text"),
+            "stores": stores,
+        }
+
+    def _plain_record(self, label: str, n: int) -> Dict[str, Any]:
+        return {
+            "type": label, "id": self.get(label, n, "vector_id"),
+            "title": self.get(label, n, "title"), "description": None,
+            "url": self.get(label, n, "url"), "nutrition_value": [], "amazon_link": None,
+            "ingredients": [], "products": [], "brands": [], "features": [], "stores": [],
+        }
+
+    def fetch_records(self, vector_ids) -> List[Dict[str, Any]]:
+        """Same rows as FETCH_GRAPH_QUERY (UNION order: recipes, products, articles, informations)."""
+        hits: Dict[str, List[int]] = defaultdict(list)
+        for vid in dict.fromkeys(vector_ids):
+            for label, node in self.by_vector_id.get(vid, ()):
+                hits[label].append(node)
+        records = [self._recipe_record(r) for r in hits["Recipe"]]
+        records += [self._product_record(p) for p in hits["Product"]]
+        records += [self._plain_record("Article", a) for a in hits["Article"]]
+        records += [self._plain_record("Information", i) for i in hits["Information"]]
+        return records
+
+    def count_products(self, category: str = None, brand: str = None, ingredient: str = None) -> int:
+        """Same totals as the Cypher counts of intelligent_count (toLower(name) = value)."""
+        for label, rel, value in (("Category", "IN_CATEGORY", category),
+                                  ("Brand", "BRANDED_AS", brand),
+                                  ("Ingredient", "CONTAINS", ingredient)):
+            if value:
+                incoming = self.inc[("Product", rel)]
+                return sum(
+                    len(incoming.get(n, ()))
+                    for n, row in enumerate(self.nodes[label])
+                    if (row[0] or "").lower() == value
+                )
+        return len(self.nodes["Product"])
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """One {"title", "brand", "category", "ingredient"} row per product (same as CATALOG_QUERY)."""
+        rels = {"brand": ("BRANDED_AS", "Brand"), "category": ("IN_CATEGORY", "Category"),
+                "ingredient": ("CONTAINS", "Ingredient")}
+        return [
+            {"title": self.get("Product", p, "title"),
+             **{facet: [self.get(label, n, "name") for n in self._targets("Product", p, rel)]
+                for facet, (rel, label) in rels.items()}}
+            for p in range(len(self.nodes["Product"]))
+        ]
+
+    def stores(self) -> List[Dict[str, Any]]:
+        """One row per store with the products sold there (same as STORES_QUERY)."""
+        sold_at = self.inc[("Product", "SOLD_AT")]
+        return [
+            {**{k: self.get("Store", s, k) for k in ("name", "address", "latitude", "longitude")},
+             "products": [self.get("Product", p, "vector_id") for p in sorted(sold_at.get(s, ()))],
+             "titles": [self.get("Product", p, "title") for p in sorted(sold_at.get(s, ()))]}
+            for s in range(len(self.nodes["Store"]))
+        ]
+
+    def names(self, label: str) -> List[str]:
+        return [row[0] for row in self.nodes[label] if row[0]]
+
+
+_engine: Optional[GraphEngine] = None
+
+def get_graph_engine() -> GraphEngine:
+    global _engine
+    if _engine is None:
+        t0 = time.perf_counter()
+        _engine = GraphEngine.build()
+        sizes = ", ".join(f"{k}={len(v)}" for k, v in _engine.nodes.items())
+        print(f"🕸️  Embedded graph built in {1000 * (time.perf_counter() - t0):.0f} ms ({sizes})")
+    return _engine
+
+# ──────────────────────────────────────────────────────────────
+# 3) Parity check against Neo4j
+# ──────────────────────────────────────────────────────────────
+def _canonical(record: Dict[str, Any]) -> str:
+    """collect() order is undefined in Cypher: compare lists as sorted JSON."""
+    out = {}
+    for k, v in record.items():
+        if isinstance(v, list) and k != "nutrition_value":
+            v = sorted(json.dumps(x, sort_keys=True, ensure_ascii=False) for x in v)
+        out[k] = v
+    return json.dumps(out, sort_keys=True, ensure_ascii=False)
+
+
+def parity(batch_size: int = 100) -> int:
+    """Compares fetch_records and count_products with Neo4j. Returns the number of mismatches."""
+    from clients import get_neo4j_driver
+    from graph_query import FETCH_GRAPH_QUERY
+    from graph_search import clean_record
+    from intelligent_count import CATEGORIES, BRANDS, INGREDIENTS
+
+    engine = get_graph_engine()
+    ids = list(engine.by_vector_id)
+    mismatches = 0
+    with get_neo4j_driver().session() as session:
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start : start + batch_size]
+            live = sorted(_canonical(clean_record(r.data())) for r in session.run(FETCH_GRAPH_QUERY, ids=chunk))
+            local = sorted(_canonical(clean_record(r)) for r in engine.fetch_records(chunk))
+            if live != local:
+                diff = set(live) ^ set(local)
+                mismatches += len(diff)
+                for d in list(diff)[:3]:
+                    print(f"❌ {d[:200]}")
+
+        checks = [("category", c, "IN_CATEGORY", "Category") for c in CATEGORIES]
+        checks += [("brand", b, "BRANDED_AS", "Brand") for b in BRANDS]
+        checks += [("ingredient", i, "CONTAINS", "Ingredient") for i in INGREDIENTS]
+        for field, value, rel, label in checks:
+            query = (f"MATCH (p:Product)-[:{rel}]->(n:{label}) "
+                     f"WHERE toLower(n.{PROPS[label][0]}) = $v RETURN count(p) AS total")
+            live = session.run(query, v=value).single()["total"]
+            local = engine.count_products(**{field: value})
+            if live != local:
+                mismatches += 1
+                print(f"❌ count {field}={value}: neo4j={live} embedded={local}")
+
+    print(f"{'✅' if not mismatches else '❌'} parity on {len(ids)} vector ids: {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded graph snapshot.")
+    parser.add_argument("command", choices=["build", "parity"], nargs="?", default="build")
+    args = parser.parse_args()
+    engine = get_graph_engine()
+    if args.command == "parity":
+        raise SystemExit(1 if parity() else 0)
+    print(json.dumps(engine.fetch_records(list(engine.by_vector_id)[:2]), indent=2, ensure_ascii=False)[:2000])
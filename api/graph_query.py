@@ -91,3 +91,101 @@ RETURN  'Brand'             AS type,
         [] AS ingredients, [] AS products, [] AS brands,
         [] AS features,    [] AS stores
 """
+
+# Precomputed FETCH_GRAPH_QUERY records, one node per vector_id
+# (built by data/graphRAG/create_graphRAG.py → materialize_contexts).
+# `records` is a JSON list with the exact rows FETCH_GRAPH_QUERY returns.
+MATERIALIZED_CONTEXT_QUERY = """
+MATCH (c:MaterializedContext)
+WHERE c.vector_id IN $ids
+RETURN c.vector_id AS id, c.records AS records
+"""
+
+# Version stamp of the last import (create_graphRAG), part of the answer-cache key.
+GRAPH_VERSION_QUERY = """
+MATCH (s:ImportStamp {name:'graph'})
+RETURN s.version AS version
+"""
+
+# Product catalog for the facet index (facets.py): one row per product.
+CATALOG_QUERY = """
+MATCH (p:Product)
+RETURN p.title                                          AS title,
+       [(p)-[:BRANDED_AS]->(b:Brand)       | b.name]    AS brand,
+       [(p)-[:IN_CATEGORY]->(c:Category)   | c.name]    AS category,
+       [(p)-[:CONTAINS]->(i:Ingredient)    | i.name]    AS ingredient
+"""
+
+# Entity names for the structured-query matcher (entity_matcher.py).
+LEXICON_QUERY = """
+UNWIND $labels AS label
+OPTIONAL MATCH (n) WHERE label IN labels(n)
+RETURN label, collect(n.name) AS names
+"""
+
+# Every store with its location and the products sold there (store_locator.py).
+STORES_QUERY = """
+MATCH (s:Store)
+OPTIONAL MATCH (p:Product)-[:SOLD_AT]->(s)
+RETURN s.name               AS name,
+       s.address            AS address,
+       s.location.latitude  AS latitude,
+       s.location.longitude AS longitude,
+       collect(p.vector_id) AS products,
+       collect(p.title)     AS titles
+"""
+
+# ──────────────────────────────────────────────────────────────
+# Intent-projected fetch (graph_search.fetch_graphrag_data(intent=…))
+# Same rows as FETCH_GRAPH_QUERY restricted to the fields the prompt uses
+# for the intent; for "where_to_buy" the stores of each product are ranked
+# by distance to ($latitude, $longitude) and cut to $max_stores in Neo4j.
+# ──────────────────────────────────────────────────────────────
+INTENT_FIELDS = {
+    "general":      ("type", "id", "title", "description", "url", "amazon_link"),
+    "detail":       ("type", "id", "title", "description", "url", "amazon_link",
+                     "nutrition_value", "ingredients"),
+    "where_to_buy": ("type", "id", "title", "url", "amazon_link", "stores"),
+}
+
+_INGREDIENTS = "[(n)-[:CONTAINS]->(ing:Ingredient) | ing.name]"
+_BRANCHES = {
+    "Recipe":      {"title": "n.title", "description": "n.description", "ingredients": _INGREDIENTS},
+    "Product":     {"title": "n.title", "description": "n.description", "ingredients": _INGREDIENTS,
+                    "nutrition_value": "n.nutrition", "amazon_link": "n.amazon_link", "stores": "stores"},
+    "Article":     {"title": "n.title", "description": "n.description"},
+    "Information": {"title": "n.title"},
+    "Brand":       {"title": "n.name"},
+}
+_EMPTY = {"description": "null", "amazon_link": "null", "nutrition_value": "[]",
+          "ingredients": "[]", "stores": "[]"}
+
+_RANKED_STORES = """
+CALL {
+    WITH n
+    OPTIONAL MATCH (n)-[:SOLD_AT]->(s:Store)
+    WITH s, point.distance(s.location, point({latitude: $latitude, longitude: $longitude})) AS d
+    ORDER BY d
+    LIMIT $max_stores
+    RETURN collect(CASE WHEN s IS NULL THEN null ELSE {
+        name: s.name,
+        address: s.address,
+        latitude: s.location.latitude,
+        longitude: s.location.longitude,
+        distance_km: d / 1000.0
+    } END) AS stores
+}"""
+
+
+def _projected_query(fields) -> str:
+    branches = []
+    for label, exprs in _BRANCHES.items():
+        columns = {"type": f"'{label}'", "id": "n.vector_id", "url": "n.url"}
+        columns.update({f: exprs.get(f, _EMPTY.get(f)) for f in fields if f not in columns})
+        ranked = _RANKED_STORES if label == "Product" and "stores" in fields else ""
+        returned = ",\n        ".join(f"{columns[f]} AS {f}" for f in fields)
+        branches.append(f"MATCH (n:{label})\nWHERE n.vector_id IN $ids{ranked}\nRETURN  {returned}")
+    return "\nUNION\n".join(branches)
+
+
+FETCH_QUERIES = {intent: _projected_query(fields) for intent, fields in INTENT_FIELDS.items()}
@@ -1,35 +1,179 @@
-import os, json
-from neo4j import GraphDatabase
+import asyncio, json, os, random, time
 from dotenv import load_dotenv
-from graph_query import FETCH_GRAPH_QUERY
+from graph_query import FETCH_GRAPH_QUERY, FETCH_QUERIES, INTENT_FIELDS, MATERIALIZED_CONTEXT_QUERY
+from clients import get_async_neo4j_driver, get_neo4j_driver
+from metrics import observe, timed
+from graph_engine import GRAPH_BACKEND, get_graph_engine
+from store_locator import StoreLocator
 
-# ───────── Connexion ─────────────────────────────────────────
 load_dotenv()
-URI  = os.getenv("NEO4J_URI")
-USER = os.getenv("NEO4J_USERNAME", "neo4j")
-PWD  = os.getenv("NEO4J_PASSWORD")
-
-VECTOR_IDS = [
-    "237f46b1-07a3-43a3-955e-b52a59b2c20c",
-    "88f5546e-a37a-48d3-b7e7-ceb6a3a32689",
-    "add3dbe4-5166-4ee9-8270-5b4f1ea8a431"
-]
-
+# "materialized": one indexed lookup on precomputed records, live query for the misses
+# "live": always run FETCH_GRAPH_QUERY
+GRAPH_FETCH_MODE = os.getenv("GRAPH_FETCH_MODE", "materialized").lower()
+MAX_STORES = 5
 
 def clean_record(rec: dict) -> dict:
     
     return {k: v for k, v in rec.items()
             if v not in (None, "", [])}
 
-def fetch_graphrag_data(vector_ids, query=FETCH_GRAPH_QUERY):
-    driver = GraphDatabase.driver(URI, auth=(USER, PWD))
-    with driver.session() as session:
-        raw = session.run(query, ids=vector_ids)
-        return [clean_record(r.data()) for r in raw]
+def _order_by_ids(records: list[dict], vector_ids) -> list[dict]:
+    rank = {vid: i for i, vid in enumerate(vector_ids)}
+    return sorted(records, key=lambda r: rank.get(r.get("id"), len(rank)))
+
+
+def _use_materialized(query: str) -> bool:
+    return GRAPH_FETCH_MODE == "materialized" and query == FETCH_GRAPH_QUERY
+
+
+def _use_embedded(query: str) -> bool:
+    return GRAPH_BACKEND == "embedded" and query == FETCH_GRAPH_QUERY
+
+
+def _use_projected_query(query: str, intent) -> bool:
+    # materialized records are projected after the lookup, except for
+    # where-to-buy: its store ranking depends on the user location
+    return bool(intent) and query == FETCH_GRAPH_QUERY and (
+        intent == "where_to_buy" or GRAPH_FETCH_MODE != "materialized")
+
+
+def parse_location(latitude, longitude):
+    try:
+        return float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None, None
+
+
+def project_record(rec: dict, intent: str, latitude=None, longitude=None, max_stores: int = MAX_STORES) -> dict:
+    """Python side of FETCH_QUERIES[intent], for full records (embedded graph, materialized contexts)."""
+    projected = {k: rec[k] for k in INTENT_FIELDS[intent] if k in rec}
+    if projected.get("stores"):
+        if latitude is None:
+            projected["stores"] = projected["stores"][:max_stores]
+        else:
+            projected["stores"] = StoreLocator(projected["stores"]).nearby(latitude, longitude, max_stores)
+    return clean_record(projected)
+
+
+def _fetch_embedded(vector_ids, intent=None, latitude=None, longitude=None, max_stores=MAX_STORES) -> list[dict]:
+    with timed("fetch_graphrag_data"):
+        records = [clean_record(r) for r in get_graph_engine().fetch_records(vector_ids)]
+        if intent:
+            records = [project_record(r, intent, latitude, longitude, max_stores) for r in records]
+    observe("graph_fetch_records", len(records))
+    return records
+
+
+def _fetch(session, vector_ids, query):
+    if not _use_materialized(query):
+        return [clean_record(r.data()) for r in session.run(query, ids=vector_ids)]
+
+    records, found = [], set()
+    for row in session.run(MATERIALIZED_CONTEXT_QUERY, ids=vector_ids):
+        found.add(row["id"])
+        records.extend(clean_record(r) for r in json.loads(row["records"]))
+    missing = [vid for vid in vector_ids if vid not in found]
+    if missing:
+        records.extend(clean_record(r.data()) for r in session.run(FETCH_GRAPH_QUERY, ids=missing))
+    return _order_by_ids(records, vector_ids)
+
+
+def fetch_graphrag_data(vector_ids, query=FETCH_GRAPH_QUERY, intent=None,
+                        latitude=None, longitude=None, max_stores=MAX_STORES):
+    """
+    intent (intent.detect_intent) restricts the records to INTENT_FIELDS[intent];
+    for "where_to_buy" the stores are ranked by distance to the user and cut
+    to max_stores in Neo4j.
+    """
+    latitude, longitude = parse_location(latitude, longitude)
+    if _use_embedded(query):
+        return _fetch_embedded(vector_ids, intent, latitude, longitude, max_stores)
+    with timed("fetch_graphrag_data"), get_neo4j_driver().session() as session:
+        if _use_projected_query(query, intent):
+            records = [clean_record(r.data()) for r in session.run(
+                FETCH_QUERIES[intent], ids=vector_ids,
+                latitude=latitude, longitude=longitude, max_stores=max_stores)]
+        else:
+            records = _fetch(session, vector_ids, query)
+            if intent:
+                records = [project_record(r, intent, latitude, longitude, max_stores) for r in records]
+    observe("graph_fetch_records", len(records))
+    return records
+
+async def fetch_graphrag_data_async(vector_ids, query=FETCH_GRAPH_QUERY, intent=None,
+                                    latitude=None, longitude=None, max_stores=MAX_STORES):
+    latitude, longitude = parse_location(latitude, longitude)
+    if _use_embedded(query):
+        # in-process lookups + store ranking per record: CPU work, off the event loop
+        return await asyncio.to_thread(_fetch_embedded, vector_ids, intent, latitude, longitude, max_stores)
+    with timed("fetch_graphrag_data"):
+        async with get_async_neo4j_driver().session() as session:
+            if _use_projected_query(query, intent):
+                raw = await session.run(FETCH_QUERIES[intent], ids=vector_ids,
+                                        latitude=latitude, longitude=longitude, max_stores=max_stores)
+                records = [clean_record(r.data()) async for r in raw]
+            elif not _use_materialized(query):
+                raw = await session.run(query, ids=vector_ids)
+                records = [clean_record(r.data()) async for r in raw]
+            else:
+                records, found = [], set()
+                raw = await session.run(MATERIALIZED_CONTEXT_QUERY, ids=vector_ids)
+                async for row in raw:
+                    found.add(row["id"])
+                    records.extend(clean_record(r) for r in json.loads(row["records"]))
+                missing = [vid for vid in vector_ids if vid not in found]
+                if missing:
+                    raw = await session.run(FETCH_GRAPH_QUERY, ids=missing)
+                    records.extend([clean_record(r.data()) async for r in raw])
+                records = _order_by_ids(records, vector_ids)
+            if intent and not _use_projected_query(query, intent):
+                records = [project_record(r, intent, latitude, longitude, max_stores) for r in records]
+    observe("graph_fetch_records", len(records))
+    return records
+
+# Vector ids the graph holds: benchmarked fetches look like real neighbor lists
+SAMPLE_IDS_QUERY = (
+    "MATCH (n) WHERE n:Recipe OR n:Product OR n:Article OR n:Information\n"
+    "RETURN n.vector_id AS id"
+)
+
+def sample_ids(session, rounds: int, k: int = 5, seed: int = 0) -> list:
+    """`rounds` lists of k vector ids from the graph, like the neighbors of one question."""
+    ids = sorted(r["id"] for r in session.run(SAMPLE_IDS_QUERY) if r["id"])
+    if not ids:
+        raise RuntimeError("❌ No vector_id in the graph: import it first (data/graphRAG/create_graphRAG.py)")
+    rng = random.Random(seed)
+    return [rng.sample(ids, min(k, len(ids))) for _ in range(rounds)]
+
+def benchmark(rounds: int = 50, k: int = 5, latitude: float = 43.78, longitude: float = -79.40) -> None:
+    """
+    Median / p95 latency (records fetched and decoded), rows and JSON payload of
+    each fetch variant, over `rounds` sets of k ids sampled from the graph.
+    """
+    variants = [("live", FETCH_GRAPH_QUERY, {}), ("materialized", MATERIALIZED_CONTEXT_QUERY, {})]
+    variants += [(f"live/{intent}", query, {"latitude": latitude, "longitude": longitude, "max_stores": MAX_STORES})
+                 for intent, query in FETCH_QUERIES.items()]
+    with get_neo4j_driver().session() as session:
+        id_sets = sample_ids(session, rounds, k)
+        for name, query, params in variants:
+            timings, rows, size = [], 0, 0
+            for ids in id_sets:
+                t0 = time.perf_counter()
+                data = [r.data() for r in session.run(query, ids=ids, **params)]
+                timings.append(time.perf_counter() - t0)
+                rows += len(data)
+                size += len(json.dumps(data, ensure_ascii=False, default=str))
+            timings.sort()
+            print(f"{name:<18}: median {1000 * timings[len(timings) // 2]:.1f} ms, "
+                  f"p95 {1000 * timings[int(len(timings) * 0.95) - 1]:.1f} ms, "
+                  f"{rows / rounds:.1f} rows, {size / rounds / 1024:.1f} KiB per fetch ({rounds} fetches of {k} ids)")
 
 def main():
-    results = fetch_graphrag_data(VECTOR_IDS, query=FETCH_GRAPH_QUERY)
+    with get_neo4j_driver().session() as session:
+        ids = sample_ids(session, 1)[0]
+    results = fetch_graphrag_data(ids, query=FETCH_GRAPH_QUERY)
     print(json.dumps(results, indent=2, ensure_ascii=False))
+    benchmark()
 
 if __name__ == "__main__":
     main()
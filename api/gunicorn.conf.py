@@ -0,0 +1,20 @@
+# Gunicorn settings for the API (see Dockerfile).
+import os
+
+bind    = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# > 1 serves concurrent requests per worker (gthread), which single-flight coalescing needs
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_worker_init(worker):
+    # Runs in each worker after fork and before it accepts requests:
+    # gRPC / Neo4j connections must not be created in the master.
+    from clients import warmup
+    warmup()
+
+
+def worker_exit(server, worker):
+    from clients import close_all
+    close_all()
@@ -1,17 +1,17 @@
 # filename: structured_query_router.py
-import os, regex as re, unicodedata
-from typing import Optional
-from neo4j import GraphDatabase
+import os, regex as re, time, unicodedata
+from typing import List, Optional
 from dotenv import load_dotenv
+from clients import get_neo4j_driver
+from metrics import observe
+from graph_engine import GRAPH_BACKEND, get_graph_engine
 
-# ───────────────────────────────
-# Neo4j Configuration
-# ───────────────────────────────
 load_dotenv()
-URI  = os.getenv("NEO4J_URI")
-USER = os.getenv("NEO4J_USERNAME", "neo4j")
-PWD  = os.getenv("NEO4J_PASSWORD")
-driver = GraphDatabase.driver(URI, auth=(USER, PWD))
+# "on": answer counts from the bitmap facet index (facets.py), "off": one Cypher count per question
+FACET_ENGINE = os.getenv("FACET_ENGINE", "on").lower() == "on"
+GROUP_BY_DEFAULT_TOP = 10
+# typo corrections ("cofee" → "coffee") below this confidence are not applied
+FUZZY_MIN_CONFIDENCE = float(os.getenv("FUZZY_MIN_CONFIDENCE", "0.8"))
 
 # ───────────────────────────────
 # 1) Normalization of the question
@@ -34,29 +34,94 @@ PRODUCT_KEYWORDS = [
     r"product[s]?", r"produit[s]?", r"item[s]?"
 ]
 
+# Words of count questions, for typo correction; common words are listed so
+# they are never "corrected" into an entity name.
+QUESTION_WORDS = {
+    "how many", "number of", "count of", "combien de", "nombre de", "quantite de",
+    "product", "products", "produit", "produits", "item", "items",
+    "per", "by", "for each", "par", "top", "which", "what", "most",
+    "brand", "brands", "category", "categories", "ingredient", "ingredients",
+    "contain", "contains", "containing", "with", "under", "in", "the", "are",
+    "there", "is", "do", "does", "have", "has", "listed", "total", "give", "me",
+    "made", "sold", "available", "marque", "categorie", "avec", "contiennent",
+}
+
 COUNT_RE   = re.compile("|".join(COUNT_KEYWORDS),   re.I)
 PRODUCT_RE = re.compile("|".join(PRODUCT_KEYWORDS), re.I)
 
-def detect_structured_query(text: str) -> Optional[dict]:
-    text_norm = normalize_question(text)
+# Group-by / top-N: "products per brand", "top 5 ingredients", "which brand has the most products"
+_FACET = r"(brand|categor(?:y|ie)|ingredient)s?"
+GROUP_BY_RE = re.compile(r"\b(?:per|by|for\s+each|each|par)\s+" + _FACET + r"\b", re.I)
+TOP_RE      = re.compile(r"\btop\s+(\d+)\s+" + _FACET + r"\b", re.I)
+MOST_RE     = re.compile(r"\b(?:which|what)\s+" + _FACET + r"\b.*\bmost\b", re.I)
+
+def _facet_name(word: str) -> str:
+    return "category" if word.startswith("categor") else word
+
+def detect_group_by(text_norm: str) -> tuple[Optional[str], Optional[int]]:
+    """Returns (facet, top_n) for group-by / top-N questions, else (None, None)."""
+    m = TOP_RE.search(text_norm)
+    if m:
+        return _facet_name(m.group(2)), int(m.group(1))
+    m = MOST_RE.search(text_norm)
+    if m:
+        return _facet_name(m.group(1)), 1
+    m = GROUP_BY_RE.search(text_norm)
+    if m:
+        return _facet_name(m.group(1)), None
+    return None, None
+
+def _matcher(matcher=None):
+    from entity_matcher import get_entity_matcher
+    return matcher or get_entity_matcher()
 
+def correct_typos(text_norm: str, matcher=None) -> tuple[str, list]:
+    """Fixes misspelled keywords / names ("produvt", "cofee") from the entity_matcher vocabulary."""
+    return _matcher(matcher).correct(
+        text_norm, FUZZY_MIN_CONFIDENCE, (COUNT_RE, PRODUCT_RE, TOP_RE, MOST_RE, GROUP_BY_RE))
 
-    if not (COUNT_RE.search(text_norm) and PRODUCT_RE.search(text_norm)):
+# Words between the count trigger and what is counted ("how many of the products")
+COUNT_FILLERS = {"of", "the", "different", "distinct", "de", "des", "les"}
+
+def counts_products(text_norm: str, matcher=None) -> bool:
+    """"how many kitkat products" counts products; "how many calories are in a kitkat product" does not."""
+    m = COUNT_RE.search(text_norm)
+    if not m:
+        return False
+    words = text_norm[m.end():].split()
+    while words and words[0] in COUNT_FILLERS:
+        words.pop(0)
+    head = " ".join(words)
+    if PRODUCT_RE.match(head):
+        return True
+    return any(e.start == 0 for e in _matcher(matcher).find_all(head))
+
+def detect_structured_query(text: str, version: Optional[str] = None) -> Optional[dict]:
+    """`version`: data version read once by the caller (else read here)."""
+    from entity_matcher import get_entity_matcher
+    matcher = get_entity_matcher(version)
+    text_norm, corrections = correct_typos(normalize_question(text), matcher)
+    group_by, top = detect_group_by(text_norm)
+    has_product = PRODUCT_RE.search(text_norm)
+
+    if not ((has_product and counts_products(text_norm, matcher)) or (group_by and (has_product or top))):
         return None
 
    
     text_wo_trigger = COUNT_RE.sub("", text_norm)
+    for trigger in (TOP_RE, MOST_RE, GROUP_BY_RE):
+        text_wo_trigger = trigger.sub("", text_wo_trigger)
     text_wo_trigger = PRODUCT_RE.sub("", text_wo_trigger).strip()
 
-    category   = extract_category(text_wo_trigger)
-    brand      = extract_brand(text_wo_trigger)
-    ingredient = extract_ingredient(text_wo_trigger)
-
-    return {"category": category, "brand": brand, "ingredient": ingredient}
+    entities = extract_entities(text_wo_trigger, matcher)
+    return {**entities, "group_by": group_by, "top": top,
+            "corrections": [c._asdict() for c in corrections],
+            "confidence": min((c.confidence for c in corrections), default=1.0)}
 
 # ───────────────────────────────
 # 3) Extraction of structured elements
 # ───────────────────────────────
+# Curated names and aliases ("kitkat"); the matcher adds every graph node name.
 CATEGORIES = {
     "coffee", "sauce", "nutrition", "quick mix drinks",
     "chocolate", "ice cream"
@@ -81,27 +146,58 @@ INGREDIENTS = {
     "lemon", "orange", "apple", "banana"
 }
 
-def _find_in_set(text: str, lexicon: set[str]) -> Optional[str]:
-    for term in lexicon:
-        pattern = r"\b" + re.sub(r"\s+", r"[\\s\\-]+", re.escape(term)) + r"\b"
-        if re.search(pattern, text, flags=re.I):
-            return term
-    return None
-
-def extract_category(text: str) -> Optional[str]:
-    return _find_in_set(text, CATEGORIES)
-
-def extract_brand(text: str) -> Optional[str]:
-    return _find_in_set(text, BRANDS)
-
-def extract_ingredient(text: str) -> Optional[str]:
-    return _find_in_set(text, INGREDIENTS)
+def extract_entities(text: str, matcher=None) -> dict:
+    """
+    {"category", "brand", "ingredient"}: first of each kind, found in one
+    longest-match pass (entity_matcher.py); "ingredients": every ingredient
+    named ("sugar and milk"), all required by the facet engine.
+    """
+    found = _matcher(matcher).extract_all(text)
+    return {**{kind: terms[0] if terms else None for kind, terms in found.items()},
+            "ingredients": found["ingredient"]}
 
 # ───────────────────────────────
 # 4) Executing the Cypher query
 # ───────────────────────────────
-def execute_structured_query(params: dict) -> str:
-    with driver.session() as session:
+def describe_filters(params: dict) -> str:
+    parts = []
+    if params.get("category"):
+        parts.append(f" in the category '{params['category']}'")
+    if params.get("brand"):
+        parts.append(f" for the brand '{params['brand']}'")
+    ingredients = params.get("ingredients") or ([params["ingredient"]] if params.get("ingredient") else [])
+    if len(ingredients) > 1:
+        parts.append(" containing the ingredients " + " and ".join(f"'{i}'" for i in ingredients))
+    elif ingredients:
+        parts.append(f" containing the ingredient '{ingredients[0]}'")
+    return "".join(parts)
+
+def execute_facet_query(params: dict, version: Optional[str] = None) -> str:
+    """Combined filters, group-bys and top-N answered from the bitmap facet index."""
+    from facets import get_facet_index
+    index = get_facet_index(version)
+    filters = {"category": params.get("category"), "brand": params.get("brand"),
+               "ingredient": params.get("ingredients") or params.get("ingredient")}
+
+    if params.get("group_by"):
+        facet = params["group_by"]
+        rows = index.group_by(facet, top=params.get("top") or GROUP_BY_DEFAULT_TOP, **filters)
+        if not rows:
+            return f"There are 0 products{describe_filters(params)}."
+        lines = [f"{i}. {name}: {count}" for i, (name, count) in enumerate(rows, 1)]
+        return f"Number of products per {facet}{describe_filters(params)}:\n" + "\n".join(lines)
+
+    count = index.count(**filters)
+    if not any(filters.values()):
+        return f"There are {count} products listed."
+    return f"There are {count} products{describe_filters(params)}."
+
+def execute_structured_query(params: dict, version: Optional[str] = None) -> str:
+    if FACET_ENGINE:
+        return execute_facet_query(params, version)
+    if GRAPH_BACKEND == "embedded":
+        return execute_structured_query_embedded(params)
+    with get_neo4j_driver().session() as session:
         if params["category"]:
             query = (
                 "MATCH (p:Product)-[:IN_CATEGORY]->(c:Category) "
@@ -135,15 +231,58 @@ def execute_structured_query(params: dict) -> str:
             count = result.single()["total"]
             return f"There are {count} products listed."
 
+def execute_structured_query_embedded(params: dict) -> str:
+    """Same answers as execute_structured_query, counted on the embedded graph."""
+    engine = get_graph_engine()
+    if params["category"]:
+        count = engine.count_products(category=params["category"])
+        return f"There are {count} products in the category '{params['category']}'."
+    elif params["brand"]:
+        count = engine.count_products(brand=params["brand"])
+        return f"There are {count} products for the brand '{params['brand']}'."
+    elif params["ingredient"]:
+        count = engine.count_products(ingredient=params["ingredient"])
+        return f"There are {count} products containing the ingredient '{params['ingredient']}'."
+    else:
+        return f"There are {engine.count_products()} products listed."
+
 # ───────────────────────────────
 # 5) Main Router
 # ───────────────────────────────
+def route_question(question: str, version: str) -> str:
+    """Count answer for `question` on data `version`, False when it is not a count question."""
+    structured = detect_structured_query(question, version)
+    if structured and structured["corrections"]:
+        fixes = ", ".join(f"{c['token']}→{c['word']}" for c in structured["corrections"])
+        print(f"🔤 Typos corrected ({fixes}), confidence {structured['confidence']:.2f}")
+    return execute_structured_query(structured, version) if structured else False
+
 def handle_question(question: str) -> str:
-    structured = detect_structured_query(question)
-    if structured:
-        return execute_structured_query(structured)
-    else:
-        return False
+    from answer_cache import current_data_version
+    t0 = time.perf_counter()
+    # one data-version read per question: the matcher and the facet index both check it
+    answer = route_question(question, current_data_version())
+    # latency is recorded under the route the router picked
+    observe("ask_stage_seconds", time.perf_counter() - t0,
+            stage="handle_question", route="count" if answer else "rag")
+    return answer
+
+def handle_questions(questions: List[str], version: Optional[str] = None) -> List[str]:
+    """
+    handle_question for a batch (batch_ask.py): the data version is read once
+    and the matcher and facet index are looked up once for every question.
+    """
+    from answer_cache import current_data_version
+    from entity_matcher import get_entity_matcher
+    t0 = time.perf_counter()
+    version = version or current_data_version()
+    get_entity_matcher(version)
+    if FACET_ENGINE:
+        from facets import get_facet_index
+        get_facet_index(version)
+    answers = [route_question(q, version) for q in questions]
+    observe("ask_stage_seconds", time.perf_counter() - t0, stage="handle_question", route="batch")
+    return answers
 
 # ───────────────────────────────
 # Exemple 
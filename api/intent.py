@@ -0,0 +1,49 @@
+"""
+Question intent for the RAG path, mirroring the three answer modes of the
+prompt (llm.build_prompt → INTENT DETECTION RULES):
+
+    "where_to_buy"  where can I buy / stores near me / Amazon
+    "detail"        calories, ingredients, allergens, nutrition facts…
+    "general"       everything else
+
+The graph fetch only returns the fields the intent needs (graph_query.INTENT_FIELDS)
+and the store context is only built for "where_to_buy".
+"""
+
+import os, regex as re
+from typing import Optional
+from dotenv import load_dotenv
+from intelligent_count import normalize_question
+
+load_dotenv()
+# "intent": project the graph fetch on the detected intent, "full": every field for every question
+GRAPH_PROJECTION = os.getenv("GRAPH_PROJECTION", "intent").lower()
+
+WHERE_TO_BUY_KEYWORDS = [
+    r"where\b.*\b(?:buy|purchase|find|get)", r"\bbuy\b", r"\bpurchase\b", r"\bstores?\b",
+    r"\bshops?\b", r"\bnear(?:by| me)\b", r"\bclosest\b", r"\bnearest\b", r"\bamazon\b",
+    r"\bsold\b", r"\bacheter\b", r"\bmagasins?\b", r"\bou\s+trouver\b",
+]
+DETAIL_KEYWORDS = [
+    r"\bcalorie", r"\bkcal\b", r"\bnutrition", r"\bingredient", r"\ballerg", r"\bgluten",
+    r"\bprotein", r"\bsugars?\b", r"\bfat\b", r"\bsodium\b", r"\bcarb", r"\bfib(?:er|re)\b",
+    r"\bvitamin", r"\bserving", r"\bhow\s+much\b", r"\bcontain", r"\bsize\b", r"\bvegan\b",
+    r"\bcontient\b", r"\bvaleur\s+nutritive\b",
+]
+
+WHERE_TO_BUY_RE = re.compile("|".join(WHERE_TO_BUY_KEYWORDS), re.I)
+DETAIL_RE       = re.compile("|".join(DETAIL_KEYWORDS),       re.I)
+
+
+def detect_intent(question: str) -> str:
+    text = normalize_question(question or "")
+    if WHERE_TO_BUY_RE.search(text):
+        return "where_to_buy"
+    if DETAIL_RE.search(text):
+        return "detail"
+    return "general"
+
+
+def projection_intent(question: str) -> Optional[str]:
+    """Intent the graph fetch is projected on, None when GRAPH_PROJECTION=full."""
+    return detect_intent(question) if GRAPH_PROJECTION == "intent" else None
@@ -1,17 +1,23 @@
 # ─────────── dependencies ───────────────────────────────────
 import os, json
+from typing import AsyncIterator, Iterator
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
+from clients import get_genai_client
+from metrics import observe, timed
+from context_packer import MAX_OUTPUT_TOKENS, PackedContext, estimate_tokens, pack_context
+from intent import detect_intent
+from prompt_template import SYSTEM_INSTRUCTION, STATIC_PROMPT, question_prompt
 from vector_search       import run_query          
 from graph_search     import fetch_graphrag_data  
 from graph_query import FETCH_GRAPH_QUERY
 # -----------------------------------------------------------
 
-# 1)  ENV + Gemini client
+# 1)  ENV (the Gemini client lives in the shared registry, see clients.py)
 load_dotenv()
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-client = genai.Client(api_key=os.getenv("GEMINI_API"))
+# Estimated input tokens per prompt (template + question + packed context)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
 
 
 
@@ -37,95 +43,156 @@ def format_graph_content(records: list[dict]) -> str:
     
     return "\n".join(lines)
 
-# 3) LLM wrapper without vector_content
-def generate_gemini_response(
-    question: str,
-    graphRAG_content: str,
-    stores_information: str,
-    model: str = "gemini-2.0-flash",
-) -> str:
+# 3) Prompt shared by the blocking and the streaming wrappers (static part: prompt_template.py)
+def build_prompt(question: str, graphRAG_content: str, stores_information: str) -> str:
     """
-    Generates the Gemini response while respecting the styles observed on the UI:
+    Builds the prompt respecting the styles observed on the UI:
     - Friendly intro sentence.
     - Numbered list with bold titles.
     - Always include the product URL with an engaging label.
     - Three modes: where-to-buy, specific details, and generic response.
     """
+    return STATIC_PROMPT + question_prompt(question, graphRAG_content, stores_information)
+
 
-    prompt = f"""
-You are the MadeWithNestlé AI assistant.
-
-STYLE & FORMAT
-==============
-• Always start the answer with a short, friendly greeting sentence (e.g., “Here’s what I found for you!”).
-• Then, structure the answer into a clear, easy-to-read **numbered list** (1., 2., 3., etc.).
-  - For each item:
-    - Begin with the **product/recipe title in bold**.
-    - On a new line, provide the main detail (depending on intent).
-    - If appropriate, add a short description (1-2 sentences) written in a warm, conversational tone.
-    - Always include “For more details: <URL>” on a new line.
-
-• Format:
-    1. **Title**
-       Detail line 1.
-       Detail line 2 (if needed).
-       For more details: <URL>
-
-• Keep each bullet short and concise (2-4 lines maximum).
-• Do NOT use Markdown headings, tables, or code blocks.
-• Use line breaks (\\n) to separate each line clearly.
-• If a field is missing, write “Not available”.
-• Never invent information — use only what’s in **GraphRAG Context** and **Stores Info**.
-
-INTENT DETECTION RULES
-======================
-
-• For general questions:
-    - Write a short, engaging description (1-2 lines).
-    - Finish with “For more details: <URL>”.
-• If the question is about a specific detail (e.g. calories, ingredients):
-    - Start with a short, friendly phrase introducing the detail (e.g., “Here’s the information you requested about calories:”).
-    - Then provide the detail on a new line.
-    - Finish with “For more details: <URL>”.
-• If the question is about where to buy a product:
-    - List the store(s) with name, address, and distance (format: “Store: <name> | Address: <address> | Distance: <X> km”).
-    - Include an Amazon link if available.
-    - Finish with “For more details: <URL>”.
-
-
-
-User Question:
-{question}
-
-GraphRAG Context:
-{graphRAG_content}
-
-Stores Info:
-{stores_information}
-"""
+def pack_prompt_context(question: str, records: list[dict], stores_information: str,
+                        intent: str = None) -> PackedContext:
+    """Fits the records and store lines into what PROMPT_TOKEN_BUDGET leaves after the template."""
+    intent = intent or detect_intent(question)
+    overhead = estimate_tokens(SYSTEM_INSTRUCTION) + estimate_tokens(build_prompt(question, "", ""))
+    packed = pack_context(records, stores_information, intent, PROMPT_TOKEN_BUDGET - overhead)
+    if packed.dropped:
+        print(f"✂️ Context packing ({intent}): kept {packed.records} records, dropped {packed.dropped}")
+    return packed
+
+
+def _config(intent: str = None) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_INSTRUCTION,
+        max_output_tokens=MAX_OUTPUT_TOKENS.get(intent or "general"),
+    )
+
+
+def _log_prompt_tokens(prompt: str, usage, intent: str = None) -> None:
+    """Logs Gemini's prompt_token_count (the local estimate when the response has none)."""
+    estimated = estimate_tokens(SYSTEM_INSTRUCTION) + estimate_tokens(prompt)
+    sent = getattr(usage, "prompt_token_count", None)
+    # implicit prefix caching: the static rules come first in every prompt
+    from_cache = getattr(usage, "cached_content_token_count", None) or 0
+    observe("ask_prompt_tokens", sent or estimated, route="rag", intent=intent or "general")
+    print(f"🧾 Prompt tokens ({intent or 'general'}): {sent if sent is not None else '?'} sent "
+          f"({from_cache} from cache), {estimated} estimated")
+
+
+# 4) LLM wrapper without vector_content
+def generate_gemini_response(
+    question: str,
+    graphRAG_content: str,
+    stores_information: str,
+    model: str = "gemini-2.0-flash",
+    intent: str = None,
+) -> str:
+    """Generates the full Gemini response in one blocking call."""
+    prompt = build_prompt(question, graphRAG_content, stores_information)
+    observe("ask_prompt_chars", len(prompt), route="rag")
 
     try:
-        response = client.models.generate_content(
+        with timed("generate_gemini_response"):
+            response = get_genai_client().models.generate_content(
+                model=model,
+                config=_config(intent),
+                contents=prompt,
+            )
+        _log_prompt_tokens(prompt, response.usage_metadata, intent)
+        return response.text
+    except Exception as e:
+        return f"❌ Error generating response: {e}"
+
+
+# 5) Streaming wrapper: yields the answer chunk by chunk as Gemini produces it
+class GenerationError(str):
+    """Error text a stream yields in place of the remaining chunks: the answer is incomplete."""
+
+
+def stream_gemini_response(
+    question: str,
+    graphRAG_content: str,
+    stores_information: str,
+    model: str = "gemini-2.0-flash",
+    intent: str = None,
+) -> Iterator[str]:
+    prompt = build_prompt(question, graphRAG_content, stores_information)
+    observe("ask_prompt_chars", len(prompt), route="rag")
+
+    try:
+        usage = None
+        for chunk in get_genai_client().models.generate_content_stream(
             model=model,
-            config=types.GenerateContentConfig(
-                system_instruction=(
-                    "Follow the STYLE & FORMAT and INTENT DETECTION RULES exactly. "
-                    "Use engaging language for product links (e.g., “For more details on this product: <URL>”) "
-                    "and never add information not in the provided context."
-                )
-            ),
+            config=_config(intent),
             contents=prompt,
-        )
+        ):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+        _log_prompt_tokens(prompt, usage, intent)
+    except Exception as e:
+        yield GenerationError(f"❌ Error generating response: {e}")
+
+
+# 6) Async variants (ASGI mode) on Gemini's `client.aio` API
+async def generate_gemini_response_async(
+    question: str,
+    graphRAG_content: str,
+    stores_information: str,
+    model: str = "gemini-2.0-flash",
+    intent: str = None,
+) -> str:
+    prompt = build_prompt(question, graphRAG_content, stores_information)
+    observe("ask_prompt_chars", len(prompt), route="rag")
+
+    try:
+        with timed("generate_gemini_response"):
+            response = await get_genai_client().aio.models.generate_content(
+                model=model,
+                config=_config(intent),
+                contents=prompt,
+            )
+        _log_prompt_tokens(prompt, response.usage_metadata, intent)
         return response.text
     except Exception as e:
         return f"❌ Error generating response: {e}"
 
 
+async def stream_gemini_response_async(
+    question: str,
+    graphRAG_content: str,
+    stores_information: str,
+    model: str = "gemini-2.0-flash",
+    intent: str = None,
+) -> AsyncIterator[str]:
+    prompt = build_prompt(question, graphRAG_content, stores_information)
+    observe("ask_prompt_chars", len(prompt), route="rag")
+
+    try:
+        usage = None
+        async for chunk in await get_genai_client().aio.models.generate_content_stream(
+            model=model,
+            config=_config(intent),
+            contents=prompt,
+        ):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+        _log_prompt_tokens(prompt, usage, intent)
+    except Exception as e:
+        yield GenerationError(f"❌ Error generating response: {e}")
+
+
 
 
 
 
-# 4)  Exemple
+# 7)  Exemple
 if __name__ == "__main__":
     question = "Give me Smarties recipes"
     # 4-a  vector search → ids 
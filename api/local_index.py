@@ -0,0 +1,109 @@
+import json, pathlib
+from typing import List, Optional
+
+import numpy as np
+
+from vector_store import VECTORS_DIR, VectorStore, get_vector_store
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+MIN_SIMILARITY = 0.6
+
+# ──────────────────────────────────────────────────────────────
+# 2) In-process index
+# ──────────────────────────────────────────────────────────────
+class LocalVectorIndex:
+    """
+    Brute-force cosine index kept in memory.
+
+    • `matrix` is a float32 (n, dim) array of L2-normalized rows, either a
+      private copy or the read-only memory map of the packed vector store.
+      A float16 store stays memory-mapped too and is cast to float32 per query.
+    • `ids` holds the datapoint id of each row, in the same order.
+    A query is a single matrix-vector product followed by a partial sort.
+    """
+
+    def __init__(self, ids: List[str], matrix: np.ndarray):
+        if len(ids) != matrix.shape[0]:
+            raise ValueError("❌ ids and matrix rows do not match.")
+        self.ids = [str(i) for i in ids]
+        norms = np.linalg.norm(np.asarray(matrix, dtype=np.float32), axis=1, keepdims=True)
+        if matrix.dtype in (np.float32, np.float16) and np.allclose(norms, 1.0, atol=1e-3):
+            # Already unit-length (text-embedding-004): keep the (possibly
+            # memory-mapped) matrix as is so workers share its pages.
+            self.matrix = matrix
+        else:
+            norms[norms == 0] = 1.0
+            self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+    @classmethod
+    def from_directory(cls, folder: pathlib.Path = VECTORS_DIR) -> "LocalVectorIndex":
+        ids, rows = [], []
+        for fp in sorted(pathlib.Path(folder).glob("*.json")):
+            try:
+                data = json.loads(fp.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"⚠️  Skip {fp.name}: {e}")
+                continue
+            if not data.get("id") or not data.get("embedding"):
+                continue
+            ids.append(data["id"])
+            rows.append(data["embedding"])
+        if not rows:
+            raise ValueError(f"❌ No vector found in {folder}.")
+        return cls(ids, np.asarray(rows, dtype=np.float32))
+
+    @classmethod
+    def from_store(cls, store: VectorStore) -> "LocalVectorIndex":
+        return cls(list(store.ids), store.embeddings)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, vector, num_neighbors: int = 5) -> List[tuple[str, float]]:
+        """Returns [(datapoint_id, cosine_similarity), …] sorted by decreasing similarity."""
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        if self.matrix.dtype == np.float32:
+            scores = self.matrix @ q
+        else:
+            scores = np.asarray(self.matrix, dtype=np.float32) @ q
+        k = min(num_neighbors, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def query_ids(self, vector, num_neighbors: int = 5) -> List[str]:
+        """Same output as vector_search.run_query: ids whose similarity > 0.6."""
+        return [
+            dp_id
+            for dp_id, score in self.search(vector, num_neighbors)
+            if score > MIN_SIMILARITY
+        ]
+
+# ──────────────────────────────────────────────────────────────
+# 3) Lazy process-wide instance
+# ──────────────────────────────────────────────────────────────
+_index: Optional[LocalVectorIndex] = None
+
+def get_local_index() -> LocalVectorIndex:
+    global _index
+    if _index is None:
+        store = get_vector_store()
+        if store is not None:
+            _index = LocalVectorIndex.from_store(store)
+            source = store.folder
+        else:
+            _index = LocalVectorIndex.from_directory(VECTORS_DIR)
+            source = VECTORS_DIR
+        print(f"📦 Local vector index loaded: {len(_index)} vectors from {source}")
+    return _index
+
+
+if __name__ == "__main__":
+    idx = get_local_index()
+    first = idx.matrix[0]
+    print(idx.search(first, 5))
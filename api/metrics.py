@@ -0,0 +1,165 @@
+"""
+Minimal in-process metrics rendered in the Prometheus text format (/metrics).
+
+    with timed("embed_query", route="rag"):
+        ...
+    observe("ask_prompt_chars", len(prompt), route="rag")
+
+Values are per worker process; Prometheus aggregates across workers/pods.
+"""
+
+import threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS    = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+COUNT_BUCKETS   = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Iterable[str], buckets: Iterable[float]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        # series layout: [bucket counts…, +Inf count, sum]
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            base = [f'{l}="{v}"' for l, v in zip(self.labels, key)]
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = ",".join(base + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{labels}}} {int(cumulative)}")
+            suffix = f"{{{','.join(base)}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {int(cumulative)}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Iterable[str]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = ",".join(f'{l}="{v}"' for l, v in zip(self.labels, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+# ──────────────────────────────────────────────────────────────
+# Registry
+# ──────────────────────────────────────────────────────────────
+_metrics: Dict[str, object] = {}
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _register(metric):
+    _metrics[metric.name] = metric
+    return metric
+
+
+STAGE_SECONDS = _register(Histogram(
+    "ask_stage_seconds", "Duration of each /ask pipeline stage.", ["stage", "route"], LATENCY_BUCKETS))
+REQUESTS = _register(Counter(
+    "ask_requests_total", "Answered /ask requests by route (count, rag, cache).", ["route"]))
+PROMPT_CHARS = _register(Histogram(
+    "ask_prompt_chars", "Size of the prompt sent to Gemini (characters).", ["route"], SIZE_BUCKETS))
+PROMPT_TOKENS = _register(Histogram(
+    "ask_prompt_tokens", "Prompt tokens sent to Gemini (its usage metadata, else the local estimate).",
+    ["route", "intent"], SIZE_BUCKETS))
+GRAPH_RECORDS = _register(Histogram(
+    "graph_fetch_records", "Records returned by one graph fetch.", [], COUNT_BUCKETS))
+VECTOR_BATCH_SIZE = _register(Histogram(
+    "vector_batch_size", "Requests sent in one micro-batched embedding / find_neighbors call.", ["call"], COUNT_BUCKETS))
+SINGLE_FLIGHT = _register(Counter(
+    "ask_single_flight_total",
+    "Pipeline runs started (leader) and requests served by an identical in-flight run (follower).",
+    ["endpoint", "role"]))
+
+
+def observe(name: str, value: float, **labels) -> None:
+    _metrics[name].observe(value, **labels)
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    _metrics[name].inc(amount, **labels)
+
+
+@contextmanager
+def timed(stage: str, route: str = "rag"):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=stage, route=route)
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, int]]) -> None:
+    """Exposes a cache's stats() dict as cache_<counter>{cache="name"} gauges, plus its hit rate."""
+    def collect() -> List[str]:
+        values = stats()
+        lines = [f'cache_{k}{{cache="{name}"}} {v}' for k, v in sorted(values.items())]
+        lookups = values.get("hits", 0) + values.get("misses", 0)
+        if lookups:
+            lines.append(f'cache_hit_ratio{{cache="{name}"}} {values.get("hits", 0) / lookups:.4f}')
+        return lines
+    _collectors.append(collect)
+
+
+def _dedupe_ratio() -> List[str]:
+    """Share of requests per endpoint that followed an in-flight run instead of starting one."""
+    counts: Dict[str, Dict[str, float]] = {}
+    with SINGLE_FLIGHT._lock:
+        for (endpoint, role), value in SINGLE_FLIGHT._values.items():
+            counts.setdefault(endpoint, {})[role] = value
+    lines = []
+    for endpoint, roles in sorted(counts.items()):
+        total = roles.get("leader", 0) + roles.get("follower", 0)
+        if total:
+            lines.append(f'ask_dedupe_ratio{{endpoint="{endpoint}"}} {roles.get("follower", 0) / total:.4f}')
+    return lines
+
+
+_collectors.append(_dedupe_ratio)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics.values():
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            lines.extend(collect())
+        except Exception as e:
+            lines.append(f"# collector error: {e}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,156 @@
+"""
+Micro-batching of concurrent calls to a batch API.
+
+Requests arriving within `max_wait` seconds of each other (or until
+`max_batch` of them are waiting) are sent as one `fn(items)` call, and each
+caller gets back its own result:
+
+    batcher = MicroBatcher("embed_query", embed_queries_uncached, max_batch=16, max_wait=0.005)
+    vector = batcher.submit("kitkat recipes")        # blocks until its batch returns
+
+The first caller of a batch waits out the window and makes the call; the
+others wait for its result, so there is no background thread. An error in
+the batch call is raised to every caller of that batch. AsyncMicroBatcher
+does the same for coroutines on one event loop. Batch sizes are exported as
+vector_batch_size{call}.
+
+    python api/micro_batch.py bench     # calls and wall time against a simulated quota-bound API
+"""
+
+import asyncio, sys, threading, time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+from metrics import observe
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.results: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]], max_batch: int = 16, max_wait: float = 0.005):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+
+    def submit(self, item: Any) -> Any:
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            idx = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[idx]
+
+    def _flush(self, batch: _Batch) -> None:
+        observe("vector_batch_size", len(batch.items), call=self.name)
+        try:
+            batch.results = list(self.fn(batch.items))
+            if len(batch.results) != len(batch.items):
+                raise RuntimeError(f"❌ {self.name}: {len(batch.results)} results for {len(batch.items)} items")
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+class AsyncMicroBatcher:
+    def __init__(self, name: str, fn: Callable[[List[Any]], Awaitable[List[Any]]], max_batch: int = 16,
+                 max_wait: float = 0.005):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._open: Optional[List[Tuple[Any, asyncio.Future]]] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._open is None:
+            self._open = []
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        self._open.append((item, future))
+        if len(self._open) >= self.max_batch:
+            self._timer.cancel()
+            self._flush()
+        return await future
+
+    def _flush(self) -> None:
+        batch, self._open = self._open, None
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        observe("vector_batch_size", len(batch), call=self.name)
+        try:
+            results = list(await self.fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"❌ {self.name}: {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():          # its caller may have been cancelled
+                future.set_result(result)
+
+# ──────────────────────────────────────────────────────────────
+# Benchmark
+# ──────────────────────────────────────────────────────────────
+def bench(requests: int = 64, concurrency: int = 16, overhead: float = 0.05, quota: int = 2) -> None:
+    """Concurrent callers against a batch API costing `overhead` seconds per call, `quota` calls at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    for label, max_batch in (("one per call", 1), ("micro-batched", concurrency)):
+        calls, slots = [], threading.Semaphore(quota)
+
+        def api(items):
+            with slots:
+                calls.append(len(items))
+                time.sleep(overhead)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher("bench", api, max_batch=max_batch, max_wait=0.005)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(batcher.submit, range(requests)))
+        elapsed = time.perf_counter() - t0
+        assert results == [i * 2 for i in range(requests)]
+        print(f"{label:<14}: {len(calls):3d} calls for {requests} requests "
+              f"(mean batch {requests / len(calls):.1f}), {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        bench()
+    else:
+        print("usage: python api/micro_batch.py bench")
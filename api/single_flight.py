@@ -0,0 +1,222 @@
+"""
+Single-flight coalescing of identical concurrent /ask and /ask/stream requests.
+
+Requests are keyed like the answer cache (answer_cache.cache_key: data
+version + geohash bucket of the location + normalized question), per
+endpoint: /ask and /ask/stream runs produce different events (one "answer"
+vs live "chunk"s), so each endpoint follows only its own. The first
+request for a key starts the pipeline once, detached from the request, and
+every event it produces ("retrieval", "chunk", "answer", "done") is recorded
+on the flight. Identical requests arriving while it runs follow that flight
+instead of making their own embedding, vector, graph and Gemini calls:
+they replay the recorded events, then get the live ones as they come, so a
+streaming follower sees the leader's Gemini chunks as they are generated
+and a blocking one gets the assembled answer (collect_answer). The flight
+is forgotten when it ends; later requests are served by the answer cache.
+
+Because the pipeline runs detached, a client disconnecting does not cut the
+answer short for the others.
+
+    SingleFlight       – worker threads (app.py)
+    AsyncSingleFlight  – event loop tasks (async_pipeline.py)
+
+Coalescing is per worker process. Leaders and followers are counted in
+ask_single_flight_total{endpoint,role}, with ask_dedupe_ratio{endpoint} on /metrics.
+"""
+
+import asyncio, os, threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from metrics import inc
+
+load_dotenv()
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "on").lower() == "on"
+# A follower gives up when its flight produces nothing for this long
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "120"))
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def collect_answer(events: Iterable[Event]) -> Dict[str, Any]:
+    """/ask response from a flight's events: its whole answer, or the streamed chunks joined."""
+    parts = []
+    for event, payload in events:
+        if event == "answer":
+            return payload
+        if event == "chunk":
+            parts.append(payload.get("text", ""))
+    return {"answer": "".join(parts)}
+
+# ──────────────────────────────────────────────────────────────
+# Threads (Flask)
+# ──────────────────────────────────────────────────────────────
+class _Flight:
+    def __init__(self):
+        self.events: List[Event] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def publish(self, event: Event) -> None:
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.done, self.error = True, error
+            self._cond.notify_all()
+
+    def follow(self, timeout: float) -> Iterator[Event]:
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self.events) and not self.done:
+                    if not self._cond.wait(timeout):
+                        raise TimeoutError(f"single flight idle for {timeout:.0f}s")
+                batch, done, error = self.events[i:], self.done, self.error
+            i += len(batch)
+            yield from batch
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._lock = threading.Lock()
+
+    def events(self, endpoint: str, key: str, produce: Callable[[], Iterable[Event]]) -> Iterator[Event]:
+        """Events of the in-flight `endpoint` run for `key`, starting `produce()` if there is none."""
+        key = (endpoint, key)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        inc("ask_single_flight_total", endpoint=endpoint, role="leader" if leader else "follower")
+        if leader:
+            threading.Thread(target=self._run, args=(key, flight, produce),
+                             name="single-flight", daemon=True).start()
+        return flight.follow(self.timeout)
+
+    def _run(self, key: Tuple[str, str], flight: _Flight, produce: Callable[[], Iterable[Event]]) -> None:
+        error = None
+        try:
+            for event in produce():
+                flight.publish(event)
+        except BaseException as e:
+            error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish(error)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+# ──────────────────────────────────────────────────────────────
+# asyncio (ASGI)
+# ──────────────────────────────────────────────────────────────
+class _AsyncFlight:
+    def __init__(self):
+        self.events: List[Event] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Event) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done, self.error = True, error
+        self._notify()
+
+    async def follow(self, timeout: float) -> AsyncIterator[Event]:
+        i = 0
+        while True:
+            while i >= len(self.events) and not self.done:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"single flight idle for {timeout:.0f}s") from None
+            batch, done, error = self.events[i:], self.done, self.error
+            i += len(batch)
+            for event in batch:
+                yield event
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class AsyncSingleFlight:
+    def __init__(self, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._flights: Dict[Tuple[str, str], _AsyncFlight] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def events(self, endpoint: str, key: str, produce: Callable[[], AsyncIterator[Event]]) -> AsyncIterator[Event]:
+        """Events of the in-flight `endpoint` run for `key`, starting `produce()` if there is none."""
+        key = (endpoint, key)
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._flights[key] = _AsyncFlight()
+            # a task of its own: cancelling the leading request leaves the followers' answer running
+            task = asyncio.create_task(self._run(key, flight, produce))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        inc("ask_single_flight_total", endpoint=endpoint, role="leader" if leader else "follower")
+        return flight.follow(self.timeout)
+
+    async def _run(self, key: Tuple[str, str], flight: _AsyncFlight, produce: Callable[[], AsyncIterator[Event]]) -> None:
+        error = None
+        try:
+            async for event in produce():
+                flight.publish(event)
+        except BaseException as e:
+            error = e
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.finish(error)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+# ──────────────────────────────────────────────────────────────
+# Process-wide instances
+# ──────────────────────────────────────────────────────────────
+_single_flight: Optional[SingleFlight] = None
+_async_single_flight: Optional[AsyncSingleFlight] = None
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """None when SINGLE_FLIGHT=off."""
+    global _single_flight
+    if not SINGLE_FLIGHT:
+        return None
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def get_async_single_flight() -> Optional[AsyncSingleFlight]:
+    """None when SINGLE_FLIGHT=off."""
+    global _async_single_flight
+    if not SINGLE_FLIGHT:
+        return None
+    if _async_single_flight is None:
+        _async_single_flight = AsyncSingleFlight()
+    return _async_single_flight
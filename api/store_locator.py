@@ -0,0 +1,166 @@
+"""
+Nearest-store engine behind generate_graph_context and /stores/nearby.
+
+Every Store node (name, address, location) is loaded once into NumPy arrays,
+bucketed in a lat/lon grid of STORE_GRID_DEGREES cells, with the stores
+carrying each product (by vector_id and by title). A query walks the grid
+rings around the user until the k-th nearest candidate is closer than any
+unvisited cell, then ranks the candidates with one vectorized haversine:
+
+    get_store_locator().nearby(43.78, -79.40, k=3, products=["<vector_id>"])
+    → [{"name", "address", "latitude", "longitude", "distance_km"}, …]
+
+The locator is rebuilt when the data version changes.
+"""
+
+import math, os, threading, time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from answer_cache import current_data_version
+from graph_engine import GRAPH_BACKEND, get_graph_engine
+from graph_query import STORES_QUERY
+
+load_dotenv()
+STORE_GRID_DEGREES = float(os.getenv("STORE_GRID_DEGREES", "0.25"))
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class StoreLocator:
+    def __init__(self, rows: Iterable[Dict[str, Any]], grid_degrees: float = STORE_GRID_DEGREES):
+        self.grid = grid_degrees
+        self.names: List[str] = []
+        self.addresses: List[str] = []
+        lats, lons = [], []
+        by_product: Dict[str, List[int]] = defaultdict(list)
+        for row in rows:
+            try:
+                lat, lon = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            idx = len(self.names)
+            self.names.append(row.get("name"))
+            self.addresses.append(row.get("address"))
+            lats.append(lat)
+            lons.append(lon)
+            for key in (row.get("products") or []) + (row.get("titles") or []):
+                if key:
+                    by_product[key].append(idx)
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self.by_product = {k: np.unique(v) for k, v in by_product.items()}
+
+        cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for idx, (lat, lon) in enumerate(zip(lats, lons)):
+            cells[self._cell(lat, lon)].append(idx)
+        self.cells = {c: np.asarray(v) for c, v in cells.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.grid), math.floor(lon / self.grid)
+
+    def stores_carrying(self, products: Iterable[str]) -> np.ndarray:
+        """Store indices selling any of the products (vector ids or titles)."""
+        found = [self.by_product[p] for p in products if p in self.by_product]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def _candidates(self, lat: float, lon: float, k: int, allowed: Optional[np.ndarray]) -> np.ndarray:
+        """Grid rings around the user until no unvisited cell can hold a closer store."""
+        mask = None
+        if allowed is not None:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[allowed] = True
+        ci, cj = self._cell(lat, lon)
+        found: List[np.ndarray] = []
+        r = 0
+        while 8 * r <= len(self.cells):  # past that, one ring costs more than a full scan
+            for di in range(-r, r + 1):
+                for dj in range(-r, r + 1):
+                    if max(abs(di), abs(dj)) != r:
+                        continue
+                    idx = self.cells.get((ci + di, cj + dj))
+                    if idx is not None:
+                        found.append(idx if mask is None else idx[mask[idx]])
+            candidates = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+            if len(candidates) >= k:
+                # anything outside the rings is at least r full cells away in lat or lon
+                cos_lat = math.cos(math.radians(min(89.9, abs(lat) + (r + 1) * self.grid)))
+                bound = r * self.grid * KM_PER_DEGREE * cos_lat
+                d = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+                if np.partition(d, k - 1)[k - 1] <= bound:
+                    return candidates
+            r += 1
+        return np.arange(len(self)) if allowed is None else allowed
+
+    def nearby(self, lat: float, lon: float, k: int = 5,
+               products: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """k nearest stores, optionally only those carrying any of `products`."""
+        allowed = None if products is None else self.stores_carrying(products)
+        if not len(self) or k <= 0 or (allowed is not None and not len(allowed)):
+            return []
+        candidates = self._candidates(lat, lon, k, allowed)
+        d = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        return self._rows(candidates, d, k)
+
+    def nearby_each(self, lat: float, lon: float, products: Iterable[str], k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """nearby() for several products at once, from one distance computation to every store."""
+        d_all = haversine_km(lat, lon, self.lat, self.lon) if len(self) else None
+        nearest = {}
+        for product in products:
+            idx = self.by_product.get(product)
+            if idx is not None and k > 0:
+                nearest[product] = self._rows(idx, d_all[idx], k)
+        return nearest
+
+    def _rows(self, idx: np.ndarray, d: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        order = np.argsort(d, kind="stable")[:k]
+        return [
+            {"name": self.names[idx[o]], "address": self.addresses[idx[o]],
+             "latitude": float(self.lat[idx[o]]), "longitude": float(self.lon[idx[o]]),
+             "distance_km": float(d[o])}
+            for o in order
+        ]
+
+# ──────────────────────────────────────────────────────────────
+# Loading + refresh
+# ──────────────────────────────────────────────────────────────
+def load_stores() -> List[Dict[str, Any]]:
+    if GRAPH_BACKEND == "embedded":
+        return get_graph_engine().stores()
+
+    from clients import get_neo4j_driver
+    with get_neo4j_driver().session() as session:
+        return [r.data() for r in session.run(STORES_QUERY)]
+
+
+_lock = threading.Lock()
+_locator: Optional[StoreLocator] = None
+_version = None
+
+
+def get_store_locator() -> StoreLocator:
+    global _locator, _version
+    version = current_data_version()
+    if _locator is None or _version != version:
+        with _lock:
+            if _locator is None or _version != version:
+                t0 = time.perf_counter()
+                _locator, _version = StoreLocator(load_stores()), version
+                print(f"📍 Store locator: {len(_locator)} stores, {len(_locator.cells)} grid cells "
+                      f"in {1000 * (time.perf_counter() - t0):.0f} ms")
+    return _locator
@@ -1,5 +1,6 @@
-import math
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any
+
+from store_locator import StoreLocator, get_store_locator
 
 def generate_graph_context(
     graph_records: List[Dict[str, Any]],
@@ -9,31 +10,34 @@ def generate_graph_context(
 ) -> str:
     """
     • Keeps only records whose type == 'Product'.
-    • For each product, calculates the distance between the user and
-    each of the associated stores.
-    • Does not recalculate the distance for stores already visited.
+    • For each product, uses the stores already ranked by the graph fetch
+    (where-to-buy intent: records carry distance_km), else finds the nearest
+    stores carrying it with the store locator (store_locator.py: every Store
+    node, vectorized distances); products unknown to the locator use the
+    stores of their record.
     • Adds the Amazon link if present.
     • Returns a string where each line describes a product and its stores
     (sorted by increasing distance, max_stores first).
     """
-
-    def haversine_distance(lat1, lon1, lat2, lon2):
-        R = 6371.0  
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (
-            math.sin(dlat / 2) ** 2
-            + math.cos(math.radians(lat1))
-            * math.cos(math.radians(lat2))
-            * math.sin(dlon / 2) ** 2
-        )
-        return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    try:
+        user_latitude, user_longitude = float(user_latitude), float(user_longitude)
+    except (TypeError, ValueError):
+        user_latitude = user_longitude = None
+
+    try:
+        locator = get_store_locator()
+    except Exception as e:
+        print(f"⚠️ Store locator unavailable, using the record stores: {e}")
+        locator = None
+
+    products = [r for r in graph_records if r.get("type", "").lower() == "product"]
+    nearest_by_product = {}
+    if locator is not None and user_latitude is not None:
+        keys = [r.get("id") or r.get("title") for r in products]
+        nearest_by_product = locator.nearby_each(user_latitude, user_longitude, keys, max_stores)
 
     lines: List[str] = []
 
-   
-    store_distance_cache: Dict[Tuple[str, str], float] = {}
-
     for record in graph_records:
         if record.get("type", "").lower() != "product":
             continue
@@ -41,33 +45,19 @@ def generate_graph_context(
         product_name = record.get("title", "Unknown Product")
         amazon_link = record.get("amazon_link")
 
-        stores_raw = record.get("stores", [])
-
         enriched = []
-        for s in stores_raw:
-            try:
-                key = (s["name"], s["address"])
-                if key in store_distance_cache:
-                    dist = store_distance_cache[key]
-                else:
-                    dist = haversine_distance(
-                        user_latitude,
-                        user_longitude,
-                        float(s["latitude"]),
-                        float(s["longitude"])
-                    )
-                    store_distance_cache[key] = dist
-
-                enriched.append((dist, s))
-            except (KeyError, TypeError, ValueError):
-                continue
+        ranked = record.get("stores") or []
+        if user_latitude is not None and ranked and all("distance_km" in s for s in ranked):
+            enriched = [(s["distance_km"], s) for s in ranked[:max_stores]]
+        elif user_latitude is not None:
+            nearest = nearest_by_product.get(record.get("id") or record.get("title"))
+            if nearest is None:
+                nearest = StoreLocator(record.get("stores", [])).nearby(user_latitude, user_longitude, max_stores)
+            enriched = [(s["distance_km"], s) for s in nearest]
 
         if not enriched:
             product_line = f"graph_context: Product: {product_name} | No store with geo-data."
         else:
-            enriched.sort(key=lambda t: t[0])
-            enriched = enriched[:max_stores]
-
             store_fragments = [
                 f"{idx}. Store: {s['name']} | Address: {s['address']} | Distance: {round(d, 2)} km"
                 for idx, (d, s) in enumerate(enriched, 1)
@@ -1,8 +1,12 @@
-import os
+import asyncio, os
 from dotenv import load_dotenv
 
-from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
+from vertexai.language_models import TextEmbeddingInput
 from google.cloud import aiplatform_v1
+from clients import get_async_match_client, get_embedding_model, get_match_client
+from embedding_cache import get_embedding_cache
+from metrics import timed
+from micro_batch import AsyncMicroBatcher, MicroBatcher
 
 
 
@@ -17,67 +21,169 @@ LOCATION          = os.getenv("LOCATION", "us-central1")
 API_ENDPOINT      = os.getenv("API_ENDPOINT")  
 INDEX_ENDPOINT    = os.getenv("INDEX_ENDPOINT")  
 DEPLOYED_INDEX_ID = os.getenv("DEPLOYED_INDEX_ID") 
+VECTOR_BACKEND    = os.getenv("VECTOR_BACKEND", "vertex").lower()  # "vertex" | "local"
 TOP_K             = 5
+# Concurrent questions within this window share one embedding and one find_neighbors call (0 = off)
+VECTOR_BATCH_WINDOW_MS = float(os.getenv("VECTOR_BATCH_WINDOW_MS", "0"))
+VECTOR_BATCH_SIZE      = int(os.getenv("VECTOR_BATCH_SIZE", "16"))
 
 # Verification
-if not all([PROJECT_ID, API_ENDPOINT, INDEX_ENDPOINT, DEPLOYED_INDEX_ID]):
+if VECTOR_BACKEND not in ("vertex", "local"):
+    raise ValueError(f"❌ VECTOR_BACKEND inconnu : {VECTOR_BACKEND}")
+if VECTOR_BACKEND == "vertex" and not all([PROJECT_ID, API_ENDPOINT, INDEX_ENDPOINT, DEPLOYED_INDEX_ID]):
     raise ValueError("❌ Certaines variables d'environnement sont manquantes.")
 
 # ──────────────────────────────────────────────────────────────
 # 2) Function to embed a text
 # ──────────────────────────────────────────────────────────────
-def embed_query(text: str) -> list[float]:
-    model = TextEmbeddingModel.from_pretrained("text-embedding-004")
+def embed_query_uncached(text: str) -> list[float]:
+    model = get_embedding_model()
     inp = TextEmbeddingInput(text=text, task_type="RETRIEVAL_QUERY")
     embedding = model.get_embeddings([inp])[0].values
     return embedding
 
-# ──────────────────────────────────────────────────────────────
-# 3) Vector Search Query Function (Low Level)
-# ──────────────────────────────────────────────────────────────
-def run_query(text: str, num_neighbors: int = TOP_K):
-    print(f"\n🔍 Recherche pour : « {text} »\n")
 
-    # Embedding
-    vector = embed_query(text)
+def embed_queries_uncached(texts: list[str]) -> list[list[float]]:
+    inputs = [TextEmbeddingInput(text=text, task_type="RETRIEVAL_QUERY") for text in texts]
+    return [e.values for e in get_embedding_model().get_embeddings(inputs)]
 
-    # Create the MatchService client
-    client_options = {"api_endpoint": API_ENDPOINT}
-    match_client = aiplatform_v1.MatchServiceClient(client_options=client_options)
 
-    # Build the query
-    datapoint = aiplatform_v1.IndexDatapoint(feature_vector=vector)
-    query = aiplatform_v1.FindNeighborsRequest.Query(
-        datapoint=datapoint,
-        neighbor_count=num_neighbors,
-    )
-    request = aiplatform_v1.FindNeighborsRequest(
+def embed_query(text: str) -> list[float]:
+    # Repeated questions are served from the embedding cache (see embedding_cache.py),
+    # the others share a batched embedding call with concurrent questions when enabled
+    compute = EMBED_BATCHER.submit if EMBED_BATCHER else embed_query_uncached
+    return get_embedding_cache().get_or_compute(text, compute)
+
+# ──────────────────────────────────────────────────────────────
+# 3) Vector Search Query Function (Low Level)
+# ──────────────────────────────────────────────────────────────
+def build_neighbors_request(vectors: list[list[float]], num_neighbors: int | list[int] = TOP_K):
+    # one neighbor count for every query, or one per query
+    counts = num_neighbors if isinstance(num_neighbors, list) else [num_neighbors] * len(vectors)
+    queries = [
+        aiplatform_v1.FindNeighborsRequest.Query(
+            datapoint=aiplatform_v1.IndexDatapoint(feature_vector=vector),
+            neighbor_count=count,
+        )
+        for vector, count in zip(vectors, counts)
+    ]
+    return aiplatform_v1.FindNeighborsRequest(
         index_endpoint=INDEX_ENDPOINT,
         deployed_index_id=DEPLOYED_INDEX_ID,
-        queries=[query],
+        queries=queries,
         return_full_datapoint=False,
     )
 
-    # Query
-    response = match_client.find_neighbors(request=request)
-    
-    
-   # Filter results (distance >= 0.5)
-    neighbors = response.nearest_neighbors[0].neighbors
-    datapoint_ids = [
+
+def filter_neighbors(nearest) -> list[str]:
+    # Filter results (distance > 0.6)
+    return [
         n.datapoint.datapoint_id
-        for n in neighbors
+        for n in nearest.neighbors
         if n.distance > 0.6
     ]
-    
-    return datapoint_ids
+
+
+def run_query(text: str, num_neighbors: int = TOP_K):
+    print(f"\n🔍 Recherche pour : « {text} »\n")
+
+    # Embedding
+    with timed("embed_query"):
+        vector = embed_query(text)
+
+    # Local backend: same cutoff and output, no remote hop
+    if VECTOR_BACKEND == "local":
+        from local_index import get_local_index
+        with timed("find_neighbors"):
+            return get_local_index().query_ids(vector, num_neighbors)
+
+    # Query, batched with concurrent questions when enabled
+    if NEIGHBORS_BATCHER:
+        with timed("find_neighbors"):
+            return NEIGHBORS_BATCHER.submit((vector, num_neighbors))
+
+    # Shared MatchService client (created once per worker)
+    match_client = get_match_client()
+
+    with timed("find_neighbors"):
+        response = match_client.find_neighbors(request=build_neighbors_request([vector], num_neighbors))
+    return filter_neighbors(response.nearest_neighbors[0])
+
+# ──────────────────────────────────────────────────────────────
+# 4) Async variants (ASGI mode, see async_pipeline.py)
+# ──────────────────────────────────────────────────────────────
+async def embed_queries_uncached_async(texts: list[str]) -> list[list[float]]:
+    inputs = [TextEmbeddingInput(text=text, task_type="RETRIEVAL_QUERY") for text in texts]
+    return [e.values for e in await get_embedding_model().get_embeddings_async(inputs)]
+
+
+async def embed_query_async(text: str) -> list[float]:
+    # the SQLite layer of the cache (EMBED_CACHE_PATH) is read and written off the event loop
+    cache = get_embedding_cache()
+    vector = cache.get_memory(text)
+    if vector is None and cache.persistent:
+        vector = await asyncio.to_thread(cache.get, text)
+    if vector is None:
+        if ASYNC_EMBED_BATCHER:
+            vector = await ASYNC_EMBED_BATCHER.submit(text)
+        else:
+            vector = (await embed_queries_uncached_async([text]))[0]
+        if cache.persistent:
+            await asyncio.to_thread(cache.set, text, vector)
+        else:
+            cache.set(text, vector)
+    return vector
+
+
+async def run_query_async(text: str, num_neighbors: int = TOP_K):
+    with timed("embed_query"):
+        vector = await embed_query_async(text)
+
+    if VECTOR_BACKEND == "local":
+        from local_index import get_local_index
+        with timed("find_neighbors"):
+            return get_local_index().query_ids(vector, num_neighbors)
+
+    with timed("find_neighbors"):
+        if ASYNC_NEIGHBORS_BATCHER:
+            return await ASYNC_NEIGHBORS_BATCHER.submit((vector, num_neighbors))
+        response = await get_async_match_client().find_neighbors(
+            request=build_neighbors_request([vector], num_neighbors)
+        )
+    return filter_neighbors(response.nearest_neighbors[0])
+
+# ──────────────────────────────────────────────────────────────
+# 5) Micro-batching across concurrent requests (see micro_batch.py)
+# ──────────────────────────────────────────────────────────────
+def find_neighbors_batch(queries: list[tuple[list[float], int]]) -> list[list[str]]:
+    """One find_neighbors call for several (vector, num_neighbors) queries, ids per query in order."""
+    request = build_neighbors_request([v for v, _ in queries], [k for _, k in queries])
+    response = get_match_client().find_neighbors(request=request)
+    return [filter_neighbors(nearest) for nearest in response.nearest_neighbors]
+
+
+async def find_neighbors_batch_async(queries: list[tuple[list[float], int]]) -> list[list[str]]:
+    request = build_neighbors_request([v for v, _ in queries], [k for _, k in queries])
+    response = await get_async_match_client().find_neighbors(request=request)
+    return [filter_neighbors(nearest) for nearest in response.nearest_neighbors]
+
+
+EMBED_BATCHER = NEIGHBORS_BATCHER = ASYNC_EMBED_BATCHER = ASYNC_NEIGHBORS_BATCHER = None
+if VECTOR_BATCH_WINDOW_MS > 0:
+    _window = VECTOR_BATCH_WINDOW_MS / 1000
+    EMBED_BATCHER = MicroBatcher("embed_query", embed_queries_uncached, VECTOR_BATCH_SIZE, _window)
+    ASYNC_EMBED_BATCHER = AsyncMicroBatcher("embed_query", embed_queries_uncached_async, VECTOR_BATCH_SIZE, _window)
+    if VECTOR_BACKEND == "vertex":
+        NEIGHBORS_BATCHER = MicroBatcher("find_neighbors", find_neighbors_batch, VECTOR_BATCH_SIZE, _window)
+        ASYNC_NEIGHBORS_BATCHER = AsyncMicroBatcher(
+            "find_neighbors", find_neighbors_batch_async, VECTOR_BATCH_SIZE, _window)
 
 
 
     
 
 # ──────────────────────────────────────────────────────────────
-# 4) Interactive interface
+# 6) Interactive interface
 # ──────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     question = input("❓ Pose ta question : ")
@@ -0,0 +1,215 @@
+"""
+Packed, memory-mapped vector store.
+
+Replaces the ~1,150 pretty-printed `vector_*.json` files with one folder:
+
+    embeddings.npy   float32 / float16 matrix (n, dim)
+    ids.npy          datapoint ids        (n,)  fixed-width unicode
+    types.npy        restricts "type"     (n,)  fixed-width unicode
+    documents.jsonl  one {"id", "type", "content", "metadata"} object per line
+    offsets.npy      int64 byte offsets of each line in documents.jsonl (n + 1,)
+
+Every file is opened read-only with mmap, so all gunicorn workers share the
+same page-cache copy and nobody re-parses JSON at startup.
+
+A pack never rewrites a store in place (workers would get SIGBUS or torn
+reads from their maps): it writes a new `vector_store.<stamp>` folder and
+switches the `vector_store` symlink to it with one rename. Running workers
+keep the version they mapped; the previous version is kept on disk for
+processes still opening it, older ones are removed.
+
+Usage:
+    python api/vector_store.py pack  [--src DIR] [--out DIR] [--float16]
+    python api/vector_store.py bench [--src DIR] [--out DIR]
+"""
+
+import argparse, json, mmap, os, pathlib, resource, shutil, time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# ──────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+VECTORS_DIR = pathlib.Path(
+    os.getenv("VECTOR_DOCUMENTS_DIR", ROOT_DIR / "data/vectorDB/vector_documents")
+)
+STORE_DIR = pathlib.Path(
+    os.getenv("VECTOR_STORE_DIR", ROOT_DIR / "data/vectorDB/vector_store")
+)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE        = "ids.npy"
+TYPES_FILE      = "types.npy"
+DOCUMENTS_FILE  = "documents.jsonl"
+OFFSETS_FILE    = "offsets.npy"
+
+
+def document_type(data: Dict[str, Any]) -> str:
+    return data.get("restricts", [{}])[0].get("allow", ["unknown"])[0]
+
+# ──────────────────────────────────────────────────────────────
+# 2) Exporter (directory of JSON → packed store)
+# ──────────────────────────────────────────────────────────────
+def pack(src_dir: pathlib.Path = VECTORS_DIR,
+         out_dir: pathlib.Path = STORE_DIR,
+         dtype: str = "float32") -> int:
+    """Converts every vector JSON of `src_dir` into a packed store. Returns the row count."""
+    out_dir = pathlib.Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    version = out_dir.with_name(f"{out_dir.name}.{time.time_ns()}")
+    n = _write_store(pathlib.Path(src_dir), version, dtype)
+    _switch(out_dir, version)
+    return n
+
+
+def _write_store(src_dir: pathlib.Path, out_dir: pathlib.Path, dtype: str) -> int:
+    out_dir.mkdir(parents=True)
+
+    ids: List[str] = []
+    types: List[str] = []
+    rows: List[List[float]] = []
+    offsets: List[int] = [0]
+
+    with open(out_dir / DOCUMENTS_FILE, "wb") as docs:
+        for fp in sorted(src_dir.glob("*.json")):
+            try:
+                data = json.loads(fp.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"⚠️  Skip {fp.name}: {e}")
+                continue
+            if not data.get("id") or not data.get("embedding"):
+                continue
+
+            line = json.dumps(
+                {"id": data["id"], "type": document_type(data),
+                 "content": data.get("content", ""), "metadata": data.get("metadata", {})},
+                ensure_ascii=False,
+            ).encode("utf-8") + b"\n"
+            docs.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+            ids.append(data["id"])
+            types.append(document_type(data))
+            rows.append(data["embedding"])
+
+    np.save(out_dir / EMBEDDINGS_FILE, np.asarray(rows, dtype=dtype))
+    np.save(out_dir / IDS_FILE, np.asarray(ids, dtype=str))
+    np.save(out_dir / TYPES_FILE, np.asarray(types, dtype=str))
+    np.save(out_dir / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+    return len(ids)
+
+
+def _switch(link: pathlib.Path, version: pathlib.Path) -> None:
+    """Points `link` at `version` atomically, then prunes all but the previous version."""
+    previous = os.readlink(link) if link.is_symlink() else None
+    if link.is_dir() and not link.is_symlink():
+        # store packed before versioned folders: move it aside once
+        previous = f"{link.name}.0"
+        link.rename(link.with_name(previous))
+    tmp = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+    if tmp.is_symlink():
+        tmp.unlink()
+    os.symlink(version.name, tmp)
+    os.replace(tmp, link)
+    keep = {version.name, previous}
+    for old in link.parent.glob(f"{link.name}.*"):
+        if old.name not in keep and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+
+# ──────────────────────────────────────────────────────────────
+# 3) Loader (read-only, memory-mapped)
+# ──────────────────────────────────────────────────────────────
+class VectorStore:
+    """Read-only view over a packed store. Nothing is copied until it is used."""
+
+    def __init__(self, folder: pathlib.Path = STORE_DIR):
+        # resolved once: every file comes from the same version even if a pack switches it meanwhile
+        folder = pathlib.Path(folder).resolve()
+        self.folder = folder
+        self.embeddings = np.load(folder / EMBEDDINGS_FILE, mmap_mode="r")
+        self.ids = np.load(folder / IDS_FILE, mmap_mode="r")
+        self.types = np.load(folder / TYPES_FILE, mmap_mode="r")
+        self.offsets = np.load(folder / OFFSETS_FILE, mmap_mode="r")
+        with open(folder / DOCUMENTS_FILE, "rb") as f:
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def exists(folder: pathlib.Path = STORE_DIR) -> bool:
+        return (pathlib.Path(folder) / EMBEDDINGS_FILE).exists()
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    def row_of(self, datapoint_id: str) -> Optional[int]:
+        if self._row_by_id is None:
+            self._row_by_id = {str(dp_id): i for i, dp_id in enumerate(self.ids)}
+        return self._row_by_id.get(datapoint_id)
+
+    def document(self, row: int) -> Dict[str, Any]:
+        """Returns {"id", "type", "content", "metadata"} for one row (parsed lazily)."""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._documents[start:end])
+
+    def get(self, datapoint_id: str) -> Optional[Dict[str, Any]]:
+        row = self.row_of(datapoint_id)
+        return None if row is None else self.document(row)
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self.document(row)
+
+    def close(self) -> None:
+        self._documents.close()
+
+
+_store: Optional[VectorStore] = None
+
+def get_vector_store() -> Optional[VectorStore]:
+    """Process-wide store, or None when no packed store has been built."""
+    global _store
+    if _store is None and VectorStore.exists(STORE_DIR):
+        _store = VectorStore(STORE_DIR)
+    return _store
+
+# ──────────────────────────────────────────────────────────────
+# 4) Benchmark: JSON directory vs packed store
+# ──────────────────────────────────────────────────────────────
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench(src_dir: pathlib.Path = VECTORS_DIR, out_dir: pathlib.Path = STORE_DIR) -> None:
+    # Packed store first: ru_maxrss is a peak, the JSON parse would hide it.
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    store = VectorStore(out_dir)
+    _ = float(np.asarray(store.embeddings, dtype=np.float32).sum())
+    t1 = time.perf_counter()
+    rss1 = _rss_mb()
+    print(f"Packed store: {len(store)} rows in {1000 * (t1 - t0):.1f} ms, peak RSS +{rss1 - rss0:.1f} MB")
+
+    t0 = time.perf_counter()
+    docs = [json.loads(fp.read_text(encoding="utf-8")) for fp in pathlib.Path(src_dir).glob("*.json")]
+    _ = np.asarray([d["embedding"] for d in docs], dtype=np.float32)
+    t1 = time.perf_counter()
+    rss2 = _rss_mb()
+    print(f"JSON dir    : {len(docs)} docs in {1000 * (t1 - t0):.1f} ms, peak RSS +{rss2 - rss1:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack / benchmark the vector store.")
+    parser.add_argument("command", choices=["pack", "bench"])
+    parser.add_argument("--src", type=pathlib.Path, default=VECTORS_DIR)
+    parser.add_argument("--out", type=pathlib.Path, default=STORE_DIR)
+    parser.add_argument("--float16", action="store_true", help="store embeddings as float16")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        t0 = time.perf_counter()
+        n = pack(args.src, args.out, "float16" if args.float16 else "float32")
+        print(f"✅ {n} vectors packed into '{args.out}' in {time.perf_counter() - t0:.1f}s")
+    else:
+        bench(args.src, args.out)
@@ -1,9 +1,15 @@
 from __future__ import annotations
-import json, os, pathlib, re
-from typing import Any, Dict, List
+import argparse, json, os, pathlib, re, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Tuple
 from dotenv import load_dotenv
 from neo4j import GraphDatabase, Transaction
 
+# The API owns the fetch query; materialization must produce exactly its rows.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2] / "api"))
+from graph_query import FETCH_GRAPH_QUERY  # noqa: E402
+from graph_engine import uses_links  # noqa: E402
+
 # ─────────────────────────────
 # 1) Configuration & helpers
 # ─────────────────────────────
@@ -11,9 +17,19 @@ load_dotenv()
 URI  = os.getenv("NEO4J_URI")
 USER = os.getenv("NEO4J_USERNAME", "neo4j")
 PWD  = os.getenv("NEO4J_PASSWORD")
+MATERIALIZE_BATCH = 200   # vector ids per FETCH_GRAPH_QUERY run
+
+# bulk: UNWIND batches per record type (see section 4) | per-record: one statement per document
+GRAPH_IMPORT_MODE    = os.getenv("GRAPH_IMPORT_MODE", "bulk").lower()
+GRAPH_IMPORT_BATCH   = int(os.getenv("GRAPH_IMPORT_BATCH", "1000"))   # rows per UNWIND (documents per tx in per-record)
+GRAPH_IMPORT_WORKERS = int(os.getenv("GRAPH_IMPORT_WORKERS", "4"))    # parallel sessions
 
 VECTORS_DIR = pathlib.Path("data/vectorDB/vector_documents")
-assert VECTORS_DIR.exists(), f"Dossier {VECTORS_DIR} introuvable"
+# Packed store built by `python api/vector_store.py pack` (preferred when present)
+STORE_DOCUMENTS = pathlib.Path(
+    os.getenv("VECTOR_STORE_DIR", "data/vectorDB/vector_store")
+) / "documents.jsonl"
+assert VECTORS_DIR.exists() or STORE_DOCUMENTS.exists(), f"Dossier {VECTORS_DIR} introuvable"
 
 _SPLIT_ING = re.compile(r",|;")
 
@@ -23,6 +39,32 @@ def _split_ingredients(raw: str | None) -> List[str]:
         return []
     return [i.strip() for i in _SPLIT_ING.split(raw) if i.strip()]
 
+
+def _iter_documents() -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(name, {"id", "type", "metadata"}): packed store when present, else the JSON files."""
+    if STORE_DOCUMENTS.exists():
+        with STORE_DOCUMENTS.open(encoding="utf-8") as f:
+            for line in f:
+                data = json.loads(line)
+                yield data.get("id") or "?", data
+        return
+    for fp in sorted(VECTORS_DIR.glob("*.json")):
+        try:
+            data = json.loads(fp.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️  Skip {fp.name}: {e}")
+            continue
+        yield fp.name, {
+            "id": data.get("id"),
+            "type": data.get("restricts", [{}])[0].get("allow", ["unknown"])[0],
+            "metadata": data.get("metadata", {}),
+        }
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 # ─────────────────────────────
 # 2) Schema (constraints / indexes)
 # ─────────────────────────────
@@ -36,6 +78,7 @@ CONSTRAINTS = [
     "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Article)  REQUIRE n.vector_id IS UNIQUE",
     "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Information) REQUIRE n.vector_id IS UNIQUE",
     "CREATE CONSTRAINT IF NOT EXISTS FOR (s:Store)    REQUIRE (s.name, s.address) IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (c:MaterializedContext) REQUIRE c.vector_id IS UNIQUE",
 ]
 
 FULLTEXT_IDX = (
@@ -47,6 +90,12 @@ POINT_IDX = (
     "CREATE POINT INDEX storeLocation IF NOT EXISTS FOR (s:Store) ON (s.location)"
 )
 
+# Documents are MERGEd on their title: without these every MERGE scans the label
+TITLE_IDX = [
+    f"CREATE INDEX {label.lower()}Title IF NOT EXISTS FOR (n:{label}) ON (n.title)"
+    for label in ("Recipe", "Product", "Article", "Information")
+]
+
 # ─────────────────────────────
 # 3) Write‑transactions (Cypher)
 # ─────────────────────────────
@@ -193,76 +242,383 @@ def insert_information(tx: Transaction, meta: Dict[str, Any], vector_id: str):
         vid=vector_id,
     )
 
+
 # ─────────────────────────────
-# 4) Cross‑entity links (recipes ↔ products via ingredients)
+# 4) Bulk import (UNWIND batches)
 # ─────────────────────────────
-LINK_RECIPES_PRODUCTS = (
-    "MATCH (r:Recipe)-[:CONTAINS]->(i:Ingredient)<-[:CONTAINS]-(p:Product)\n"
-    "MERGE (r)-[:USES {via:i.name}]->(p)"
+# Same graph as the insert_* functions, planned client-side: documents are
+# grouped by type, every Brand / Category / Ingredient / Feature / Store is
+# deduplicated before its MERGE, and each group is sent as parameter lists of
+# GRAPH_IMPORT_BATCH rows through UNWIND. Node groups touch one label each and
+# load in parallel sessions (the uniqueness constraints keep the MERGEs
+# safe); relationship groups sharing an endpoint label would deadlock on the
+# same nodes, so they run in waves of label-disjoint groups.
+
+class ImportGroup(NamedTuple):
+    name: str
+    labels: FrozenSet[str]        # labels whose nodes its statements lock
+    query: str
+    rows: List[Any]
+
+
+def _titled_query(label: str) -> str:
+    return (
+        "UNWIND $rows AS row\n"
+        f"MERGE (n:{label} {{title:row.title}})\n"
+        "ON CREATE SET n.vector_id=row.vid\n"
+        "SET n += row.props"
+    )
+
+
+STORE_MATCH = "{name:row.dst.name, address:row.dst.address}"
+
+NODE_QUERIES = {
+    "Brand":      "UNWIND $rows AS row MERGE (:Brand {name:row})",
+    "Category":   "UNWIND $rows AS row MERGE (:Category {name:row})",
+    "Ingredient": "UNWIND $rows AS row MERGE (:Ingredient {name:row})",
+    "Feature":    "UNWIND $rows AS row MERGE (:Feature {text:row})",
+    "Store": (
+        "UNWIND $rows AS row\n"
+        "MERGE (s:Store {name:row.name, address:row.address})\n"
+        "ON CREATE SET s.location = point({latitude:row.lat, longitude:row.lon})"
+    ),
+}
+
+# (source label, relationship, target label, target match)
+LINKS = [
+    ("Recipe",  "CONTAINS",    "Ingredient", "{name:row.dst}"),
+    ("Product", "HAS_FEATURE", "Feature",    "{text:row.dst}"),
+    ("Product", "CONTAINS",    "Ingredient", "{name:row.dst}"),
+    ("Product", "BRANDED_AS",  "Brand",      "{name:row.dst}"),
+    ("Product", "IN_CATEGORY", "Category",   "{name:row.dst}"),
+    ("Product", "SOLD_AT",     "Store",      STORE_MATCH),
+]
+
+
+def _link_query(src: str, rel: str, dst: str, dst_match: str) -> str:
+    return (
+        "UNWIND $rows AS row\n"
+        f"MATCH (a:{src} {{title:row.src}})\n"
+        f"MATCH (b:{dst} {dst_match})\n"
+        f"MERGE (a)-[:{rel}]->(b)"
+    )
+
+
+def plan_import(docs: Iterable[Tuple[str, Dict[str, Any]]],
+                verbose: bool = True) -> Tuple[List[ImportGroup], List[ImportGroup]]:
+    """(node groups, relationship groups) producing the graph of the per-record path."""
+    log = print if verbose else (lambda *_: None)
+    titled: Dict[str, Dict[str, Dict[str, Any]]] = {
+        label: {} for label in ("Recipe", "Product", "Article", "Information")}
+    nodes: Dict[str, Dict[Any, Any]] = {label: {} for label in NODE_QUERIES}
+    links: Dict[Tuple[str, str, str], Dict[Any, Dict[str, Any]]] = {link[:3]: {} for link in LINKS}
+
+    def merge_titled(label: str, title: str, vid: str, props: Dict[str, Any]) -> None:
+        # MERGE … ON CREATE: the first document keeps its vector_id; SET +=: the last one's properties
+        titled[label].setdefault(title, {"title": title, "vid": vid})["props"] = props
+
+    def link(src: str, rel: str, dst: str, title: str, key: Any, row: Any) -> None:
+        nodes[dst].setdefault(key, row)
+        dst_row = {"name": row["name"], "address": row["address"]} if dst == "Store" else row
+        links[(src, rel, dst)].setdefault((title, key), {"src": title, "dst": dst_row})
+
+    for name, data in docs:
+        meta = data.get("metadata", {})
+        v_id = data.get("id")
+        node_type = data.get("type", "unknown")
+        title = meta.get("title")
+
+        if not title:
+            log(f"⛔ Skip {name}: no title")
+        elif node_type == "recipe":
+            merge_titled("Recipe", title, v_id, {
+                "url": meta.get("url", ""), "description": meta.get("description", ""),
+                "image": meta.get("image", ""), "prep_time": meta.get("prep_time", ""),
+                "cook_time": meta.get("cook_time", ""), "total_time": meta.get("total_time", ""),
+                "servings": meta.get("servings", ""), "skill_level": meta.get("skill_level", ""),
+                "instructions": meta.get("instructions", []),
+            })
+            for ing in meta.get("ingredients") or []:
+                link("Recipe", "CONTAINS", "Ingredient", title, ing, ing)
+        elif node_type == "product":
+            ing_raw = meta.get("ingredients") or ""
+            ingredients = _split_ingredients(ing_raw)
+            brand = meta.get("brand") or title.split()[0]
+            category = meta.get("category")
+            features = meta.get("features", [])
+            merge_titled("Product", title, v_id, {
+                "url": meta.get("url", ""), "description": meta.get("description", ""),
+                "size": meta.get("size", ""), "image": meta.get("image", ""),
+                "ingredients_text": ing_raw, "features": features,
+                "nutrition": meta.get("nutrition", []), "amazon_link": meta.get("amazon_link"),
+            })
+            # insert_product chains `WITH p UNWIND …` / `WITH p WHERE …`: an empty
+            # list or a null category ends the statement (see graph_engine.insert_product)
+            if not features:
+                continue
+            for f in features:
+                link("Product", "HAS_FEATURE", "Feature", title, f, f)
+            if not ingredients:
+                continue
+            for ing in ingredients:
+                link("Product", "CONTAINS", "Ingredient", title, ing, ing)
+            link("Product", "BRANDED_AS", "Brand", title, brand, brand)
+            if category is None:
+                continue
+            link("Product", "IN_CATEGORY", "Category", title, category, category)
+            for s in meta.get("stores", []):
+                if s.get("name") and s.get("address"):
+                    link("Product", "SOLD_AT", "Store", title, (s["name"], s["address"]), {
+                        "name": s["name"], "address": s["address"],
+                        "lat": s.get("latitude"), "lon": s.get("longitude"),
+                    })
+        elif node_type == "article":
+            merge_titled("Article", title, v_id, {"url": meta.get("url", ""),
+                                                  "categorie": meta.get("categorie", "Article")})
+        elif node_type == "information":
+            merge_titled("Information", title, v_id, {"url": meta.get("url", "")})
+        elif node_type == "brand":
+            log(f"↷ Ignore standalone brand file {name}")
+        else:
+            log(f"❓ Unknown type '{node_type}' for {name}, skipped.")
+
+    node_groups = [ImportGroup(label, frozenset([label]), _titled_query(label), list(rows.values()))
+                   for label, rows in titled.items()]
+    node_groups += [ImportGroup(label, frozenset([label]), NODE_QUERIES[label], list(rows.values()))
+                    for label, rows in nodes.items()]
+    link_groups = [ImportGroup(f"{src}-{rel}->{dst}", frozenset([src, dst]), _link_query(src, rel, dst, match),
+                               list(links[(src, rel, dst)].values()))
+                   for src, rel, dst, match in LINKS]
+    return [g for g in node_groups if g.rows], [g for g in link_groups if g.rows]
+
+
+def _waves(groups: List[ImportGroup]) -> List[List[ImportGroup]]:
+    """Groups packed into waves whose members share no label (safe to run concurrently)."""
+    waves: List[List[ImportGroup]] = []
+    for group in groups:
+        for wave in waves:
+            if not any(group.labels & other.labels for other in wave):
+                wave.append(group)
+                break
+        else:
+            waves.append([group])
+    return waves
+
+
+def _run_group(driver, group: ImportGroup, batch_size: int) -> int:
+    statements = 0
+    with driver.session() as sess:
+        for batch in _chunks(group.rows, batch_size):
+            # managed transaction: retried on transient errors (deadlocks, leader switch)
+            sess.execute_write(lambda tx, rows=batch: tx.run(group.query, rows=rows).consume())
+            statements += 1
+    return statements
+
+
+def bulk_import(driver, docs, batch_size: int = GRAPH_IMPORT_BATCH,
+                workers: int = GRAPH_IMPORT_WORKERS, planned=None) -> int:
+    """Imports `docs` (or their plan_import result) through UNWIND batches. Returns the number of statements sent."""
+    node_groups, link_groups = planned or plan_import(docs)
+    statements = 0
+    with ThreadPoolExecutor(max(1, workers), thread_name_prefix="graph-import") as pool:
+        # every node exists before the first relationship is merged
+        for phase in (node_groups, link_groups):
+            for wave in _waves(phase):
+                counts = pool.map(lambda g: _run_group(driver, g, batch_size), wave)
+                for group, count in zip(wave, counts):
+                    print(f"   … {group.name}: {len(group.rows)} rows in {count} statements")
+                    statements += count
+    return statements
+
+
+def per_record_import(sess, docs, batch_size: int = GRAPH_IMPORT_BATCH) -> int:
+    """The insert_* path: one statement per document, `batch_size` documents per transaction."""
+    inserts = {
+        "recipe": insert_recipe,
+        "product": insert_product,
+        "article": insert_article,
+        "information": insert_information,
+    }
+    statements = 0
+    for processed, chunk in enumerate(_chunks(docs, batch_size)):
+        with sess.begin_transaction() as tx:
+            for name, data in chunk:
+                meta = data.get("metadata", {})
+                v_id = data.get("id")
+                node_type = data.get("type", "unknown")
+
+                if not meta.get("title"):
+                    print(f"⛔ Skip {name}: no title")
+                    continue
+
+                if node_type in inserts:
+                    inserts[node_type](tx, meta, v_id)
+                    statements += 1
+                elif node_type == "brand":
+                    # We intentionally ignore standalone brand files now.
+                    print(f"↷ Ignore standalone brand file {name}")
+                else:
+                    print(f"❓ Unknown type '{node_type}' for {name}, skipped.")
+
+            tx.commit()
+        print(f"   … {min(len(docs), (processed + 1) * batch_size)}/{len(docs)} processed")
+    return statements
+
+
+def import_documents(driver, docs, mode: str = GRAPH_IMPORT_MODE, batch_size: int = GRAPH_IMPORT_BATCH,
+                     planned=None) -> float:
+    """Runs one import path and reports its throughput. Returns the elapsed seconds."""
+    t0 = time.perf_counter()
+    if mode == "bulk":
+        statements = bulk_import(driver, docs, batch_size, planned=planned)
+    elif mode == "per-record":
+        with driver.session() as sess:
+            statements = per_record_import(sess, docs, batch_size)
+    else:
+        raise ValueError(f"❌ GRAPH_IMPORT_MODE inconnu : {mode}")
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ {mode}: {len(docs)} documents in {elapsed:.2f}s "
+          f"({len(docs) / max(elapsed, 1e-9):.0f} docs/s, {statements} statements)")
+    return elapsed
+
+# ─────────────────────────────
+# 5) Cross‑entity links (recipes ↔ products via ingredients)
+# ─────────────────────────────
+# Computed in Python (graph_engine.uses_links) instead of one MATCH … MERGE over
+# every Recipe–Ingredient–Product path: common ingredients made that a near
+# cartesian product in a single transaction. The links are derived data, so
+# they are replaced as a whole.
+DELETE_USES = (
+    "MATCH (:Recipe)-[u:USES]->(:Product)\n"
+    "CALL { WITH u DELETE u } IN TRANSACTIONS OF 10000 ROWS"
 )
 
+WRITE_USES = (
+    "UNWIND $rows AS row\n"
+    "MATCH (r:Recipe {title:row.recipe})\n"
+    "MATCH (p:Product {title:row.product})\n"
+    "MERGE (r)-[:USES {via:row.via}]->(p)"
+)
+
+
+def plan_uses(link_groups: List[ImportGroup]) -> List[Dict[str, str]]:
+    """USES rows from the planned CONTAINS relationships."""
+    contains = {"Recipe": {}, "Product": {}}
+    for group in link_groups:
+        label = group.name.split("-")[0]
+        if group.name.endswith("-CONTAINS->Ingredient"):
+            for row in group.rows:
+                contains[label].setdefault(row["src"], []).append(row["dst"])
+    return [{"recipe": r, "product": p, "via": via}
+            for r, p, via in uses_links(contains["Recipe"], contains["Product"])]
+
+
+def link_recipes_products(driver, link_groups: List[ImportGroup], batch_size: int = GRAPH_IMPORT_BATCH) -> int:
+    """Replaces every USES link in batched transactions. Returns the links written."""
+    t0 = time.perf_counter()
+    rows = plan_uses(link_groups)
+    computed = time.perf_counter() - t0
+    recipes = len({row["recipe"] for row in rows})
+    pairs = len({(row["recipe"], row["product"]) for row in rows})
+
+    t1 = time.perf_counter()
+    with driver.session() as sess:
+        sess.run(DELETE_USES).consume()
+        # one writer: concurrent batches would lock the same recipes and products
+        for batch in _chunks(rows, batch_size):
+            sess.execute_write(lambda tx, rows=batch: tx.run(WRITE_USES, rows=rows).consume())
+    print(f"🔗 {len(rows)} USES links ({pairs} recipe–product pairs, {recipes} recipes): "
+          f"computed in {computed * 1000:.0f} ms, written in {time.perf_counter() - t1:.1f}s")
+    return len(rows)
+
 # ─────────────────────────────
-# 5) Main import
+# 6) Materialized contexts (graph_query.MATERIALIZED_CONTEXT_QUERY)
 # ─────────────────────────────
+VECTOR_IDS_QUERY = (
+    "MATCH (n) WHERE (n:Recipe OR n:Product OR n:Article OR n:Information OR n:Brand)\n"
+    "AND n.vector_id IS NOT NULL\n"
+    "RETURN DISTINCT n.vector_id AS id"
+)
+
+WRITE_CONTEXTS = (
+    "UNWIND $rows AS row\n"
+    "MERGE (c:MaterializedContext {vector_id:row.id})\n"
+    "SET c.records = row.records"
+)
+
+DROP_STALE_CONTEXTS = (
+    "MATCH (c:MaterializedContext) WHERE NOT c.vector_id IN $ids\n"
+    "DETACH DELETE c"
+)
+
+
+def materialize_contexts(sess, batch_size: int = MATERIALIZE_BATCH) -> int:
+    """Stores the FETCH_GRAPH_QUERY rows of every vector_id as JSON. Returns the contexts written."""
+    t0 = time.perf_counter()
+    ids = [row["id"] for row in sess.run(VECTOR_IDS_QUERY)]
+    written = 0
+    for chunk in _chunks(ids, batch_size):
+        records: Dict[str, List[Dict[str, Any]]] = {}
+        for row in sess.run(FETCH_GRAPH_QUERY, ids=chunk):
+            records.setdefault(row["id"], []).append(row.data())
+        sess.run(WRITE_CONTEXTS, rows=[
+            {"id": vid, "records": json.dumps(recs, ensure_ascii=False)} for vid, recs in records.items()
+        ])
+        written += len(records)
+    sess.run(DROP_STALE_CONTEXTS, ids=ids)
+    print(f"🧊 {written} contexts materialized in {time.perf_counter() - t0:.1f}s")
+    return written
+
+# ─────────────────────────────
+# 7) Main import
+# ─────────────────────────────
+IMPORT_LABELS = ["Recipe", "Product", "Article", "Information", "Brand",
+                 "Category", "Ingredient", "Feature", "Store", "MaterializedContext", "ImportStamp"]
+
+# Read by the API (graph_query.GRAPH_VERSION_QUERY): a new stamp invalidates cached answers
+WRITE_IMPORT_STAMP = (
+    "MERGE (s:ImportStamp {name:'graph'})\n"
+    "SET s.version=$version, s.imported_at=datetime()"
+)
 
-def main(batch_size: int = 1000):
+RESET_GRAPH = (
+    "MATCH (n) WHERE any(l IN labels(n) WHERE l IN $labels)\n"
+    "CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+)
+
+
+def create_schema(sess) -> None:
+    for c in CONSTRAINTS:
+        sess.run(c)
+    for idx in TITLE_IDX:
+        sess.run(idx)
+    sess.run(FULLTEXT_IDX)
+    sess.run(POINT_IDX)
+
+
+def main(mode: str = GRAPH_IMPORT_MODE, batch_size: int = GRAPH_IMPORT_BATCH, reset: bool = False):
     driver = GraphDatabase.driver(URI, auth=(USER, PWD))
     try:
         with driver.session() as sess:
-            # Schema -------------------------------------------------------------
-            for c in CONSTRAINTS:
-                sess.run(c)
-            sess.run(FULLTEXT_IDX)
-            sess.run(POINT_IDX)
-
-            print("🚀 Connected – importing vector documents…")
-
-            files = list(VECTORS_DIR.glob("*.json"))
-            total = len(files)
-            processed = 0
-
-            while processed < total:
-                chunk = files[processed : processed + batch_size]
-                with sess.begin_transaction() as tx:
-                    for fp in chunk:
-                        try:
-                            data = json.loads(fp.read_text(encoding="utf-8"))
-                        except Exception as e:
-                            print(f"⚠️  Skip {fp.name}: {e}")
-                            continue
-
-                        meta = data.get("metadata", {})
-                        v_id = data.get("id")
-                        node_type = (
-                            data.get("restricts", [{}])[0].get("allow", ["unknown"])[0]
-                        )
-
-                        if not meta.get("title"):
-                            print(f"⛔ Skip {fp.name}: no title")
-                            continue
-
-                        if node_type == "recipe":
-                            insert_recipe(tx, meta, v_id)
-                        elif node_type == "product":
-                            insert_product(tx, meta, v_id)
-                        elif node_type == "article":
-                            insert_article(tx, meta, v_id)
-                        elif node_type == "information":
-                            insert_information(tx, meta, v_id)
-                        elif node_type == "brand":
-                            # We intentionally ignore standalone brand files now.
-                            print(f"↷ Ignore standalone brand file {fp.name}")
-                        else:
-                            print(f"❓ Unknown type '{node_type}' for {fp.name}, skipped.")
-
-                    tx.commit()
-
-                processed += len(chunk)
-                print(f"   … {processed}/{total} processed")
-
-            # Post‑processing links ---------------------------------------------
-            sess.run(LINK_RECIPES_PRODUCTS)
-            print("✅ Import terminé + liens ingrédients établis !")
+            if reset:
+                # nodes are merged on title and keep their first vector_id: needed when the ids changed
+                sess.run(RESET_GRAPH, labels=IMPORT_LABELS).consume()
+                print("🧹 Imported labels wiped")
+            create_schema(sess)
+
+        print("🚀 Connected – importing vector documents…")
+        docs = list(_iter_documents())
+        planned = plan_import(docs, verbose=mode == "bulk")
+        import_documents(driver, docs, mode, batch_size, planned=planned)
+
+        # Post‑processing links ---------------------------------------------
+        link_recipes_products(driver, planned[1], batch_size)
+        print("✅ Import terminé + liens ingrédients établis !")
+
+        # Materialized contexts (must run after every link exists) ------
+        with driver.session() as sess:
+            materialize_contexts(sess)
+            sess.run(WRITE_IMPORT_STAMP, version=f"{int(time.time())}-{len(docs)}")
 
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -270,5 +626,74 @@ def main(batch_size: int = 1000):
         driver.close()
 
 
+def plan(batch_size: int = GRAPH_IMPORT_BATCH) -> None:
+    """Statements each path would send for the current documents (no Neo4j needed)."""
+    docs = list(_iter_documents())
+    node_groups, link_groups = plan_import(docs)
+    for group in node_groups + link_groups:
+        print(f"{group.name:<30} {len(group.rows):6d} rows")
+    per_record = sum(1 for _, d in docs
+                     if d.get("metadata", {}).get("title")
+                     and d.get("type") in ("recipe", "product", "article", "information"))
+    bulk = sum(-(-len(g.rows) // batch_size) for g in node_groups + link_groups)
+    waves = len(_waves(node_groups)) + len(_waves(link_groups))
+    print(f"per-record: {per_record} statements | bulk: {bulk} statements in {waves} waves")
+    t0 = time.perf_counter()
+    uses = plan_uses(link_groups)
+    print(f"USES: {len(uses)} links, {-(-len(uses) // batch_size)} statements "
+          f"(computed in {(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+
+def graph_shape(sess) -> Dict[str, int]:
+    """Node count per label and relationship count per type ("-TYPE->"), to compare two imports."""
+    shape = {r["label"]: r["c"] for r in sess.run(
+        "MATCH (n) UNWIND labels(n) AS label RETURN label, count(*) AS c")}
+    shape.update({f"-{r['type']}->": r["c"] for r in sess.run(
+        "MATCH ()-[r]->() RETURN type(r) AS type, count(*) AS c")})
+    return shape
+
+
+def bench(batch_size: int = GRAPH_IMPORT_BATCH) -> None:
+    """Imports the documents with both paths into an emptied graph and compares them. Scratch databases only."""
+    driver = GraphDatabase.driver(URI, auth=(USER, PWD))
+    docs = list(_iter_documents())
+    try:
+        with driver.session() as sess:
+            create_schema(sess)
+        timings, shapes = {}, {}
+        for mode in ("per-record", "bulk"):
+            with driver.session() as sess:
+                sess.run(RESET_GRAPH, labels=IMPORT_LABELS).consume()
+            timings[mode] = import_documents(driver, docs, mode, batch_size)
+            with driver.session() as sess:
+                shapes[mode] = graph_shape(sess)
+        differences = {k: (shapes["per-record"].get(k), shapes["bulk"].get(k))
+                       for k in shapes["per-record"].keys() | shapes["bulk"].keys()
+                       if shapes["per-record"].get(k) != shapes["bulk"].get(k)}
+        relationships = sum(v for k, v in shapes["bulk"].items() if k.startswith("-"))
+        print(f"{'❌ different' if differences else '✅ same'} graph per label and relationship type "
+              f"({relationships} relationships); bulk is {timings['per-record'] / max(timings['bulk'], 1e-9):.1f}× faster "
+              f"({len(docs) / max(timings['per-record'], 1e-9):.0f} → {len(docs) / max(timings['bulk'], 1e-9):.0f} docs/s)")
+        for key, (per_record, bulk) in sorted(differences.items()):
+            print(f"   {key}: per-record {per_record}, bulk {bulk}")
+        print("↷ USES links and materialized contexts were not rebuilt: run the import next")
+    finally:
+        driver.close()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Import the vector documents into Neo4j.")
+    parser.add_argument("command", nargs="?", default="import", choices=("import", "plan", "bench"),
+                        help="import (default) | plan: statements per path, offline | "
+                             "bench: both paths on an emptied graph (wipes the imported labels)")
+    parser.add_argument("--mode", default=GRAPH_IMPORT_MODE, choices=("bulk", "per-record"))
+    parser.add_argument("--batch", type=int, default=GRAPH_IMPORT_BATCH)
+    parser.add_argument("--reset", action="store_true",
+                        help="import: wipe the imported labels first (after the vector ids changed)")
+    args = parser.parse_args()
+    if args.command == "plan":
+        plan(args.batch)
+    elif args.command == "bench":
+        bench(args.batch)
+    else:
+        main(args.mode, args.batch, args.reset)
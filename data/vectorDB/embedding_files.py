@@ -1,8 +1,36 @@
-import json, pathlib, uuid, os
-from typing import List
+"""
+Embeds every scraped document with text-embedding-004 and exports one
+vector_<id>.json file per document to data/vectorDB/vector_documents.
+
+Embeddings are content-addressed: a SQLite cache keyed by a hash of the
+model, the dimensionality and the text built by build_*_text. Only texts
+missing from it are sent to Vertex, so a refresh after a small site change
+embeds just the changed documents, and a rerun after a crash resumes with
+every batch already embedded.
+
+Document ids must not change: the graph import MERGEs nodes on their title
+and only sets vector_id when it creates one, so a new id for an existing
+page would leave the graph pointing at an id the index no longer has. A
+document keeps the id it was last exported with (matched on its type and
+URL, or title without a URL, read back from vector_documents); only new
+pages get a fresh id, the uuid5 of their URL. If vector_documents is
+deleted, every id changes: re-import with `create_graphRAG.py --reset`
+and rebuild the index from the new export.
+
+Missing texts are sent EMBED_BATCH_SIZE at a time (capped by an estimated
+token budget per call) by EMBED_WORKERS parallel workers. Rate limiting and
+transient errors are retried with exponential backoff.
+
+    python data/vectorDB/embedding_files.py
+"""
+
+import array, hashlib, json, pathlib, random, sqlite3, threading, time, uuid, os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
 from dotenv import load_dotenv
 
 import vertexai
+from google.api_core import exceptions as google_exceptions
 from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
 
 #─────────────────────────────
@@ -15,8 +43,22 @@ REGION     = "us-central1"
 MODEL_NAME = "text-embedding-004"
 EMBED_DIM  = 768
 
-vertexai.init(project=PROJECT_ID, location=REGION)
-model = TextEmbeddingModel.from_pretrained(MODEL_NAME)
+EMBED_BATCH_SIZE   = int(os.getenv("EMBED_BATCH_SIZE", "32"))       # documents per call (API max 250)
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "15000"))  # estimated tokens per call (API max 20k)
+EMBED_WORKERS      = int(os.getenv("EMBED_WORKERS", "4"))           # calls in flight
+EMBED_MAX_RETRIES  = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+CHARS_PER_TOKEN    = 4
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model() -> TextEmbeddingModel:
+    global _model
+    with _model_lock:
+        if _model is None:
+            vertexai.init(project=PROJECT_ID, location=REGION)
+            _model = TextEmbeddingModel.from_pretrained(MODEL_NAME)
+    return _model
 
 #─────────────────────────────
 #  INPUT OUTPUT
@@ -31,6 +73,10 @@ RECIPES_JSON  = DATA_DIR / "all_recipes.json"
 ARTICLES_JSON = DATA_DIR / "all_articles.json"
 BASICS_JSON   = DATA_DIR / "all_basics.json"
 BRANDS_JSON   = DATA_DIR / "all_brands.json"
+# Content-addressed document embeddings (outside OUTPUT_DIR, which only holds vectors)
+EMBED_CACHE_FILE = pathlib.Path(os.getenv("DOCUMENT_EMBED_CACHE", "data/vectorDB/embedding_cache.sqlite"))
+# uuid5 namespace of the document ids
+ID_NAMESPACE = uuid.NAMESPACE_URL
 
 #─────────────────────────────
 #  BUILD TEXT FUNCTIONS
@@ -94,47 +140,253 @@ def build_brand_text(br: dict) -> str:
 def load_json(path: pathlib.Path) -> List[dict]:
     return json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
 
+
+def content_key(text: str) -> str:
+    """Cache key of a document text: the same text with the same model and size → the same vector."""
+    return hashlib.sha256(f"{MODEL_NAME}|{EMBED_DIM}|RETRIEVAL_DOCUMENT|{text}".encode("utf-8")).hexdigest()
+
+
+def id_key(item: dict, item_type: str) -> tuple:
+    """What identifies a page across exports: its type and URL (title without URL)."""
+    return item_type, item.get("url") or f"title:{item.get('title', '')}"
+
+
+def exported_ids(folder: pathlib.Path = OUTPUT_DIR) -> Dict[tuple, List[tuple]]:
+    """id_key → [(id, content)] of the documents already exported (the ids the graph and index hold)."""
+    ids: Dict[tuple, List[tuple]] = {}
+    for fp in sorted(folder.glob("vector_*.json")):
+        doc = json.loads(fp.read_text(encoding="utf-8"))
+        item_type = next((r["allow"][0] for r in doc.get("restricts") or [] if r.get("namespace") == "type"), None)
+        if doc.get("id"):
+            ids.setdefault(id_key(doc.get("metadata") or {}, item_type), []).append((doc["id"], doc.get("content")))
+    return ids
+
+
+def stable_id(item: dict, item_type: str, text: str, seen: set, exported: Dict[tuple, List[tuple]]) -> str:
+    """
+    item["id"] if set, else the id this page was exported with (the one with
+    the same text first when a page appears twice), else uuid5 of its URL.
+    """
+    if item.get("id"):
+        return str(item["id"])
+    previous = exported.get(id_key(item, item_type))
+    if previous:
+        match = next((i for i, (_, content) in enumerate(previous) if content == text), 0)
+        vid = previous.pop(match)[0]
+        seen.add(vid)
+        return vid
+    name = item.get("url") or f"{item_type}:{item.get('title', '')}"
+    vid, n = str(uuid.uuid5(ID_NAMESPACE, name)), 1
+    while vid in seen:          # the same page scraped twice: keep the ids distinct and stable
+        n += 1
+        vid = str(uuid.uuid5(ID_NAMESPACE, f"{name}#{n}"))
+    seen.add(vid)
+    return vid
+
+
+class Document(NamedTuple):
+    index: int
+    id: str             # → vector_<id>.json
+    item: dict
+    text: str
+    item_type: str
+
+
+SOURCES: List[tuple[pathlib.Path, Callable[[dict], str], str]] = [
+    (PRODUCTS_JSON, build_product_text, "product"),
+    (RECIPES_JSON,  build_recipe_text,  "recipe"),
+    (ARTICLES_JSON, build_article_text, "article"),
+    (BASICS_JSON,   build_basic_text,   "information"),
+    (BRANDS_JSON,   build_brand_text,   "brand"),
+]
+
+
+def plan_documents(folder: pathlib.Path = OUTPUT_DIR) -> List[Document]:
+    """Every document to export, numbered in the export order, with the ids already exported to `folder`."""
+    exported = exported_ids(folder)
+    docs: List[Document] = []
+    # every exported id is taken: a new page's uuid5 never reuses one
+    seen: set = {vid for entries in exported.values() for vid, _ in entries}
+    for path, build_fn, item_type in SOURCES:
+        for item in load_json(path):
+            text = build_fn(item)
+            docs.append(Document(len(docs), stable_id(item, item_type, text, seen, exported), item, text, item_type))
+    return docs
+
+
+def batches(texts: List[str]) -> Iterator[List[str]]:
+    """Groups of at most EMBED_BATCH_SIZE texts and EMBED_BATCH_TOKENS estimated tokens."""
+    batch, tokens = [], 0
+    for text in texts:
+        cost = len(text) // CHARS_PER_TOKEN + 1
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or tokens + cost > EMBED_BATCH_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += cost
+    if batch:
+        yield batch
+
+#─────────────────────────────
+#  CONTENT-ADDRESSED CACHE
+#─────────────────────────────
+class DocumentEmbeddingCache:
+    """content_key(text) → vector, in SQLite (float64 blobs: exported vectors are unchanged)."""
+
+    def __init__(self, path: pathlib.Path = EMBED_CACHE_FILE):
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def _select(self, columns: str, keys: Iterable[str]) -> Iterator[tuple]:
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                yield from self._db.execute(
+                    f"SELECT {columns} FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+
+    def cached_keys(self, keys: Iterable[str]) -> set:
+        return {key for (key,) in self._select("key", keys)}
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        return {key: array.array("d", blob).tolist() for key, blob in self._select("key, vector", keys)}
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created) VALUES (?, ?, ?, ?, ?)",
+                [(key, MODEL_NAME, EMBED_DIM, array.array("d", v).tobytes(), now) for key, v in vectors.items()],
+            )
+            self._db.commit()
+
+    def seed_from_exports(self, folder: pathlib.Path = OUTPUT_DIR) -> int:
+        """Imports the content/embedding pairs of previously exported files (first run of the cache)."""
+        vectors = {}
+        for fp in folder.glob("vector_*.json"):
+            doc = json.loads(fp.read_text(encoding="utf-8"))
+            if doc.get("content") and len(doc.get("embedding") or []) == EMBED_DIM:
+                vectors[content_key(doc["content"])] = doc["embedding"]
+        self.put_many(vectors)
+        return len(vectors)
+
 #─────────────────────────────
 #  EMBEDDING + EXPORT
 #─────────────────────────────
-index = 0
-
-def embed_and_export(items: List[dict], build_fn, item_type: str, start_idx: int = 0) -> int:
-    """Embeds each item, exports one .json file per vector."""
-    global index
-    for item in items:
-        doc_text = build_fn(item)
-
-        embedding = model.get_embeddings([
-            TextEmbeddingInput(text=doc_text, task_type="RETRIEVAL_DOCUMENT")
-        ], output_dimensionality=EMBED_DIM)[0].values
-
-        doc = {
-            "id": item.get("id") or str(uuid.uuid4()),
-            "embedding": embedding,
-            "content": doc_text,
-            "metadata": item,         
-            "restricts": [{"namespace": "type", "allow": [item_type]}]
+RETRYABLE = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """One get_embeddings call, retried with exponential backoff on rate limiting / transient errors."""
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            embeddings = get_model().get_embeddings(
+                [TextEmbeddingInput(text=t, task_type="RETRIEVAL_DOCUMENT") for t in texts],
+                output_dimensionality=EMBED_DIM,
+            )
+            return [e.values for e in embeddings]
+        except RETRYABLE as e:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            delay = min(60.0, 2.0 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⏳ {type(e).__name__} on {len(texts)} documents, retry in {delay:.1f}s")
+            time.sleep(delay)
+        except google_exceptions.InvalidArgument:
+            # e.g. over the per-call token limit: split the batch
+            if len(texts) == 1:
+                raise
+            half = len(texts) // 2
+            return embed_texts(texts[:half]) + embed_texts(texts[half:])
+
+
+def embed_missing(texts: List[str], cache: DocumentEmbeddingCache, workers: int = EMBED_WORKERS) -> int:
+    """Embeds the texts not in the cache, each batch stored as soon as it returns. Returns how many."""
+    keys = {content_key(t): t for t in texts}
+    cached = cache.cached_keys(keys)
+    missing = [t for key, t in keys.items() if key not in cached]
+    print(f"📄 {len(texts)} documents: {len(texts) - len(missing)} embeddings cached, {len(missing)} to embed "
+          f"({workers} workers, batches of ≤ {EMBED_BATCH_SIZE})")
+
+    def run(batch: List[str]) -> int:
+        cache.put_many({content_key(t): v for t, v in zip(batch, embed_texts(batch))})
+        return len(batch)
+
+    embedded, t0 = 0, time.perf_counter()
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        futures = [pool.submit(run, batch) for batch in batches(missing)]
+        try:
+            for future in as_completed(futures):
+                embedded += future.result()
+                elapsed = time.perf_counter() - t0
+                print(f"   {embedded}/{len(missing)} documents, {embedded / elapsed:.1f} docs/s")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            print(f"❌ Stopped after {embedded} documents; rerun to resume (embedded batches are cached).")
+            raise
+
+    elapsed = time.perf_counter() - t0
+    if embedded:
+        print(f"✅ {embedded} documents embedded in {elapsed:.1f}s ({embedded / elapsed:.1f} docs/s)")
+    return embedded
+
+
+def write_if_changed(path: pathlib.Path, content: str) -> bool:
+    if path.exists() and path.read_text(encoding="utf-8") == content:
+        return False
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
+    return True
+
+
+def embed_and_export(workers: int = EMBED_WORKERS, cache: Optional[DocumentEmbeddingCache] = None) -> int:
+    """Embeds what the cache is missing, then writes the vector files that changed. Returns how many changed."""
+    docs = plan_documents(OUTPUT_DIR)
+    cache = cache or DocumentEmbeddingCache()
+    if not len(cache):
+        print(f"🗂️ Embedding cache seeded with {cache.seed_from_exports()} previously exported documents")
+    embed_missing([doc.text for doc in docs], cache, workers)
+
+    vectors = cache.get_many(content_key(doc.text) for doc in docs)
+    changed = 0
+    for doc in docs:
+        out = {
+            "id": doc.id,
+            "embedding": vectors[content_key(doc.text)],
+            "content": doc.text,
+            "metadata": doc.item,
+            "restricts": [{"namespace": "type", "allow": [doc.item_type]}]
         }
+        changed += write_if_changed(OUTPUT_DIR / f"vector_{doc.id}.json", json.dumps(out, ensure_ascii=False))
+    names = {f"vector_{doc.id}.json" for doc in docs}
+    for fp in OUTPUT_DIR.glob("vector_*.json"):       # documents gone from the site (and vector_<index> files)
+        if fp.name not in names:
+            fp.unlink()
+            changed += 1
 
-        out_file = OUTPUT_DIR / f"vector_{index}.json"
-        out_file.write_text(json.dumps(doc, ensure_ascii=False), encoding="utf-8")
-        index += 1
-    return index
+    print(f"✅ {len(docs)} documents in '{OUTPUT_DIR}', {changed} files changed.")
+    return changed
 
 #─────────────────────────────
 #  TRAITEMENT
 #─────────────────────────────
-products = load_json(PRODUCTS_JSON)
-recipes  = load_json(RECIPES_JSON)
-articles = load_json(ARTICLES_JSON)
-basics   = load_json(BASICS_JSON)
-brands   = load_json(BRANDS_JSON)
-
-embed_and_export(products, build_product_text, "product")
-embed_and_export(recipes,  build_recipe_text,  "recipe")
-embed_and_export(articles, build_article_text, "article")
-embed_and_export(basics,   build_basic_text,   "information")
-embed_and_export(brands,   build_brand_text,   "brand")
-
-print(f"✅ {index} documents traités et exportés dans '{OUTPUT_DIR}'.")
+if __name__ == "__main__":
+    embed_and_export()
@@ -0,0 +1,195 @@
+"""
+Incremental sync of data/vectorDB/vector_documents to the vector index.
+
+Instead of redeploying the whole index after a re-embedding, the current
+documents are diffed against a manifest of what the index holds (datapoint
+id → hash of its embedding and type restrict). Only new or changed
+datapoints are upserted and only vanished ones removed, INDEX_SYNC_BATCH at
+a time. The manifest is saved after every batch, so an interrupted sync
+resumes where it stopped.
+
+Targets (INDEX_SYNC_TARGET):
+    vertex  – the Vector Search index VECTOR_INDEX (streaming updates enabled),
+              through IndexService.upsert_datapoints / remove_datapoints
+    local   – LocalIndexService, an offline stand-in for that service keeping
+              its datapoints in a JSON file (LOCAL_INDEX_SERVICE_FILE)
+When a packed vector store exists (api/vector_store.py, used by the local
+vector backend) it is repacked after a sync that changed something.
+
+    python data/vectorDB/sync_index.py                  # sync
+    python data/vectorDB/sync_index.py --dry-run        # only print the diff
+    python data/vectorDB/sync_index.py --mark-deployed  # after a full rebuild: record the current set
+"""
+
+import hashlib, json, os, pathlib, sys, time
+from typing import Dict, Iterator, List, Tuple
+from dotenv import load_dotenv
+
+# The API owns the packed store format
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2] / "api"))
+from vector_store import STORE_DIR, VECTORS_DIR, document_type, pack  # noqa: E402
+
+#─────────────────────────────
+#  ENV
+#─────────────────────────────
+load_dotenv()
+LOCATION          = os.getenv("LOCATION", "us-central1")
+VECTOR_INDEX      = os.getenv("VECTOR_INDEX")       # projects/<p>/locations/<l>/indexes/<id>
+INDEX_SYNC_TARGET = os.getenv("INDEX_SYNC_TARGET", "vertex").lower()  # vertex | local
+INDEX_SYNC_BATCH  = int(os.getenv("INDEX_SYNC_BATCH", "500"))
+INDEX_MANIFEST    = pathlib.Path(os.getenv("INDEX_MANIFEST", "data/vectorDB/index_manifest.json"))
+LOCAL_INDEX_SERVICE_FILE = pathlib.Path(
+    os.getenv("LOCAL_INDEX_SERVICE_FILE", "data/vectorDB/local_index_service.json"))
+
+Datapoint = Dict  # {"id", "embedding", "type"}
+
+#─────────────────────────────
+#  INDEX SERVICES
+#─────────────────────────────
+class VertexIndexService:
+    def __init__(self, index_name: str = VECTOR_INDEX, location: str = LOCATION):
+        if not index_name:
+            raise ValueError("❌ VECTOR_INDEX is required to sync the Vertex index.")
+        from google.cloud import aiplatform_v1
+        self._v1 = aiplatform_v1
+        self.name = index_name
+        self._client = aiplatform_v1.IndexServiceClient(
+            client_options={"api_endpoint": f"{location}-aiplatform.googleapis.com"})
+
+    def upsert(self, datapoints: List[Datapoint]) -> None:
+        v1 = self._v1
+        self._client.upsert_datapoints(request=v1.UpsertDatapointsRequest(
+            index=self.name,
+            datapoints=[
+                v1.IndexDatapoint(
+                    datapoint_id=dp["id"],
+                    feature_vector=dp["embedding"],
+                    restricts=[v1.IndexDatapoint.Restriction(namespace="type", allow_list=[dp["type"]])],
+                )
+                for dp in datapoints
+            ],
+        ))
+
+    def remove(self, ids: List[str]) -> None:
+        self._client.remove_datapoints(request=self._v1.RemoveDatapointsRequest(index=self.name, datapoint_ids=ids))
+
+
+class LocalIndexService:
+    """Offline stand-in for the Vertex IndexService: datapoints kept in one JSON file."""
+
+    def __init__(self, path: pathlib.Path = LOCAL_INDEX_SERVICE_FILE):
+        self.path = pathlib.Path(path)
+        self.name = f"local:{self.path}"
+        self.datapoints: Dict[str, Datapoint] = (
+            json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {})
+        self.requests = 0
+
+    def _save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.datapoints), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def upsert(self, datapoints: List[Datapoint]) -> None:
+        self.requests += 1
+        for dp in datapoints:
+            self.datapoints[dp["id"]] = dp
+        self._save()
+
+    def remove(self, ids: List[str]) -> None:
+        self.requests += 1
+        for vid in ids:
+            self.datapoints.pop(vid, None)
+        self._save()
+
+
+def get_index_service(target: str = INDEX_SYNC_TARGET):
+    if target == "local":
+        return LocalIndexService()
+    if target == "vertex":
+        return VertexIndexService()
+    raise ValueError(f"❌ INDEX_SYNC_TARGET inconnu : {target}")
+
+#─────────────────────────────
+#  DIFF
+#─────────────────────────────
+def datapoint_hash(dp: Datapoint) -> str:
+    return hashlib.sha1(json.dumps([dp["type"], dp["embedding"]]).encode("utf-8")).hexdigest()
+
+
+def load_documents(folder: pathlib.Path = VECTORS_DIR) -> Dict[str, Datapoint]:
+    datapoints: Dict[str, Datapoint] = {}
+    for fp in sorted(pathlib.Path(folder).glob("*.json")):
+        data = json.loads(fp.read_text(encoding="utf-8"))
+        if data.get("id") and data.get("embedding"):
+            datapoints[data["id"]] = {"id": data["id"], "embedding": data["embedding"],
+                                      "type": document_type(data)}
+    return datapoints
+
+
+def load_manifest(index_name: str) -> Dict[str, str]:
+    """id → datapoint hash of what `index_name` holds ({} for another index or no manifest)."""
+    if not INDEX_MANIFEST.exists():
+        return {}
+    manifest = json.loads(INDEX_MANIFEST.read_text(encoding="utf-8"))
+    return manifest["datapoints"] if manifest.get("index") == index_name else {}
+
+
+def save_manifest(index_name: str, deployed: Dict[str, str]) -> None:
+    tmp = INDEX_MANIFEST.with_name(INDEX_MANIFEST.name + ".tmp")
+    tmp.write_text(json.dumps({"index": index_name, "updated": time.time(), "datapoints": deployed}),
+                   encoding="utf-8")
+    os.replace(tmp, INDEX_MANIFEST)
+
+
+def diff(current: Dict[str, Datapoint], deployed: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """(ids to upsert, ids to remove)."""
+    upserts = [vid for vid, dp in current.items() if deployed.get(vid) != datapoint_hash(dp)]
+    removals = [vid for vid in deployed if vid not in current]
+    return upserts, removals
+
+
+def _chunks(ids: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+#─────────────────────────────
+#  SYNC
+#─────────────────────────────
+def sync(service=None, dry_run: bool = False, mark_deployed: bool = False,
+         folder: pathlib.Path = VECTORS_DIR) -> Tuple[int, int]:
+    """Sends the upserts and removals for the documents of `folder`, returns their counts."""
+    t0 = time.perf_counter()
+    service = service or get_index_service()
+    current = load_documents(folder)
+    deployed = load_manifest(service.name)
+    if mark_deployed:
+        save_manifest(service.name, {vid: datapoint_hash(dp) for vid, dp in current.items()})
+        print(f"🗂️ {len(current)} datapoints recorded as deployed in {service.name}")
+        return 0, 0
+
+    upserts, removals = diff(current, deployed)
+    print(f"🔎 {service.name}: {len(current)} documents, {len(deployed)} deployed → "
+          f"{len(upserts)} to upsert, {len(removals)} to remove")
+    if dry_run:
+        return len(upserts), len(removals)
+
+    for batch in _chunks(upserts, INDEX_SYNC_BATCH):
+        service.upsert([current[vid] for vid in batch])
+        deployed.update((vid, datapoint_hash(current[vid])) for vid in batch)
+        save_manifest(service.name, deployed)
+    for batch in _chunks(removals, INDEX_SYNC_BATCH):
+        service.remove(batch)
+        for vid in batch:
+            deployed.pop(vid, None)
+        save_manifest(service.name, deployed)
+
+    if (upserts or removals) and (STORE_DIR / "ids.npy").exists():
+        # pack() writes a new version and switches to it: workers keep their mapped copy
+        print(f"📦 {pack(folder, STORE_DIR)} vectors repacked into '{STORE_DIR}' (local vector backend)")
+    print(f"✅ Index synced in {time.perf_counter() - t0:.1f}s: "
+          f"{len(upserts)} upserted, {len(removals)} removed")
+    return len(upserts), len(removals)
+
+
+if __name__ == "__main__":
+    sync(dry_run="--dry-run" in sys.argv[1:], mark_deployed="--mark-deployed" in sys.argv[1:])
@@ -0,0 +1,18 @@
+"""
+Offline test setup: the api/ modules import each other by name (like the
+scripts under data/), and every backend is local — embedded graph, local
+vector index, fake Gemini client — so no cloud credential is used.
+
+    python -m pytest -q tests
+"""
+
+import os, pathlib, sys
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "api"))
+sys.path.insert(0, str(ROOT_DIR / "data/vectorDB"))
+
+os.environ.setdefault("GRAPH_BACKEND", "embedded")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("GEMINI_CLIENT", "fake")
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "")
@@ -0,0 +1,82 @@
+import asyncio
+
+import answer_cache
+from answer_cache import AnswerCache, LocalSharedStore, SharedStoreBackend, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenStore:
+    """Redis client during an outage."""
+
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+    def set(self, key, value, ex=None):
+        raise ConnectionError("redis down")
+
+    def delete(self, key):
+        raise ConnectionError("redis down")
+
+
+def test_local_shared_store_expires_entries():
+    clock = Clock()
+    store = LocalSharedStore(clock=clock)
+    store.set("k", "v", ex=10)
+    store.set("forever", "v")
+    assert store.get("k") == "v"
+    clock.now += 10
+    assert store.get("k") is None
+    assert store.get("forever") == "v"
+    store.delete("forever")
+    assert store.get("forever") is None
+
+
+def test_shared_backend_round_trip_and_stats():
+    backend = SharedStoreBackend(LocalSharedStore())
+    assert backend.get("k") is None
+    backend.set("k", {"answer": "Café ☕"}, ttl=60)
+    assert backend.get("k") == {"answer": "Café ☕"}
+    assert backend.stats() == {"hits": 1, "misses": 1, "errors": 0}
+
+
+def test_shared_backend_outage_is_a_miss():
+    backend = SharedStoreBackend(BrokenStore())
+    backend.set("k", {"answer": "a"}, ttl=60)
+    assert backend.get("k") is None
+    assert backend.stats() == {"hits": 0, "misses": 1, "errors": 2}
+
+
+def test_key_changes_with_data_version_and_location(monkeypatch):
+    monkeypatch.setenv("DATA_VERSION", "v1")
+    toronto = cache_key("How many KitKat products?", 43.65, -79.38)
+    assert toronto == cache_key("how many kitkat products", 43.651, -79.381)
+    assert toronto != cache_key("how many kitkat products", 45.50, -73.57)
+    monkeypatch.setenv("DATA_VERSION", "v2")
+    assert toronto != cache_key("how many kitkat products", 43.65, -79.38)
+
+
+def test_async_facade_runs_off_the_loop(monkeypatch):
+    monkeypatch.setenv("DATA_VERSION", "v1")
+    cache = AnswerCache(SharedStoreBackend(LocalSharedStore()))
+
+    async def scenario():
+        assert await cache.aget("q") is None
+        await cache.aset("q", None, None, {"answer": "a"})
+        return await cache.aget("q")
+
+    assert asyncio.run(scenario()) == {"answer": "a"}
+    assert asyncio.run(AnswerCache(SharedStoreBackend(BrokenStore())).aget("q")) is None
+
+
+def test_graph_version_is_part_of_the_neo4j_data_version(monkeypatch):
+    monkeypatch.delenv("DATA_VERSION", raising=False)
+    monkeypatch.setattr(answer_cache, "GRAPH_BACKEND", "neo4j")
+    monkeypatch.setattr(answer_cache, "graph_version", lambda: "1700000000-1147")
+    assert answer_cache.current_data_version().endswith("+1700000000-1147")
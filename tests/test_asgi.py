@@ -0,0 +1,20 @@
+from starlette.testclient import TestClient
+
+import asgi
+
+# the session cookie is Secure, like Flask's: talk https to the test server
+client = TestClient(asgi.app, base_url="https://testserver")
+
+
+def test_stores_nearby_requires_a_location():
+    response = TestClient(asgi.app, base_url="https://testserver").get("/stores/nearby")
+    assert response.status_code == 400
+
+
+def test_stores_nearby_falls_back_to_the_user_location():
+    assert client.post("/user_location", json={"latitude": 43.65, "longitude": -79.38}).json() == {"status": "ok"}
+    from_session = client.get("/stores/nearby", params={"k": 3})
+    explicit = client.get("/stores/nearby", params={"latitude": 43.65, "longitude": -79.38, "k": 3})
+    assert from_session.status_code == 200
+    assert from_session.json() == explicit.json()
+    assert len(from_session.json()["stores"]) == 3
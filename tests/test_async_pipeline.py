@@ -0,0 +1,31 @@
+import asyncio
+
+from graph_engine import get_graph_engine
+from graph_search import fetch_graphrag_data, fetch_graphrag_data_async
+import async_pipeline
+
+
+def _product_ids(n=3):
+    hits = get_graph_engine().by_vector_id
+    return [vid for vid, nodes in hits.items() if nodes[0][0] == "Product"][:n]
+
+
+def test_async_embedded_fetch_matches_sync():
+    ids = _product_ids()
+    for intent in (None, "detail", "where_to_buy"):
+        sync = fetch_graphrag_data(ids, intent=intent, latitude=43.65, longitude=-79.38)
+        assert asyncio.run(fetch_graphrag_data_async(ids, intent=intent, latitude=43.65, longitude=-79.38)) == sync
+
+
+def test_retrieve_context_packs_the_fetched_records():
+    ids = _product_ids()
+
+    async def scenario():
+        search = asyncio.get_running_loop().create_future()
+        search.set_result(ids)
+        return await async_pipeline.retrieve_context_async(search, "where can I buy it?", 43.65, -79.38)
+
+    records, packed = asyncio.run(scenario())
+    assert [r["id"] for r in records] == ids
+    assert packed.intent == "where_to_buy"
+    assert records[0]["title"] in packed.graph_context
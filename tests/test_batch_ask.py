@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from answer_cache import AnswerCache, InProcessBackend
+import batch_ask
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AnswerCache(InProcessBackend())
+    monkeypatch.setattr(batch_ask, "get_answer_cache", lambda: cache)
+    return cache
+
+
+def test_invalid_entries_are_flagged_in_place():
+    items = batch_ask.parse_items(["kitkat?", 42, {"id": "a"}, {"question": ["x"]}, {"question": " "}, None],
+                                  latitude=43.6)
+    assert [bool(item.get("error")) for item in items] == [False, True, True, True, True, True]
+    assert items[0] == {"question": "kitkat?", "latitude": 43.6, "longitude": None}
+
+
+def test_count_questions_are_routed_together(cache, monkeypatch):
+    calls = []
+
+    def handle_questions(questions, version=None):
+        calls.append(list(questions))
+        return [f"count: {q}" if q.startswith("How many") else False for q in questions]
+
+    monkeypatch.setattr(batch_ask, "handle_questions", handle_questions)
+    monkeypatch.setattr(batch_ask, "embed_questions", lambda questions: [[0.0]] * len(questions))
+    monkeypatch.setattr(batch_ask, "find_neighbors", lambda vectors: [[] for _ in vectors])
+    monkeypatch.setattr(batch_ask, "fetch_records", lambda ids: {})
+    monkeypatch.setattr(batch_ask, "generate_gemini_response", lambda question, *a, **k: f"rag: {question}")
+    items = batch_ask.parse_items(["How many products?", {"id": "q2", "question": "Tell me about KitKat"},
+                                   7, "how many  products?"])
+    lines = [json.loads(line) for line in batch_ask.answer_batch_jsonl(items)]
+
+    by_index = {line["index"]: line for line in lines}
+    assert len(calls) == 1 and len(calls[0]) == 2  # duplicates answered once, one router call
+    assert by_index[0]["route"] == by_index[3]["route"] == "count"
+    assert by_index[1] == {"index": 1, "id": "q2", "question": "Tell me about KitKat",
+                           "route": "rag", "answer": "rag: Tell me about KitKat"}
+    assert by_index[2]["route"] == "error" and by_index[2]["question"] == 7
+    assert [line["route"] for line in batch_ask.answer_batch(items[:1])] == ["cache"]
+
+
+def test_a_failed_generation_does_not_end_the_stream(cache, monkeypatch):
+    def generate(question, *args, **kwargs):
+        if question == "boom":
+            raise RuntimeError("pack failed")
+        return "ok"
+
+    monkeypatch.setattr(batch_ask, "handle_questions", lambda questions, version=None: [False] * len(questions))
+    monkeypatch.setattr(batch_ask, "embed_questions", lambda questions: [[0.0]] * len(questions))
+    monkeypatch.setattr(batch_ask, "find_neighbors", lambda vectors: [[] for _ in vectors])
+    monkeypatch.setattr(batch_ask, "fetch_records", lambda ids: {})
+    monkeypatch.setattr(batch_ask, "generate_gemini_response", generate)
+    results = {r["question"]: r for r in batch_ask.answer_batch(batch_ask.parse_items(["boom", "fine"]))}
+    assert results["boom"]["route"] == "error" and "pack failed" in results["boom"]["error"]
+    assert results["fine"]["answer"] == "ok"
@@ -0,0 +1,68 @@
+"""
+Document ids of the export (data/vectorDB/embedding_files.py): pages keep
+the id they were exported with, and files are named after it. No Vertex
+call is made: every vector is already in the embedding cache.
+"""
+
+import json, os, pathlib, uuid
+
+import pytest
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    # embedding_files resolves its data folders from the repository root
+    cwd = os.getcwd()
+    os.chdir(ROOT_DIR)
+    try:
+        import embedding_files
+    finally:
+        os.chdir(cwd)
+    products = tmp_path / "products.json"
+    monkeypatch.setattr(embedding_files, "SOURCES", [(products, embedding_files.build_product_text, "product")])
+    monkeypatch.setattr(embedding_files, "OUTPUT_DIR", tmp_path / "vector_documents")
+    (tmp_path / "vector_documents").mkdir()
+    cache = embedding_files.DocumentEmbeddingCache(tmp_path / "cache.sqlite")
+
+    def run(items):
+        products.write_text(json.dumps(items), encoding="utf-8")
+        texts = [embedding_files.build_product_text(item) for item in items]
+        cache.put_many({embedding_files.content_key(t): [0.0] * embedding_files.EMBED_DIM for t in texts})
+        embedding_files.embed_and_export(workers=1, cache=cache)
+        files = sorted((tmp_path / "vector_documents").glob("*.json"))
+        return {json.loads(fp.read_text(encoding="utf-8"))["metadata"]["title"]: fp for fp in files}
+    return run
+
+
+def _id(fp: pathlib.Path) -> str:
+    return json.loads(fp.read_text(encoding="utf-8"))["id"]
+
+
+def test_legacy_ids_are_kept_and_files_renamed(export, tmp_path):
+    legacy = {"id": "ddff45f7-0000-4000-8000-000000000000", "content": "old text",
+              "metadata": {"url": "https://example.com/kitkat", "title": "KitKat"},
+              "restricts": [{"namespace": "type", "allow": ["product"]}]}
+    (tmp_path / "vector_documents" / "vector_0.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    files = export([{"url": "https://example.com/aero", "title": "Aero"},
+                    {"url": "https://example.com/kitkat", "title": "KitKat", "description": "new"}])
+    assert _id(files["KitKat"]) == legacy["id"]
+    assert _id(files["Aero"]) == str(uuid.uuid5(uuid.NAMESPACE_URL, "https://example.com/aero"))
+    assert {fp.name for fp in files.values()} == {f"vector_{_id(fp)}.json" for fp in files.values()}
+
+
+def test_ids_follow_the_page_not_its_position(export):
+    first = export([{"url": "https://example.com/a", "title": "A"}, {"url": "https://example.com/b", "title": "B"}])
+    ids = {title: _id(fp) for title, fp in first.items()}
+    second = export([{"url": "https://example.com/b", "title": "B"}])
+    assert list(second) == ["B"] and _id(second["B"]) == ids["B"]
+
+
+def test_a_page_listed_twice_keeps_both_ids(export):
+    items = [{"url": "https://example.com/x", "title": "X1"}, {"url": "https://example.com/x", "title": "X2"}]
+    ids = {title: _id(fp) for title, fp in export(items).items()}
+    assert len(set(ids.values())) == 2
+    again = {title: _id(fp) for title, fp in export(items[::-1]).items()}
+    assert again == ids
@@ -0,0 +1,63 @@
+from entity_matcher import EntityMatcher
+from facets import FacetIndex
+from graph_engine import GraphEngine
+import intelligent_count
+
+from test_graph_engine import load_fixtures
+
+
+def fixture_index():
+    return FacetIndex(GraphEngine.build(load_fixtures()).catalog())
+
+
+def test_brand_spellings_are_one_brand():
+    index = fixture_index()
+    assert index.count(brand="kit kat") == index.count(brand="KitKat") == 2
+    assert ("Kit Kat", 2) in index.group_by("brand")
+
+
+def test_ingredient_filter_matches_by_containment():
+    index = fixture_index()
+    # "milk" ⊂ "milk chocolate" (KITKAT 4 Finger) and "milk" (KITKAT Chunky), not "cocoa butter"
+    assert index.count(ingredient="milk") == 2
+    assert index.count(ingredient="milk chocolate") == 1
+    assert index.count(ingredient="ilk") == 0
+
+
+def test_ingredient_groups_use_the_filter_rule():
+    index = fixture_index()
+    for name, count in index.group_by("ingredient"):
+        assert index.count(ingredient=name) == count
+
+
+def test_every_ingredient_is_required():
+    index = fixture_index()
+    assert index.count(ingredient=["sugar", "milk"]) == 2
+    assert index.count(ingredient=["sugar", "wheat flour"]) == 1
+    assert index.count(ingredient=["coffee", "sugar"]) == 0
+
+
+def test_every_named_ingredient_becomes_a_filter(monkeypatch):
+    matcher = EntityMatcher({"category": ["coffee"], "brand": ["kit kat"],
+                             "ingredient": ["sugar", "milk", "milk chocolate"]})
+    monkeypatch.setattr("entity_matcher.get_entity_matcher", lambda version=None: matcher)
+    entities = intelligent_count.extract_entities("kit kat contain sugar and milk chocolate and sugar")
+    assert entities["brand"] == "kit kat"
+    assert entities["ingredient"] == "sugar"
+    assert entities["ingredients"] == ["sugar", "milk chocolate"]
+    assert intelligent_count.describe_filters(entities) == (
+        " for the brand 'kit kat' containing the ingredients 'sugar' and 'milk chocolate'")
+
+
+def test_count_question_reads_the_data_version_once(monkeypatch):
+    import answer_cache, facets
+    matcher = EntityMatcher({"category": [], "brand": ["kit kat"], "ingredient": ["sugar", "milk"]})
+    index = fixture_index()
+    reads = []
+    monkeypatch.setattr(answer_cache, "current_data_version", lambda: reads.append(1) or "v1")
+    monkeypatch.setattr("entity_matcher.get_entity_matcher", lambda version=None: matcher)
+    monkeypatch.setattr(facets, "get_facet_index", lambda version=None: index)
+    monkeypatch.setattr(intelligent_count, "FACET_ENGINE", True)
+    answer = intelligent_count.handle_question("How many kit kat products contain sugar and milk?")
+    assert "2" in answer
+    assert len(reads) == 1
@@ -0,0 +1,130 @@
+"""
+Embedded graph engine vs the Neo4j import: records of FETCH_GRAPH_QUERY and
+count totals on fixture documents, and the same nodes / relationships /
+vector_id owners as create_graphRAG's import plan (fixtures and the shipped
+documents), without a Neo4j server.
+"""
+
+import importlib, json, os, pathlib, sys
+from collections import Counter
+
+import pytest
+
+import graph_engine
+from graph_engine import GraphEngine
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures" / "documents.jsonl"
+TITLED = ("Recipe", "Product", "Article", "Information")
+NO_STORE = [{"name": None, "address": None, "latitude": None, "longitude": None}]
+
+
+def load_fixtures():
+    return [json.loads(line) for line in FIXTURES.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture(scope="module")
+def importer():
+    # create_graphRAG resolves its data folders from the repository root
+    cwd = os.getcwd()
+    os.chdir(ROOT_DIR)
+    sys.path.insert(0, str(ROOT_DIR / "data/graphRAG"))
+    try:
+        yield importlib.import_module("create_graphRAG")
+    finally:
+        sys.path.remove(str(ROOT_DIR / "data/graphRAG"))
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return GraphEngine.build(load_fixtures())
+
+
+def test_recipe_record_lists_branded_products_sharing_ingredients(engine):
+    [recipe] = engine.fetch_records(["r1"])
+    assert recipe == {
+        "type": "Recipe", "id": "r1", "title": "Choco Cake", "description": "cake", "url": "https://x/r1",
+        "nutrition_value": [], "amazon_link": None, "ingredients": ["sugar", "milk chocolate", "eggs"],
+        "products": ["KITKAT 4 Finger", "KITKAT Chunky"], "brands": ["Kit Kat", "KitKat"],
+        "features": [], "stores": [],
+    }
+
+
+def test_duplicate_title_keeps_first_vector_id_and_last_properties(engine):
+    # MERGE … ON CREATE SET vector_id (first document) / SET += props (last document)
+    [product] = engine.fetch_records(["p1"])
+    assert engine.fetch_records(["p1-dup"]) == []
+    assert product["url"] == "https://x/p1-new"
+    assert product["description"] == "wafer, updated"
+    assert product["ingredients"] == ["sugar", "milk chocolate", "wheat flour"]
+    assert [s["name"] for s in product["stores"]] == ["Walmart", "Loblaws"]
+
+
+def test_product_record_mirrors_the_cypher_chain(engine):
+    nescafe, aero = engine.fetch_records(["p3", "p4"])
+    # no brand → first word of the title; no store → one map of nulls (collect over OPTIONAL MATCH)
+    assert nescafe["brands"] == ["NESCAFE"]
+    assert nescafe["stores"] == NO_STORE
+    # no features ends the import statement: no ingredient / brand link either
+    assert (aero["ingredients"], aero["brands"], aero["features"]) == ([], [], [])
+
+
+def test_records_follow_the_union_order(engine):
+    records = engine.fetch_records(["i1", "a1", "p2", "r1", "unknown"])
+    assert [r["type"] for r in records] == ["Recipe", "Product", "Article", "Information"]
+
+
+def test_counts(engine):
+    assert engine.count_products() == 4
+    assert engine.count_products(brand="kit kat") == 1
+    assert engine.count_products(category="chocolate") == 2
+    assert engine.count_products(ingredient="sugar") == 2
+    assert engine.count_products(ingredient="coffee") == 1
+
+
+def _plan_shape(importer, docs):
+    node_groups, link_groups = importer.plan_import(((d.get("id") or "?", d) for d in docs), verbose=False)
+    nodes = {g.name: len(g.rows) for g in node_groups}
+    rels = Counter()
+    for g in link_groups:
+        rels[g.name.split("-")[1]] += len(g.rows)
+    # one USES relationship per shared ingredient ({via}) in Neo4j, one edge per pair in the engine
+    rels["USES"] = len({(row["recipe"], row["product"]) for row in importer.plan_uses(link_groups)})
+    owners = {(g.name, row["title"]): row["vid"] for g in node_groups if g.name in TITLED for row in g.rows}
+    return nodes, +rels, owners
+
+
+def _engine_shape(engine):
+    nodes = {label: len(rows) for label, rows in engine.nodes.items() if rows}
+    rels = Counter()
+    for (_, rel), targets in engine.out.items():
+        rels[rel] += sum(len(t) for t in targets.values())
+    owners = {(label, engine.get(label, n, "title")): engine.get(label, n, "vector_id")
+              for label in TITLED for n in range(len(engine.nodes[label]))}
+    return nodes, +rels, owners
+
+
+def test_same_graph_as_the_import_plan_on_fixtures(importer, engine):
+    assert _engine_shape(engine) == _plan_shape(importer, load_fixtures())
+
+
+def test_same_graph_as_the_import_plan_on_shipped_documents(importer):
+    docs = [d for _, d in importer._iter_documents()]
+    assert _engine_shape(GraphEngine.build(docs)) == _plan_shape(importer, docs)
+    assert _engine_shape(GraphEngine.build()) == _plan_shape(importer, docs)
+
+
+def test_json_fallback_is_read_in_file_name_order(importer, tmp_path, monkeypatch):
+    for name, vid in (("vector_2.json", "second"), ("vector_10.json", "first")):
+        (tmp_path / name).write_text(json.dumps({
+            "id": vid, "restricts": [{"namespace": "type", "allow": ["article"]}],
+            "metadata": {"title": "Same title", "url": vid}}))
+    monkeypatch.setattr(graph_engine, "get_vector_store", lambda: None)
+    monkeypatch.setattr(graph_engine, "VECTORS_DIR", tmp_path)
+    monkeypatch.setattr(importer, "STORE_DOCUMENTS", tmp_path / "missing.jsonl")
+    monkeypatch.setattr(importer, "VECTORS_DIR", tmp_path)
+
+    assert [d["id"] for d in graph_engine.iter_documents()] == ["first", "second"]
+    assert [d["id"] for _, d in importer._iter_documents()] == ["first", "second"]
+    assert GraphEngine.build().fetch_records(["first"])[0]["url"] == "second"
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from fake_gemini import FakeGeminiClient
+from prompt_template import STATIC_PROMPT, SYSTEM_INSTRUCTION
+import llm
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeGeminiClient(answer="Here’s what I found for you! 1. **KitKat**")
+    monkeypatch.setattr(llm, "get_genai_client", lambda: fake)
+    return fake
+
+
+def test_prompt_starts_with_the_static_rules(client):
+    answer = llm.generate_gemini_response("calories in kitkat?", "1. KitKat", "", intent="detail")
+    assert answer == client.answer
+    (call,) = client.calls
+    assert call["contents"].startswith(STATIC_PROMPT)
+    assert "calories in kitkat?" in call["contents"]
+    assert call["config"].system_instruction == SYSTEM_INSTRUCTION
+    assert call["config"].max_output_tokens == llm.MAX_OUTPUT_TOKENS["detail"]
+
+
+def test_stream_yields_the_whole_answer(client):
+    chunks = list(llm.stream_gemini_response("kitkat?", "1. KitKat", ""))
+    assert "".join(chunks) == client.answer
+    assert len(chunks) > 1
+
+
+def test_async_wrappers_match_the_blocking_ones(client):
+    async def scenario():
+        answer = await llm.generate_gemini_response_async("kitkat?", "1. KitKat", "")
+        chunks = [c async for c in llm.stream_gemini_response_async("kitkat?", "1. KitKat", "")]
+        return answer, "".join(chunks)
+
+    assert asyncio.run(scenario()) == (client.answer, client.answer)
+    assert client.calls[0]["contents"] == client.calls[1]["contents"]
+
+
+def test_prompt_tokens_are_logged(client, capsys):
+    llm.generate_gemini_response("kitkat?", "1. KitKat", "")
+    sent = client.calls[0]["prompt_tokens"]
+    assert f"{sent} sent" in capsys.readouterr().out
+
+
+def test_generation_errors_end_the_stream(monkeypatch):
+    class Failing(FakeGeminiClient):
+        def __init__(self):
+            super().__init__()
+            self.models.generate_content_stream = self._fail
+
+        def _fail(self, **kwargs):
+            raise RuntimeError("quota")
+
+    monkeypatch.setattr(llm, "get_genai_client", Failing)
+    (chunk,) = list(llm.stream_gemini_response("kitkat?", "", ""))
+    assert isinstance(chunk, llm.GenerationError)
+    assert "quota" in chunk
@@ -0,0 +1,43 @@
+import asyncio, threading
+
+from single_flight import AsyncSingleFlight, SingleFlight, collect_answer
+
+
+def test_followers_share_the_leaders_run():
+    runs, gate = [], threading.Event()
+
+    def produce():
+        runs.append(1)
+        gate.wait(5)
+        yield "answer", {"answer": "42"}
+
+    flights = SingleFlight(timeout=5)
+    first = flights.events("ask", "k", produce)
+    second = flights.events("ask", "k", produce)
+    gate.set()
+    assert collect_answer(first) == collect_answer(second) == {"answer": "42"}
+    assert len(runs) == 1
+
+
+def test_endpoints_do_not_share_a_run():
+    async def scenario():
+        gate = asyncio.Event()
+
+        def produce(events):
+            async def run():
+                await gate.wait()
+                for event in events:
+                    yield event
+            return run
+
+        flights = AsyncSingleFlight(timeout=5)
+        ask = flights.events("ask", "k", produce([("answer", {"answer": "42"}), ("done", {})]))
+        stream = flights.events("ask_stream", "k", produce([("chunk", {"text": "4"}), ("chunk", {"text": "2"}),
+                                                            ("done", {})]))
+        assert flights.in_flight() == 2
+        gate.set()
+        return [e async for e in ask], [e async for e in stream]
+
+    ask, stream = asyncio.run(scenario())
+    assert [name for name, _ in ask] == ["answer", "done"]
+    assert [name for name, _ in stream] == ["chunk", "chunk", "done"]
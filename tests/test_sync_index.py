@@ -0,0 +1,90 @@
+"""
+Incremental index sync (data/vectorDB/sync_index.py) against LocalIndexService:
+the diff, removals, and resuming an interrupted sync from the manifest.
+"""
+
+import json
+
+import pytest
+
+import sync_index
+from sync_index import LocalIndexService
+
+
+def _write(folder, vid, value, kind="product"):
+    doc = {"id": vid, "embedding": [value, 1.0], "content": vid,
+           "restricts": [{"namespace": "type", "allow": [kind]}]}
+    (folder / f"vector_{vid}.json").write_text(json.dumps(doc), encoding="utf-8")
+
+
+@pytest.fixture
+def docs(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_index, "INDEX_MANIFEST", tmp_path / "manifest.json")
+    monkeypatch.setattr(sync_index, "STORE_DIR", tmp_path / "no_store")
+    folder = tmp_path / "vector_documents"
+    folder.mkdir()
+    for i in range(5):
+        _write(folder, f"d{i}", float(i))
+    return folder
+
+
+def test_diff_upserts_new_and_changed_removes_vanished():
+    current = {vid: {"id": vid, "embedding": [1.0], "type": "product"} for vid in ("a", "b", "c")}
+    deployed = {"a": sync_index.datapoint_hash(current["a"]), "b": "stale", "gone": "x"}
+    assert sync_index.diff(current, deployed) == (["b", "c"], ["gone"])
+    # the type restrict is part of the hash
+    assert sync_index.datapoint_hash({**current["a"], "type": "recipe"}) != deployed["a"]
+
+
+def test_second_sync_sends_only_the_changes(docs, tmp_path):
+    service = LocalIndexService(tmp_path / "index.json")
+    assert sync_index.sync(service, folder=docs) == (5, 0)
+
+    _write(docs, "d1", 10.0)                      # changed embedding
+    _write(docs, "d2", 2.0, kind="recipe")        # changed type
+    _write(docs, "d5", 5.0)                       # new
+    (docs / "vector_d4.json").unlink()            # vanished
+    service = LocalIndexService(tmp_path / "index.json")
+    assert sync_index.sync(service, folder=docs) == (3, 1)
+    assert sorted(service.datapoints) == ["d0", "d1", "d2", "d3", "d5"]
+    assert service.datapoints["d2"]["type"] == "recipe"
+    assert sync_index.sync(service, dry_run=True, folder=docs) == (0, 0)
+
+
+def test_interrupted_sync_resumes_from_the_manifest(docs, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_index, "INDEX_SYNC_BATCH", 2)
+
+    class Flaky(LocalIndexService):
+        def upsert(self, datapoints):
+            if self.requests == 1:
+                self.requests += 1
+                raise ConnectionError("stream closed")
+            super().upsert(datapoints)
+
+    flaky = Flaky(tmp_path / "index.json")
+    with pytest.raises(ConnectionError):
+        sync_index.sync(flaky, folder=docs)
+    assert len(sync_index.load_manifest(flaky.name)) == 2
+
+    service = LocalIndexService(tmp_path / "index.json")
+    assert sync_index.sync(service, folder=docs) == (3, 0)
+    assert service.requests == 2
+    assert sorted(service.datapoints) == [f"d{i}" for i in range(5)]
+
+
+def test_manifest_of_another_index_is_ignored(docs, tmp_path):
+    sync_index.sync(LocalIndexService(tmp_path / "a.json"), folder=docs)
+    assert sync_index.sync(LocalIndexService(tmp_path / "b.json"), dry_run=True, folder=docs) == (5, 0)
+
+
+def test_packed_store_is_repacked_after_a_change(docs, tmp_path, monkeypatch):
+    store = tmp_path / "vector_store"
+    store.mkdir()
+    (store / "ids.npy").write_bytes(b"")
+    packs = []
+    monkeypatch.setattr(sync_index, "STORE_DIR", store)
+    monkeypatch.setattr(sync_index, "pack", lambda src, out: packs.append((src, out)) or 5)
+    service = LocalIndexService(tmp_path / "index.json")
+    sync_index.sync(service, folder=docs)
+    sync_index.sync(service, folder=docs)
+    assert packs == [(docs, store)]